@@ -1,6 +1,10 @@
 from app import create_app
+from app.cli import bootstrap_database
 
 app = create_app()
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000) 
\ No newline at end of file
+    # Local runs keep the old convenience of creating tables on first start
+    with app.app_context():
+        bootstrap_database(create_schema=True)
+    app.run(host='0.0.0.0', port=5000)
@@ -1,37 +1,43 @@
 from flask import Flask, jsonify
-from .extensions import db, jwt, cors, limiter
+from .extensions import db, jwt, cors, limiter, redis_client
+from . import (cache, changes, cli, dedup, logs, metrics, photos, profiling, rate_limit, replicas,
+               search, security, stats)
 from .routes.auth import auth_bp
 from .routes.clients import clients_bp
+from .routes.export import export_bp
+from .routes.programs import programs_bp
+from .routes.changes import changes_bp
+from .routes.cohorts import cohorts_bp
+from .routes.stats import stats_bp
+from .routes.metrics import metrics_bp
 from .routes.main import main_bp, swaggerui_blueprint, SWAGGER_URL
-from config import Config
-import logging
-from logging.handlers import RotatingFileHandler
-import os
+from config import Config, config
 
 def create_app(config_class=Config):
+    if isinstance(config_class, str):
+        config_class = config[config_class]
     app = Flask(__name__)
     app.config.from_object(config_class)
 
-    # Configure logging
-    if not app.debug and not app.testing:
-        if not os.path.exists('logs'):
-            os.mkdir('logs')
-        file_handler = RotatingFileHandler('logs/health_info.log',
-                                         maxBytes=10240, backupCount=10)
-        file_handler.setFormatter(logging.Formatter(
-            '%(asctime)s %(levelname)s: %(message)s '
-            '[in %(pathname)s:%(lineno)d]'
-        ))
-        file_handler.setLevel(logging.INFO)
-        app.logger.addHandler(file_handler)
-        app.logger.setLevel(logging.INFO)
-        app.logger.info('Health Info System startup')
+    # Queue-backed JSON logging with request ids (see app/logs.py)
+    logs.init_app(app)
 
     # Initialize extensions with app
     db.init_app(app)
+    replicas.init_app(app)
     jwt.init_app(app)
     cors.init_app(app, resources={r"/api/*": {"origins": app.config['CORS_ORIGINS']}})
     limiter.init_app(app)
+    redis_client.init_app(app)
+    cache.init_app(app, redis_client)
+    metrics.init_app(app, redis_client)
+    profiling.init_app(app)
+    rate_limit.init_app(app, limiter)
+    search.init_app(app)
+    stats.init_app(app)
+    changes.init_app(app)
+    dedup.init_app(app)
+    cli.init_app(app)
 
     # JWT error handlers
     @jwt.unauthorized_loader
@@ -51,6 +57,11 @@ def create_app(config_class=Config):
     def not_found_error(error):
         return jsonify({"error": "Not Found", "message": "The requested resource was not found"}), 404
 
+    @app.errorhandler(429)
+    def ratelimit_error(error):
+        metrics.record_rate_limit_rejection(rate_limit.key_type(rate_limit.rate_limit_key()))
+        return jsonify({"error": "Too Many Requests", "message": f"Rate limit exceeded: {error.description}"}), 429
+
     @app.errorhandler(500)
     def internal_error(error):
         db.session.rollback()
@@ -64,20 +75,34 @@ def create_app(config_class=Config):
 
     # Register blueprints
     app.register_blueprint(main_bp)
+    app.register_blueprint(metrics_bp)
     app.register_blueprint(auth_bp, url_prefix='/api/v1/auth')
     app.register_blueprint(clients_bp, url_prefix='/api/v1/clients')
+    app.register_blueprint(programs_bp, url_prefix='/api/v1/programs')
+    app.register_blueprint(export_bp, url_prefix='/api/v1/export')
+    app.register_blueprint(stats_bp, url_prefix='/api/v1/stats')
+    app.register_blueprint(changes_bp, url_prefix='/api/v1/changes')
+    app.register_blueprint(cohorts_bp, url_prefix='/api/v1/cohorts')
     app.register_blueprint(swaggerui_blueprint, url_prefix=SWAGGER_URL)
 
-    # Create database tables
+    # Construction does no database I/O unless explicitly asked to
+    if app.config.get('AUTO_CREATE_SCHEMA'):
+        with app.app_context():
+            cli.bootstrap_database(create_schema=True)
+
+    return app
+
+
+def reset_after_fork(app):
+    """Give a freshly forked worker its own sockets, pools and threads.
+
+    Connections opened by the master before forking (e.g. with gunicorn's
+    preload_app) must not be shared between processes.
+    """
     with app.app_context():
-        db.create_all()
-        
-        # Create default admin user if it doesn't exist
-        from .models.models import User
-        if not User.query.filter_by(username='admin').first():
-            admin = User(username='admin')
-            admin.set_password('admin')
-            db.session.add(admin)
-            db.session.commit()
-
-    return app 
\ No newline at end of file
+        db.engine.dispose()
+    replicas.replicas.dispose()
+    logs.restart_listener()
+    redis_client.reset()
+    security.reset()
+    photos.reset()
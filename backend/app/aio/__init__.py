@@ -0,0 +1,66 @@
+"""Asyncio read API served over ASGI (``uvicorn asgi:app``).
+
+It serves the client and program read endpoints on one event loop, so a
+request waiting on PostgreSQL or Redis costs a coroutine, not a worker
+thread. Writes, login and everything else stay on the Flask app; a proxy
+routes GETs for these paths here. It reuses the same models, config, JWT
+secret, Redis cache entries and rate limit counters.
+"""
+import contextlib
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from config import Config, config as configs
+from ..redis_store import AsyncRedisStore
+from . import views
+from .rate_limit import RateLimiter
+from .db import create_engine, create_sessionmaker
+
+routes = [
+    Route('/api/v1/clients', views.get_clients, methods=['GET']),
+    Route('/api/v1/clients/{client_id:int}', views.get_client, methods=['GET']),
+    Route('/api/v1/clients/{client_id:int}/programs', views.get_client_programs, methods=['GET']),
+    Route('/api/v1/programs', views.get_programs, methods=['GET']),
+    Route('/api/v1/programs/{program_id:int}', views.get_program, methods=['GET']),
+    Route('/api/v1/programs/{program_id:int}/enrollments', views.get_program_enrollments,
+          methods=['GET']),
+    Route('/api/v1/health', views.health, methods=['GET']),
+    Route('/api/v1/health/details', views.health_details, methods=['GET']),
+]
+
+
+async def not_found(request, exc):
+    return JSONResponse({'error': 'Not Found', 'message': 'The requested resource was not found'},
+                        status_code=404)
+
+
+def _load_config(config_class):
+    if isinstance(config_class, str):
+        config_class = configs[config_class]
+    return {key: getattr(config_class, key) for key in dir(config_class) if key.isupper()}
+
+
+def create_asgi_app(config_class=Config, redis_client=None, **overrides):
+    """Build the ASGI app; ``redis_client`` injects a ready-made asyncio client."""
+    config = _load_config(config_class)
+    config.update(overrides)
+
+    engine = create_engine(config)
+    store = AsyncRedisStore()
+    store.init_app(config, client=redis_client)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        yield
+        await store.close()
+        await engine.dispose()
+
+    app = Starlette(routes=routes, lifespan=lifespan, exception_handlers={404: not_found})
+    app.state.config = config
+    app.state.engine = engine
+    app.state.sessionmaker = create_sessionmaker(engine)
+    app.state.redis = store
+    app.state.rate_limiter = RateLimiter(config)
+    return app
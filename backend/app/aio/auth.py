@@ -0,0 +1,57 @@
+"""JWT checks for the async API, matching flask-jwt-extended's behaviour.
+
+Tokens are the ones issued by ``/api/v1/auth/login`` on the Flask app, so
+both servers accept the same credentials and answer auth failures with the
+same bodies.
+"""
+import functools
+
+import jwt
+from starlette.responses import JSONResponse
+
+MISSING = ({'error': 'Missing Authorization Header', 'message': 'Please login to access this resource'}, 401)
+INVALID = ({'error': 'Invalid Token', 'message': 'Please login again'}, 401)
+EXPIRED = ({'error': 'Token Expired', 'message': 'Please login again'}, 401)
+BAD_HEADER = ({'msg': "Bad Authorization header. Expected 'Authorization: Bearer <JWT>'"}, 422)
+WRONG_TYPE = ({'msg': 'Only non-refresh tokens are allowed'}, 422)
+
+
+def _error(body_and_status):
+    body, status = body_and_status
+    return JSONResponse(body, status_code=status)
+
+
+def decode_access_token(header, config):
+    """Return ``(claims, None)`` or ``(None, (body, status))``."""
+    if not header:
+        return None, MISSING
+    parts = header.split()
+    if len(parts) != 2 or parts[0] != 'Bearer':
+        return None, BAD_HEADER
+    try:
+        claims = jwt.decode(parts[1], config['JWT_SECRET_KEY'],
+                            algorithms=[config.get('JWT_ALGORITHM', 'HS256')],
+                            leeway=config.get('JWT_DECODE_LEEWAY', 0))
+    except jwt.ExpiredSignatureError:
+        return None, EXPIRED
+    except jwt.InvalidTokenError:
+        return None, INVALID
+    if claims.get('type') != 'access':
+        return None, WRONG_TYPE
+    return claims, None
+
+
+def jwt_required(view):
+    """Async counterpart of ``flask_jwt_extended.jwt_required()``.
+
+    The token's identity is available as ``request.state.identity``.
+    """
+    @functools.wraps(view)
+    async def wrapper(request):
+        claims, error = decode_access_token(request.headers.get('Authorization'),
+                                            request.app.state.config)
+        if error is not None:
+            return _error(error)
+        request.state.identity = claims.get('sub')
+        return await view(request)
+    return wrapper
@@ -0,0 +1,133 @@
+"""Asyncio versions of the Redis cache lookups in ``app.cache``.
+
+Keys and entry formats are shared with the Flask app, so both servers read
+and warm the same entries, and a write through the Flask app invalidates them
+for both. There is no process-local L1 here; a Redis hit is a single await.
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+import redis
+
+from ..cache import (LOCK_POLL_INTERVAL, LOCK_WAIT_SECONDS, entry_key, generation_key, make_entry,
+                     record_key, record_version_key, should_refresh_early, stats)
+
+logger = logging.getLogger(__name__)
+
+
+def _redis_error(namespace, error):
+    stats.incr(namespace, 'errors')
+    logger.error(f"Redis cache error: {error}")
+
+
+async def _build_and_store(store, key, builder, ttl, namespace):
+    started = time.time()
+    value = await builder()
+    try:
+        await store.setex(key, ttl, make_entry(value, time.time() - started, ttl))
+    except redis.RedisError as e:
+        _redis_error(namespace, e)
+    stats.incr(namespace, 'rebuilds')
+    return value
+
+
+async def _release_lock(store, lock_key, token):
+    try:
+        if await store.get(lock_key) == token:
+            await store.delete(lock_key)
+    except redis.RedisError:
+        pass
+
+
+async def get_or_build(store, namespace, parts, builder, ttl=300, beta=1.0, generation=None):
+    """See ``app.cache.get_or_build``; ``builder`` is a coroutine function."""
+    try:
+        if generation is None:
+            generation = int(await store.get(generation_key(namespace)) or 0)
+        key = entry_key(namespace, generation, parts)
+        cached = await store.get(key)
+    except redis.RedisError as e:
+        _redis_error(namespace, e)
+        return await builder()
+
+    lock_key = key + ':lock'
+    lock_ttl_ms = int(LOCK_WAIT_SECONDS * 1000) * 5
+
+    if cached is not None:
+        stats.incr(namespace, 'hits')
+        entry = json.loads(cached)
+        if should_refresh_early(entry, beta):
+            token = uuid.uuid4().hex
+            try:
+                acquired = await store.set(lock_key, token, nx=True, px=lock_ttl_ms)
+            except redis.RedisError:
+                acquired = False
+            if acquired:
+                stats.incr(namespace, 'early_refreshes')
+                try:
+                    return await _build_and_store(store, key, builder, ttl, namespace)
+                finally:
+                    await _release_lock(store, lock_key, token)
+        return entry['value']
+
+    stats.incr(namespace, 'misses')
+    token = uuid.uuid4().hex
+    try:
+        acquired = await store.set(lock_key, token, nx=True, px=lock_ttl_ms)
+    except redis.RedisError as e:
+        _redis_error(namespace, e)
+        return await builder()
+
+    if acquired:
+        try:
+            return await _build_and_store(store, key, builder, ttl, namespace)
+        finally:
+            await _release_lock(store, lock_key, token)
+
+    stats.incr(namespace, 'lock_waits')
+    deadline = time.time() + LOCK_WAIT_SECONDS
+    while time.time() < deadline:
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        try:
+            cached = await store.get(key)
+        except redis.RedisError:
+            break
+        if cached is not None:
+            return json.loads(cached)['value']
+    stats.incr(namespace, 'lock_timeouts')
+    return await builder()
+
+
+async def get_cached_record(store, namespace, key, loader, ttl=300):
+    """See ``app.cache.get_cached_record``: Redis, then ``await loader()``.
+
+    The write-back follows ``app.cache._store_records``: write, re-read the
+    version counter, and delete the record again if it moved.
+    """
+    redis_key = record_key(namespace, key)
+    version_key = record_version_key(namespace, key)
+    try:
+        cached, version = await store.mget(redis_key, version_key)
+    except redis.RedisError as e:
+        _redis_error(namespace, e)
+        stats.incr(namespace, 'misses')
+        return await loader()
+    if cached is not None:
+        stats.incr(namespace, 'hits')
+        return json.loads(cached)
+
+    stats.incr(namespace, 'misses')
+    value = await loader()
+    if value is None:
+        return None
+    try:
+        await store.setex(redis_key, ttl, json.dumps(value))
+        if await store.get(version_key) != version:
+            await store.delete(redis_key)
+    except redis.RedisError as e:
+        _redis_error(namespace, e)
+    stats.incr(namespace, 'rebuilds')
+    return value
@@ -0,0 +1,37 @@
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+# Async drivers for the sync URLs the Flask app is configured with
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_database_url(url):
+    """Translate a sync SQLAlchemy URL to the matching asyncio driver."""
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f'No asyncio driver configured for {url.get_backend_name()}')
+    return url.set(drivername=driver)
+
+
+def create_engine(config):
+    url = config.get('ASYNC_DATABASE_URL') or async_database_url(config['SQLALCHEMY_DATABASE_URI'])
+    options = {}
+    if make_url(url).get_backend_name() != 'sqlite':
+        # One event loop multiplexes every request over this pool; requests
+        # beyond its size wait for a connection instead of opening new ones.
+        options = {
+            'pool_size': config.get('ASYNC_DB_POOL_SIZE', 20),
+            'max_overflow': config.get('ASYNC_DB_MAX_OVERFLOW', 10),
+            'pool_timeout': config.get('ASYNC_DB_POOL_TIMEOUT', 10),
+            'pool_pre_ping': True,
+        }
+    return create_async_engine(url, **options)
+
+
+def create_sessionmaker(engine):
+    return sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
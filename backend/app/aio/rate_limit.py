@@ -0,0 +1,83 @@
+"""Rate limits for the async API, counted together with the Flask app's.
+
+Each route takes the limit of its Flask twin and is counted in the same
+storage (``RATELIMIT_STORAGE_URI``) under the same key flask-limiter uses:
+key prefix, ``user:<identity>`` or ``ip:<address>`` (app/rate_limit.py), and
+the Flask endpoint name. Switching servers therefore does not buy a fresh
+budget.
+
+limits only has an asyncio Redis storage on top of coredis, so the
+synchronous storage runs in the threadpool; each check is still one Lua call,
+bounded by the Redis socket timeout. While the storage is unreachable,
+limits are counted in process memory, as flask-limiter does, and the storage
+is tried again after ``STORAGE_RETRY_SECONDS``.
+"""
+import functools
+import logging
+import time
+
+from limits import parse
+from limits.storage import MemoryStorage, storage_from_string
+from limits.strategies import STRATEGIES
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+from .auth import decode_access_token
+
+logger = logging.getLogger(__name__)
+
+STORAGE_RETRY_SECONDS = 30.0
+
+
+class RateLimiter:
+    """Counts requests with the Flask app's limit storage and strategy."""
+
+    def __init__(self, config):
+        self.config = config
+        self.enabled = config.get('RATELIMIT_ENABLED', True)
+        self.prefix = config.get('RATELIMIT_KEY_PREFIX', '')
+        strategy = STRATEGIES[config.get('RATELIMIT_STRATEGY', 'fixed-window')]
+        # Strategies only keep a weak reference to their storage
+        self._storage = storage_from_string(config['RATELIMIT_STORAGE_URI'],
+                                            **config.get('RATELIMIT_STORAGE_OPTIONS', {}))
+        self._fallback_storage = MemoryStorage()
+        self._limiter = strategy(self._storage)
+        self._fallback = strategy(self._fallback_storage)
+        self._storage_dead_until = 0.0
+
+    def key_for(self, request):
+        """``rate_limit_key`` for a Starlette request."""
+        claims, _ = decode_access_token(request.headers.get('Authorization'), self.config)
+        if claims is not None and claims.get('sub') is not None:
+            return f"user:{claims['sub']}"
+        return f'ip:{request.client.host if request.client else "127.0.0.1"}'
+
+    def hit(self, item, *identifiers):
+        """Count one request; False once ``item`` is exhausted for ``identifiers``."""
+        if time.monotonic() >= self._storage_dead_until:
+            try:
+                return self._limiter.hit(item, *identifiers)
+            except Exception as e:
+                logger.warning(f"Rate limit storage unreachable - counting in memory: {e}")
+                self._storage_dead_until = time.monotonic() + STORAGE_RETRY_SECONDS
+        return self._fallback.hit(item, *identifiers)
+
+
+def rate_limited(limit, endpoint):
+    """``@limiter.limit(limit)`` for an async view; ``endpoint`` is its Flask endpoint name."""
+    item = parse(limit)
+
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request):
+            limiter = request.app.state.rate_limiter
+            if limiter.enabled:
+                identifiers = [limiter.key_for(request), endpoint]
+                if limiter.prefix:
+                    identifiers.insert(0, limiter.prefix)
+                if not await run_in_threadpool(limiter.hit, item, *identifiers):
+                    return JSONResponse({'error': 'Too Many Requests',
+                                         'message': f'Rate limit exceeded: {item}'}, status_code=429)
+            return await view(request)
+        return wrapper
+    return decorator
@@ -0,0 +1,242 @@
+"""Async versions of the client and program read endpoints.
+
+Responses match the Flask views in ``app/routes`` field for field, including
+the keyset pagination headers, ETag/Last-Modified and 304s. Cache keys and
+validators come from the same helpers (app/cache.py, app/conditional.py), so
+either server can revalidate what the other handed out.
+"""
+import json
+import logging
+
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from werkzeug.http import parse_date, parse_etags
+
+from ..cache import CLIENTS_NAMESPACE, CLIENT_DETAIL_NAMESPACE
+from ..changes import head_statements, version_from_rows
+from ..conditional import client_etag, client_page_etag, program_etag, validator_headers, validators_match
+from ..models.models import Client, ClientProgram, HealthProgram, serialize_client
+from ..pagination import next_page_url, parse_page_args, split_page
+from ..stats import status_counts_statement
+from ..streaming import STREAM_BATCH_SIZE
+from .auth import jwt_required
+from .cache import get_cached_record, get_or_build
+from .rate_limit import rate_limited
+
+logger = logging.getLogger(__name__)
+
+CLIENT_COLUMNS = (Client.id, Client.name, Client.date_of_birth, Client.contact_info,
+                  Client.created_at, Client.updated_at)
+
+
+def _not_found(message):
+    return JSONResponse({'error': 'Not Found', 'message': message}, status_code=404)
+
+
+def _server_error(view, error):
+    logger.error(f"Error in {view}: {error}")
+    return JSONResponse({'error': str(error)}, status_code=500)
+
+
+def _is_not_modified(request, etag, last_modified=None):
+    return validators_match(etag, last_modified, parse_etags(request.headers.get('if-none-match')),
+                            parse_date(request.headers.get('if-modified-since')))
+
+
+def _not_modified(etag, last_modified=None):
+    return Response(status_code=304, headers=validator_headers(etag, last_modified))
+
+
+def _with_validators(response, etag, last_modified=None):
+    response.headers.update(validator_headers(etag, last_modified))
+    return response
+
+
+def _page_response(request, items, next_cursor, limit):
+    response = JSONResponse(items)
+    if next_cursor is not None:
+        url = next_page_url(request.url.path, request.query_params, next_cursor, limit)
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+        response.headers['Link'] = f'<{url}>; rel="next"'
+    return response
+
+
+async def _head_version(session):
+    # app.changes.head_version on an async session
+    head, horizon = head_statements(session.bind.dialect.name)
+    row = (await session.execute(head)).first()
+    return version_from_rows(row, (await session.execute(horizon)).first() if row is None else None)
+
+
+async def _keyset_page(session, statement, key_column, after, limit):
+    result = await session.execute(
+        statement.where(key_column > after).order_by(key_column).limit(limit + 1))
+    return split_page(result.all(), key_column, limit)
+
+
+async def _stream_clients(sessionmaker, after):
+    # Same JSON array as the Flask ?stream=true, fed from a server-side cursor
+    async with sessionmaker() as session:
+        result = await session.stream(
+            select(*CLIENT_COLUMNS).where(Client.id > after).order_by(Client.id)
+            .execution_options(yield_per=STREAM_BATCH_SIZE))
+        yield '['
+        first = True
+        async for row in result:
+            yield ('' if first else ',') + json.dumps(serialize_client(row))
+            first = False
+        yield ']'
+
+
+@rate_limited('100 per minute', 'clients.get_clients')
+@jwt_required
+async def get_clients(request):
+    state = request.app.state
+    try:
+        after, limit = parse_page_args(args=request.query_params)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+    if request.query_params.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return StreamingResponse(_stream_clients(state.sessionmaker, after),
+                                 media_type='application/json')
+
+    try:
+        async with state.sessionmaker() as session:
+            version, changed_at = await _head_version(session)
+        etag = client_page_etag(version, after, limit)
+        if _is_not_modified(request, etag, changed_at):
+            return _not_modified(etag, changed_at)
+
+        async def build_page():
+            async with state.sessionmaker() as session:
+                rows, next_cursor = await _keyset_page(session, select(*CLIENT_COLUMNS),
+                                                       Client.id, after, limit)
+            return {'items': [serialize_client(row) for row in rows], 'next': next_cursor}
+
+        page = await get_or_build(state.redis, CLIENTS_NAMESPACE, ('list', after, limit),
+                                  build_page, ttl=state.config.get('CLIENTS_CACHE_TTL', 300),
+                                  generation=version)
+        return _with_validators(_page_response(request, page['items'], page['next'], limit), etag, changed_at)
+    except Exception as e:
+        return _server_error('get_clients', e)
+
+
+@rate_limited('100 per minute', 'clients.get_client')
+@jwt_required
+async def get_client(request):
+    state = request.app.state
+    client_id = request.path_params['client_id']
+
+    async def load():
+        async with state.sessionmaker() as session:
+            row = (await session.execute(select(*CLIENT_COLUMNS).where(Client.id == client_id))).first()
+        return serialize_client(row) if row else None
+
+    try:
+        client = await get_cached_record(state.redis, CLIENT_DETAIL_NAMESPACE, client_id, load,
+                                         ttl=state.config.get('CLIENTS_CACHE_TTL', 300))
+    except Exception as e:
+        return _server_error('get_client', e)
+    if client is None:
+        return _not_found('Client not found')
+    etag = client_etag(client)
+    if _is_not_modified(request, etag, client['updated_at']):
+        return _not_modified(etag, client['updated_at'])
+    return _with_validators(JSONResponse(client), etag, client['updated_at'])
+
+
+@rate_limited('100 per minute', 'clients.get_client_programs')
+@jwt_required
+async def get_client_programs(request):
+    client_id = request.path_params['client_id']
+    async with request.app.state.sessionmaker() as session:
+        if (await session.execute(select(Client.id).where(Client.id == client_id))).first() is None:
+            return _not_found('Client not found')
+        enrollments = (await session.execute(
+            select(ClientProgram)
+            .options(joinedload(ClientProgram.program))
+            .where(ClientProgram.client_id == client_id)
+            .order_by(ClientProgram.id))).scalars()
+        return JSONResponse([enrollment.to_dict(include_program=True) for enrollment in enrollments])
+
+
+async def _enrollment_counts(session, program_ids):
+    counts = {program_id: {} for program_id in program_ids}
+    if not program_ids:
+        return counts
+    for program_id, status, count in await session.execute(status_counts_statement(program_ids)):
+        counts[program_id][status] = count
+    return counts
+
+
+@rate_limited('100 per minute', 'programs.get_programs')
+@jwt_required
+async def get_programs(request):
+    try:
+        after, limit = parse_page_args(args=request.query_params)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    try:
+        async with request.app.state.sessionmaker() as session:
+            rows, next_cursor = await _keyset_page(session, select(HealthProgram),
+                                                   HealthProgram.id, after, limit)
+            programs = [row.HealthProgram for row in rows]
+            counts = await _enrollment_counts(session, [program.id for program in programs])
+        result = [dict(program.to_dict(), enrollments=counts[program.id]) for program in programs]
+        return _page_response(request, result, next_cursor, limit)
+    except Exception as e:
+        return _server_error('get_programs', e)
+
+
+@rate_limited('100 per minute', 'programs.get_program')
+@jwt_required
+async def get_program(request):
+    program_id = request.path_params['program_id']
+    async with request.app.state.sessionmaker() as session:
+        program = await session.get(HealthProgram, program_id)
+        if program is None:
+            return _not_found('Program not found')
+        counts = (await _enrollment_counts(session, [program_id]))[program_id]
+    etag = program_etag(program, counts)
+    if _is_not_modified(request, etag):
+        return _not_modified(etag)
+    return _with_validators(JSONResponse(dict(program.to_dict(), enrollments=counts)), etag)
+
+
+@rate_limited('100 per minute', 'programs.get_program_enrollments')
+@jwt_required
+async def get_program_enrollments(request):
+    program_id = request.path_params['program_id']
+    try:
+        after, limit = parse_page_args(args=request.query_params)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    async with request.app.state.sessionmaker() as session:
+        if await session.get(HealthProgram, program_id) is None:
+            return _not_found('Program not found')
+        statement = (select(ClientProgram)
+                     .options(joinedload(ClientProgram.client))
+                     .where(ClientProgram.program_id == program_id))
+        status = request.query_params.get('status')
+        if status:
+            statement = statement.where(ClientProgram.status == status)
+        rows, next_cursor = await _keyset_page(session, statement, ClientProgram.id, after, limit)
+        result = [row.ClientProgram.to_dict(include_client=True) for row in rows]
+    return _page_response(request, result, next_cursor, limit)
+
+
+async def health(request):
+    return JSONResponse({'status': 'ok', 'redis': {'breaker': request.app.state.redis.breaker.state}})
+
+
+@jwt_required
+async def health_details(request):
+    store = request.app.state.redis
+    try:
+        redis_status = {'ok': bool(await store.ping())}
+    except Exception as e:
+        redis_status = {'ok': False, 'error': str(e)}
+    redis_status['breaker'] = store.breaker.snapshot()
+    return JSONResponse({'status': 'ok', 'redis': redis_status})
@@ -0,0 +1,519 @@
+import json
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+import redis
+from flask import current_app
+
+from . import metrics
+
+CLIENTS_NAMESPACE = 'clients'
+CLIENT_DETAIL_NAMESPACE = 'client_detail'
+INVALIDATION_CHANNEL = 'cache:invalidate'
+
+# Readers that lose the rebuild race poll for the winner's result this long
+# before giving up and querying the database themselves.
+LOCK_WAIT_SECONDS = 1.0
+LOCK_POLL_INTERVAL = 0.05
+
+# Per-record invalidation counters only need to outlive a cache fill in progress.
+RECORD_VERSION_TTL = 3600
+
+
+class CacheStats:
+    """Per-process cache counters, keyed by namespace."""
+
+    FIELDS = ('hits', 'misses', 'rebuilds', 'early_refreshes', 'lock_waits', 'lock_timeouts', 'errors')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def incr(self, namespace, field, amount=1):
+        with self._lock:
+            self._counters.setdefault(namespace, Counter())[field] += amount
+        metrics.record_cache(namespace, field, amount)
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for namespace, counter in self._counters.items():
+                stats = {field: counter[field] for field in self.FIELDS}
+                lookups = stats['hits'] + stats['misses']
+                stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+                result[namespace] = stats
+            return {'pid': os.getpid(), 'namespaces': result}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+stats = CacheStats()
+
+
+def generation_key(namespace):
+    return f'cache:gen:{namespace}'
+
+
+def get_generation(redis_client, namespace):
+    """Return the current generation number of ``namespace`` (0 if never bumped)."""
+    return int(redis_client.get(generation_key(namespace)) or 0)
+
+
+def bump_generation(redis_client, namespace):
+    """Invalidate every entry of ``namespace`` by moving readers to a new generation.
+
+    Old entries are never deleted explicitly; nobody builds their keys any more
+    and they age out through their TTL.
+    """
+    if redis_client is None:
+        return None
+    try:
+        return redis_client.incr(generation_key(namespace))
+    except redis.RedisError as e:
+        stats.incr(namespace, 'errors')
+        current_app.logger.error(f"Redis cache error: {e}")
+        return None
+
+
+def entry_key(namespace, generation, parts):
+    return f'cache:{namespace}:v{generation}:' + ':'.join(str(part) for part in parts)
+
+
+def record_key(namespace, key):
+    return f'cache:{namespace}:{key}'
+
+
+def record_version_key(namespace, key):
+    return f'cache:{namespace}:{key}:ver'
+
+
+def make_entry(value, delta, ttl):
+    """Serialized cache entry; ``delta`` is how long the value took to build."""
+    return json.dumps({'value': value, 'delta': delta, 'expiry': time.time() + ttl})
+
+
+def should_refresh_early(entry, beta):
+    """Probabilistic early expiration ("XFetch").
+
+    The closer an entry is to expiring, and the longer it took to build, the
+    more likely a reader volunteers to rebuild it before it actually expires.
+    """
+    delta = entry.get('delta', 0)
+    expiry = entry.get('expiry', 0)
+    return time.time() - delta * beta * math.log(random.random() or 1e-12) >= expiry
+
+
+def _build_and_store(redis_client, key, builder, ttl, namespace):
+    started = time.time()
+    value = builder()
+    try:
+        redis_client.setex(key, ttl, make_entry(value, time.time() - started, ttl))
+    except redis.RedisError as e:
+        stats.incr(namespace, 'errors')
+        current_app.logger.error(f"Redis cache error: {e}")
+    stats.incr(namespace, 'rebuilds')
+    return value
+
+
+def _release_lock(redis_client, lock_key, token):
+    try:
+        if redis_client.get(lock_key) == token:
+            redis_client.delete(lock_key)
+    except redis.RedisError:
+        pass
+
+
+def get_or_build(redis_client, namespace, parts, builder, ttl=300, beta=1.0, generation=None):
+    """Return a cached value for ``parts`` in ``namespace``, building it on a miss.
+
+    Keys embed the namespace generation, so a single INCR on write invalidates
+    every page at once. Only one worker rebuilds a missing entry: it takes a
+    short ``SET NX`` lock while the others poll for its result. ``builder`` must
+    return something JSON-serializable. Pass ``generation`` if the caller has
+    already read it.
+    """
+    if redis_client is None:
+        return builder()
+
+    try:
+        if generation is None:
+            generation = get_generation(redis_client, namespace)
+        key = entry_key(namespace, generation, parts)
+        cached = redis_client.get(key)
+    except redis.RedisError as e:
+        stats.incr(namespace, 'errors')
+        current_app.logger.error(f"Redis cache error: {e}")
+        return builder()
+
+    lock_key = key + ':lock'
+    lock_ttl_ms = int(LOCK_WAIT_SECONDS * 1000) * 5
+
+    if cached is not None:
+        stats.incr(namespace, 'hits')
+        entry = json.loads(cached)
+        if should_refresh_early(entry, beta):
+            token = uuid.uuid4().hex
+            try:
+                acquired = redis_client.set(lock_key, token, nx=True, px=lock_ttl_ms)
+            except redis.RedisError:
+                acquired = False
+            if acquired:
+                stats.incr(namespace, 'early_refreshes')
+                try:
+                    return _build_and_store(redis_client, key, builder, ttl, namespace)
+                finally:
+                    _release_lock(redis_client, lock_key, token)
+        return entry['value']
+
+    stats.incr(namespace, 'misses')
+    token = uuid.uuid4().hex
+    try:
+        acquired = redis_client.set(lock_key, token, nx=True, px=lock_ttl_ms)
+    except redis.RedisError as e:
+        stats.incr(namespace, 'errors')
+        current_app.logger.error(f"Redis cache error: {e}")
+        return builder()
+
+    if acquired:
+        try:
+            return _build_and_store(redis_client, key, builder, ttl, namespace)
+        finally:
+            _release_lock(redis_client, lock_key, token)
+
+    # Someone else is rebuilding this entry; wait for it rather than piling
+    # onto the database.
+    stats.incr(namespace, 'lock_waits')
+    deadline = time.time() + LOCK_WAIT_SECONDS
+    while time.time() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        try:
+            cached = redis_client.get(key)
+        except redis.RedisError:
+            break
+        if cached is not None:
+            return json.loads(cached)['value']
+    stats.incr(namespace, 'lock_timeouts')
+    return builder()
+
+
+class LocalCache:
+    """Bounded, thread-safe LRU with a per-entry TTL, local to one process.
+
+    Entries only live ``ttl`` seconds, which bounds staleness if an
+    invalidation message is ever missed. Every delete or clear moves
+    ``generation``; a fill passes the generation it started under to ``set``,
+    so a value loaded before an invalidation is not stored after it.
+    """
+
+    def __init__(self, maxsize=10000, ttl=60.0):
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self._generation = 0
+        self.configure(maxsize, ttl)
+
+    def configure(self, maxsize, ttl):
+        with self._lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            self._data.clear()
+            self._generation += 1
+            self._stats = Counter()
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self._stats['misses'] += 1
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._data.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def set(self, key, value, generation=None):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            self._generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._generation += 1
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self._stats['hits'],
+                'misses': self._stats['misses'],
+                'evictions': self._stats['evictions'],
+                'expirations': self._stats['expirations'],
+                'hit_rate': round(self._stats['hits'] / lookups, 4) if lookups else None
+            }
+
+
+local_clients = LocalCache()
+
+
+class InvalidationListener:
+    """Background thread that applies invalidations published by other workers.
+
+    Messages are ``<namespace>:<key>`` or ``<namespace>:*``. Each process owns
+    its own thread; ``ensure_running`` notices a fork and starts a new one.
+    While the subscription is down, L1 TTLs bound staleness, and the cache is
+    cleared on reconnect because messages may have been missed.
+    """
+
+    RECONNECT_DELAY = 5.0
+
+    def __init__(self, store, caches):
+        self._store = store
+        self._caches = caches
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_running(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            thread = threading.Thread(target=self._run, name='cache-invalidation', daemon=True)
+            thread.start()
+
+    def apply(self, message):
+        namespace, _, key = message.partition(':')
+        cache = self._caches.get(namespace)
+        if cache is None:
+            return
+        if key == '*':
+            cache.clear()
+        else:
+            cache.delete(key)
+
+    def _run(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            client = self._store.client
+            if client is None:
+                time.sleep(self.RECONNECT_DELAY)
+                continue
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                for cache in self._caches.values():
+                    cache.clear()
+                while self._pid == pid and self._store.client is client:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message['type'] == 'message':
+                        data = message['data']
+                        self.apply(data.decode() if isinstance(data, bytes) else data)
+            except redis.RedisError:
+                time.sleep(self.RECONNECT_DELAY)
+            finally:
+                try:
+                    pubsub.close()
+                except redis.RedisError:
+                    pass
+
+
+def publish_invalidation(redis_client, namespace, key='*'):
+    """Evict ``namespace:key`` from Redis and from every worker's L1 cache.
+
+    The record's version counter is bumped before the record is deleted; see
+    ``_store_records`` for why the order matters.
+    """
+    local_cache = _local_caches.get(namespace)
+    if local_cache is not None:
+        if key == '*':
+            local_cache.clear()
+        else:
+            local_cache.delete(str(key))
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        if key != '*':
+            pipe.incr(record_version_key(namespace, key))
+            pipe.expire(record_version_key(namespace, key), RECORD_VERSION_TTL)
+            pipe.delete(record_key(namespace, key))
+        pipe.publish(INVALIDATION_CHANNEL, f'{namespace}:{key}')
+        pipe.execute()
+    except redis.RedisError as e:
+        stats.incr(namespace, 'errors')
+        current_app.logger.error(f"Redis cache error: {e}")
+
+
+def _store_records(redis_client, namespace, values, versions, ttl):
+    """Write loaded ``{key: record}`` back to Redis unless invalidated meanwhile.
+
+    ``versions`` maps each key to its version counter as read before loading,
+    or is None if Redis could not be read, in which case nothing is written.
+    The records are written, then the counters read again, and any that
+    moved are deleted. ``publish_invalidation`` bumps the counter before
+    deleting, so either that read sees the bump or the writer's delete lands
+    after our write. Returns the keys whose records are still current.
+    """
+    if versions is None:
+        return list(values)
+    keys = list(values)
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.setex(record_key(namespace, key), ttl, json.dumps(values[key]))
+        pipe.mget([record_version_key(namespace, key) for key in keys])
+        current = pipe.execute()[-1]
+        stale = {key for key, version in zip(keys, current) if version != versions[key]}
+        if stale:
+            redis_client.delete(*[record_key(namespace, key) for key in stale])
+    except redis.RedisError as e:
+        stats.incr(namespace, 'errors')
+        current_app.logger.error(f"Redis cache error: {e}")
+        return []
+    return [key for key in keys if key not in stale]
+
+
+def get_cached_record(redis_client, namespace, key, loader, ttl=300):
+    """Two-level lookup: process-local LRU, then Redis, then ``loader()``.
+
+    ``loader`` returns a JSON-serializable record or None when it does not
+    exist; missing records are not cached. A record invalidated while it was
+    being loaded is returned but not cached.
+    """
+    local_cache = _local_cache(namespace)
+    key = str(key)
+    value = local_cache.get(key)
+    if value is not None:
+        stats.incr(namespace, 'hits')
+        return value
+
+    local_generation = local_cache.generation
+    redis_key = record_key(namespace, key)
+    try:
+        cached, version = redis_client.mget(redis_key, record_version_key(namespace, key))
+        versions = {key: version}
+    except redis.RedisError as e:
+        stats.incr(namespace, 'errors')
+        current_app.logger.error(f"Redis cache error: {e}")
+        cached = versions = None
+    if cached is not None:
+        stats.incr(namespace, 'hits')
+        value = json.loads(cached)
+        local_cache.set(key, value)
+        return value
+
+    stats.incr(namespace, 'misses')
+    value = loader()
+    if value is None:
+        return None
+    if _store_records(redis_client, namespace, {key: value}, versions, ttl):
+        local_cache.set(key, value, generation=local_generation)
+    stats.incr(namespace, 'rebuilds')
+    return value
+
+
+def get_cached_records(redis_client, namespace, keys, loader, ttl=300):
+    """Batch form of ``get_cached_record``: ``{key: record or None}`` for ``keys``.
+
+    Keys missing from the process-local LRU are fetched with one MGET; the
+    rest are handed to ``loader(keys)`` in one call, which returns
+    ``{key: record}`` for those that exist. Loaded records are written back
+    to Redis in one pipeline, unless invalidated while loading.
+    """
+    local_cache = _local_cache(namespace)
+    local_generation = local_cache.generation
+    keys = [str(key) for key in dict.fromkeys(keys)]
+    found = {}
+    pending = []
+    for key in keys:
+        value = local_cache.get(key)
+        if value is not None:
+            found[key] = value
+        else:
+            pending.append(key)
+
+    versions = None
+    if pending:
+        try:
+            cached = redis_client.mget([record_key(namespace, key) for key in pending]
+                                       + [record_version_key(namespace, key) for key in pending])
+            versions = dict(zip(pending, cached[len(pending):]))
+        except redis.RedisError as e:
+            stats.incr(namespace, 'errors')
+            current_app.logger.error(f"Redis cache error: {e}")
+            cached = [None] * len(pending)
+        missing = []
+        for key, raw in zip(pending, cached):
+            if raw is None:
+                missing.append(key)
+                continue
+            value = json.loads(raw)
+            local_cache.set(key, value)
+            found[key] = value
+        pending = missing
+    stats.incr(namespace, 'hits', len(keys) - len(pending))
+
+    if pending:
+        stats.incr(namespace, 'misses', len(pending))
+        loaded = {str(key): value for key, value in loader(pending).items()}
+        if loaded:
+            for key in _store_records(redis_client, namespace, loaded, versions, ttl):
+                local_cache.set(key, loaded[key], generation=local_generation)
+            stats.incr(namespace, 'rebuilds', len(loaded))
+        found.update(loaded)
+    return {key: found.get(key) for key in keys}
+
+
+_local_caches = {CLIENT_DETAIL_NAMESPACE: local_clients}
+_listener = None
+
+
+def _local_cache(namespace):
+    """The L1 cache of ``namespace``, with this process listening for invalidations.
+
+    The listener starts on first use rather than in ``init_app``, so the
+    gunicorn master and CLI commands never open a subscription, and a forked
+    worker starts its own.
+    """
+    if _listener is not None and local_clients.maxsize > 0:
+        _listener.ensure_running()
+    return _local_caches[namespace]
+
+
+def init_app(app, redis_client):
+    """Size the process-local caches; the invalidation listener starts lazily."""
+    global _listener
+    local_clients.configure(app.config.get('CLIENT_L1_MAXSIZE', 10000),
+                            app.config.get('CLIENT_L1_TTL', 60))
+    if _listener is None:
+        _listener = InvalidationListener(redis_client, _local_caches)
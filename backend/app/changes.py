@@ -0,0 +1,253 @@
+"""Change feed for incremental client and enrollment sync.
+
+Triggers append a row to ``change_log`` for every insert, update and delete
+of a client or enrollment, in the same transaction as the write. Deletes
+leave a record too. ``GET /api/v1/changes`` pages through the log by
+position, so a caller that is up to date pays for the rows that changed, not
+for the size of the tables.
+
+A position is ``(txid, id)``. On PostgreSQL, ids are handed out before
+commit, so a later id can become visible before an earlier one. A reader
+paging by id alone could step past a row that is still uncommitted. Each
+row therefore records its writing transaction, and the feed serves only
+rows from transactions older than every transaction still running
+(``txid_snapshot_xmin``). Anything committed later sorts after the cursor.
+SQLite has one writer at a time, so ``txid`` is always 0 and ``id`` alone
+orders the log.
+
+``flask changes-prune`` drops entries older than ``CHANGES_RETENTION_DAYS``.
+A cursor from before the pruned horizon can no longer be served, so the
+caller has to resync from scratch.
+"""
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import DDL, event, func, text, tuple_
+
+from .extensions import db
+from .models.models import ChangeLog, ChangeLogHorizon, Client, ClientProgram, serialize_client
+
+DEFAULT_LIMIT = 200
+MAX_LIMIT = 500  # also keeps each page's IN lists under SQLite's parameter limit
+# entity name in the feed -> table
+ENTITIES = {'client': 'client', 'enrollment': 'client_program'}
+
+
+class CursorExpired(Exception):
+    """The cursor predates the pruned part of the change log."""
+
+
+def _sqlite_ddl():
+    statements = []
+    for entity, table in ENTITIES.items():
+        for event_name, suffix, row, op in (('INSERT', 'ai', 'new', 'upsert'),
+                                            ('UPDATE', 'au', 'new', 'upsert'),
+                                            ('DELETE', 'ad', 'old', 'delete')):
+            statements.append(
+                f"CREATE TRIGGER IF NOT EXISTS changes_{table}_{suffix} AFTER {event_name} ON {table} BEGIN "
+                "INSERT INTO change_log (txid, entity, entity_id, op, changed_at) "
+                f"VALUES (0, '{entity}', {row}.id, '{op}', strftime('%Y-%m-%d %H:%M:%S', 'now')); END")
+    return tuple(statements)
+
+
+def _postgresql_ddl():
+    statements = [
+        "CREATE OR REPLACE FUNCTION log_change() RETURNS trigger AS $$ BEGIN "
+        "IF TG_OP = 'DELETE' THEN "
+        "INSERT INTO change_log (txid, entity, entity_id, op, changed_at) "
+        "VALUES (txid_current(), TG_ARGV[0], OLD.id, 'delete', now() AT TIME ZONE 'utc'); "
+        "ELSE "
+        "INSERT INTO change_log (txid, entity, entity_id, op, changed_at) "
+        "VALUES (txid_current(), TG_ARGV[0], NEW.id, 'upsert', now() AT TIME ZONE 'utc'); "
+        "END IF; RETURN NULL; END $$ LANGUAGE plpgsql",
+    ]
+    for entity, table in ENTITIES.items():
+        statements.append(f"DROP TRIGGER IF EXISTS changes_{table} ON {table}")
+        statements.append(f"CREATE TRIGGER changes_{table} AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                          f"FOR EACH ROW EXECUTE FUNCTION log_change('{entity}')")
+    return tuple(statements)
+
+
+SQLITE_DDL = _sqlite_ddl()
+POSTGRESQL_DDL = _postgresql_ddl()
+
+for _statement in SQLITE_DDL:
+    # DDL() applies %-formatting; the strftime pattern has to survive it
+    event.listen(db.metadata, 'after_create',
+                 DDL(_statement.replace('%', '%%')).execute_if(dialect='sqlite'))
+for _statement in POSTGRESQL_DDL:
+    event.listen(db.metadata, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+
+
+def install(connection):
+    """Create the change log triggers on an existing database (idempotent)."""
+    statements = {'sqlite': SQLITE_DDL, 'postgresql': POSTGRESQL_DDL}.get(connection.dialect.name, ())
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def format_cursor(position):
+    return f'{position[0]}.{position[1]}'
+
+
+def parse_cursor(cursor):
+    """``(txid, id)`` from a cursor string; raises ValueError on bad input."""
+    txid, _, change_id = cursor.partition('.')
+    try:
+        position = (int(txid), int(change_id))
+    except ValueError:
+        raise ValueError('since must be a cursor returned by this endpoint')
+    if position[0] < 0 or position[1] < 0:
+        raise ValueError('since must be a cursor returned by this endpoint')
+    return position
+
+
+def _servable():
+    # Skip rows of transactions that might still have uncommitted siblings
+    return ChangeLog.txid < func.txid_snapshot_xmin(func.txid_current_snapshot())
+
+
+def _visible(query, session):
+    if session.connection().dialect.name == 'postgresql':
+        query = query.filter(_servable())
+    return query
+
+
+def head_statements(dialect_name):
+    """``(head, horizon)`` statements behind ``head_version``, for sync and async sessions.
+
+    ``head`` selects the newest servable ``(txid, id, changed_at)``; when the
+    log is empty, ``horizon`` selects the pruned position instead.
+    """
+    head = (db.select(ChangeLog.txid, ChangeLog.id, ChangeLog.changed_at)
+            .order_by(ChangeLog.txid.desc(), ChangeLog.id.desc()).limit(1))
+    if dialect_name == 'postgresql':
+        head = head.where(_servable())
+    return head, db.select(ChangeLogHorizon.txid, ChangeLogHorizon.change_id)
+
+
+def version_from_rows(head, horizon):
+    """``(cursor, changed_at)`` from the rows ``head_statements`` selected."""
+    if head is None:
+        return format_cursor(tuple(horizon) if horizon else (0, 0)), None
+    return format_cursor((head.txid, head.id)), head.changed_at
+
+
+def head_version():
+    """Cursor and time of the newest servable change.
+
+    Every committed client or enrollment write moves it, whether or not
+    Redis was reachable at the time, so it versions cached client data.
+    ``changed_at`` is None once the log has been pruned empty.
+    """
+    session = db.session
+    head, horizon = head_statements(session.connection().dialect.name)
+    row = session.execute(head).first()
+    return version_from_rows(row, session.execute(horizon).first() if row is None else None)
+
+
+def head_cursor():
+    """Cursor of the newest servable change: where a fresh full sync should continue from."""
+    return head_version()[0]
+
+
+def _load(entity, ids):
+    if not ids:
+        return {}
+    if entity == 'client':
+        columns = (Client.id, Client.name, Client.date_of_birth, Client.contact_info,
+                   Client.created_at, Client.updated_at)
+        rows = db.session.query(*columns).filter(Client.id.in_(ids))
+        return {row.id: serialize_client(row) for row in rows}
+    rows = ClientProgram.query.filter(ClientProgram.id.in_(ids))
+    return {row.id: row.to_dict() for row in rows}
+
+
+def get_changes(since, limit=DEFAULT_LIMIT):
+    """Changes after the ``since`` position: ``{'changes', 'cursor', 'has_more'}``.
+
+    Each entity appears at most once per page, at the position of its latest
+    change, carrying its current state (or ``op: delete`` if it is gone).
+    Raises CursorExpired if the log has been pruned past ``since``.
+    """
+    session = db.session
+    horizon = session.query(ChangeLogHorizon.txid, ChangeLogHorizon.change_id).first()
+    if horizon is not None and since < tuple(horizon):
+        raise CursorExpired('Changes before this cursor have been pruned; resync from the full lists')
+
+    query = (session.query(ChangeLog.txid, ChangeLog.id, ChangeLog.entity, ChangeLog.entity_id, ChangeLog.op)
+             .filter(tuple_(ChangeLog.txid, ChangeLog.id) > tuple_(*since)))
+    rows = (_visible(query, session)
+            .order_by(ChangeLog.txid, ChangeLog.id)
+            .limit(limit + 1).all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    latest = {}
+    for row in rows:
+        key = (row.entity, row.entity_id)
+        latest.pop(key, None)  # re-insert so the entity sorts by its latest change
+        latest[key] = row.op
+    loaded = {entity: _load(entity, [entity_id for (kind, entity_id), op in latest.items()
+                                     if kind == entity and op == 'upsert'])
+              for entity in ENTITIES}
+
+    changes = []
+    for (entity, entity_id), op in latest.items():
+        data = loaded[entity].get(entity_id) if op == 'upsert' else None
+        if data is None:
+            # Deleted (possibly later in the log than this page reaches)
+            changes.append({'type': entity, 'id': entity_id, 'op': 'delete'})
+        else:
+            changes.append({'type': entity, 'id': entity_id, 'op': 'upsert', 'data': data})
+    cursor = format_cursor((rows[-1].txid, rows[-1].id)) if rows else format_cursor(since)
+    return {'changes': changes, 'cursor': cursor, 'has_more': has_more}
+
+
+def prune(connection, older_than):
+    """Delete log entries written before ``older_than``; returns how many were removed."""
+    log = ChangeLog.__table__
+    horizon = ChangeLogHorizon.__table__
+    last = connection.execute(
+        db.select(log.c.txid, log.c.id).where(log.c.changed_at < older_than)
+        .order_by(log.c.txid.desc(), log.c.id.desc()).limit(1)).first()
+    if last is None:
+        return 0
+    # Cut at a position rather than a time so the horizon check stays exact
+    deleted = connection.execute(
+        log.delete().where(tuple_(log.c.txid, log.c.id) <= tuple_(last.txid, last.id))).rowcount
+    values = {'txid': last.txid, 'change_id': last.id}
+    if not connection.execute(horizon.update().where(horizon.c.id == 1).values(**values)).rowcount:
+        connection.execute(horizon.insert().values(id=1, **values))
+    return deleted
+
+
+@click.command('changes-prune')
+@click.option('--days', type=int, default=None, help='Keep this many days (default CHANGES_RETENTION_DAYS).')
+@click.option('--every', type=int, default=None, metavar='SECONDS',
+              help='Keep running and prune every SECONDS.')
+@with_appcontext
+def changes_prune_command(days, every):
+    """Drop change feed entries older than the retention period."""
+    if days is None:
+        days = current_app.config.get('CHANGES_RETENTION_DAYS', 30)
+    while True:
+        try:
+            with db.engine.begin() as connection:
+                deleted = prune(connection, datetime.utcnow() - timedelta(days=days))
+        except Exception as e:
+            if not every:
+                raise
+            current_app.logger.error(f'Change log pruning failed: {e}')
+        else:
+            click.echo(f'Pruned {deleted} change log entries older than {days} days.')
+        if not every:
+            break
+        time.sleep(every)
+
+
+def init_app(app):
+    app.cli.add_command(changes_prune_command)
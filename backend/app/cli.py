@@ -0,0 +1,59 @@
+"""Deployment commands kept out of app construction.
+
+Workers start without touching the database; run ``flask db upgrade`` and
+then ``flask bootstrap`` once per deploy instead. A database that was built by
+``db.create_all()`` before migrations existed has no alembic_version yet:
+run ``flask db stamp a59b57076a50`` (the initial schema) once, then upgrade.
+"""
+import os
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from . import dedup
+from .extensions import db
+from .models.models import User
+
+
+def seed_admin(username, password):
+    """Create the admin user unless it already exists. Returns True if created."""
+    if User.query.filter_by(username=username).first():
+        return False
+    admin = User(username=username)
+    admin.set_password(password)
+    db.session.add(admin)
+    db.session.commit()
+    return True
+
+
+def bootstrap_database(create_schema=False):
+    """Seed default data, optionally creating tables first (local development)."""
+    if create_schema:
+        db.create_all()
+    config = current_app.config
+    return seed_admin(config['ADMIN_USERNAME'], config['ADMIN_PASSWORD'])
+
+
+@click.command('bootstrap')
+@click.option('--create-schema', is_flag=True,
+              help='Create tables with create_all instead of migrations (local development only).')
+@with_appcontext
+def bootstrap_command(create_schema):
+    """Seed the admin user and backfill derived data (run after `flask db upgrade`)."""
+    if bootstrap_database(create_schema=create_schema):
+        click.echo(f"Created admin user '{current_app.config['ADMIN_USERNAME']}'.")
+    else:
+        click.echo('Admin user already exists.')
+    with db.engine.begin() as connection:
+        if dedup.needs_backfill(connection):
+            click.echo(f'Indexed {dedup.rebuild(connection)} clients for duplicate detection.')
+
+
+def init_app(app):
+    app.cli.add_command(bootstrap_command)
+    # Flask-Migrate imports Alembic, which costs more than the rest of app
+    # construction; only the `flask` command line (`flask db ...`) needs it.
+    if os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        from flask_migrate import Migrate
+        Migrate(app, db)
@@ -0,0 +1,189 @@
+"""Cohort queries: declarative client filters compiled to one SQL statement.
+
+A filter looks like::
+
+    {"age": {"min": 15, "max": 24},
+     "enrollment": {"program_ids": [3], "status": ["active"], "enrolled_from": "2026-03-01"}}
+
+Every ``enrollment`` condition applies to the same enrollment. ``program_names``
+matches programs by exact name. Age is taken in whole years as of today,
+which turns it into a ``date_of_birth`` range, so nothing is filtered in
+Python.
+
+The statement is ``client.id IN (enrollments ...)`` plus the birth date
+range. ``ix_client_program_cohort`` (program, status, enrollment date,
+client) answers the enrollment part from the index alone, and
+``ix_client_date_of_birth`` answers the age part. A filter naming neither
+a program nor an age has to scan.
+
+Results are cached per filter hash and data version. The version is the
+change feed's head cursor, which moves on every client or enrollment write
+(see app/changes.py), so no write has to remember to invalidate cohorts.
+Program renames are not in the feed; results filtered by program name can
+lag one for up to ``COHORT_CACHE_TTL``.
+"""
+import hashlib
+import json
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import func, or_
+
+from . import changes
+from .cache import get_or_build
+from .extensions import db
+from .models.models import ENROLLMENT_STATUSES, Client, ClientProgram, HealthProgram
+
+COHORTS_NAMESPACE = 'cohorts'
+MAX_AGE = 150
+MAX_LIST = 100  # programs or statuses per filter
+SELECTS = ('ids', 'count')
+
+
+def _years_before(day, years):
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)  # 29 February
+
+
+def _int_list(value, field):
+    if (not isinstance(value, list) or not value or len(value) > MAX_LIST
+            or any(not isinstance(item, int) or isinstance(item, bool) for item in value)):
+        raise ValueError(f'{field} must be a non-empty list of at most {MAX_LIST} integers')
+    return sorted(set(value))
+
+
+def _str_list(value, field, allowed=None):
+    if (not isinstance(value, list) or not value or len(value) > MAX_LIST
+            or any(not isinstance(item, str) for item in value)):
+        raise ValueError(f'{field} must be a non-empty list of at most {MAX_LIST} strings')
+    if allowed is not None and any(item not in allowed for item in value):
+        raise ValueError(f'{field} must be one of: {", ".join(allowed)}')
+    return sorted(set(value))
+
+
+def _date(value, field):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} must be formatted YYYY-MM-DD')
+
+
+def normalize_filter(spec):
+    """Validate a filter and return its canonical form; raises ValueError."""
+    if not isinstance(spec, dict):
+        raise ValueError('filter must be an object')
+    unknown = set(spec) - {'age', 'enrollment'}
+    if unknown:
+        raise ValueError(f'Unknown filter fields: {", ".join(sorted(unknown))}')
+    normalized = {}
+
+    age = spec.get('age')
+    if age is not None:
+        if not isinstance(age, dict) or not age or set(age) - {'min', 'max'}:
+            raise ValueError('age must be an object with min and/or max')
+        for bound in age.values():
+            if not isinstance(bound, int) or isinstance(bound, bool) or not 0 <= bound <= MAX_AGE:
+                raise ValueError(f'age bounds must be integers between 0 and {MAX_AGE}')
+        if age.get('min', 0) > age.get('max', MAX_AGE):
+            raise ValueError('age min must not exceed max')
+        normalized['age'] = dict(age)
+
+    enrollment = spec.get('enrollment')
+    if enrollment is not None:
+        fields = {'program_ids', 'program_names', 'status', 'enrolled_from', 'enrolled_to'}
+        if not isinstance(enrollment, dict) or set(enrollment) - fields:
+            raise ValueError(f'enrollment may only contain: {", ".join(sorted(fields))}')
+        result = {}
+        if 'program_ids' in enrollment:
+            result['program_ids'] = _int_list(enrollment['program_ids'], 'program_ids')
+        if 'program_names' in enrollment:
+            result['program_names'] = _str_list(enrollment['program_names'], 'program_names')
+        if 'status' in enrollment:
+            result['status'] = _str_list(enrollment['status'], 'status', ENROLLMENT_STATUSES)
+        for field in ('enrolled_from', 'enrolled_to'):
+            if field in enrollment:
+                result[field] = _date(enrollment[field], field).isoformat()
+        if result.get('enrolled_from', '') > result.get('enrolled_to', '9999'):
+            raise ValueError('enrolled_from must not be after enrolled_to')
+        normalized['enrollment'] = result
+
+    if not normalized:
+        raise ValueError('filter needs at least one of age or enrollment')
+    return normalized
+
+
+def _start_of(day):
+    return datetime.combine(date.fromisoformat(day), time.min)
+
+
+def filter_hash(normalized):
+    return hashlib.sha1(json.dumps(normalized, sort_keys=True).encode()).hexdigest()[:20]
+
+
+def compile_filter(normalized, today):
+    """SQL conditions on ``client`` for a normalized filter."""
+    client = Client.__table__
+    conditions = []
+
+    age = normalized.get('age')
+    if age:
+        # Aged at least min: born on or before today minus min years.
+        # Aged at most max: born after today minus (max + 1) years.
+        if 'min' in age:
+            conditions.append(client.c.date_of_birth <= _years_before(today, age['min']))
+        if 'max' in age:
+            conditions.append(client.c.date_of_birth > _years_before(today, age['max'] + 1))
+
+    enrollment = normalized.get('enrollment')
+    if enrollment is not None:
+        cp = ClientProgram.__table__
+        where = []
+        programs = []
+        if 'program_ids' in enrollment:
+            programs.append(cp.c.program_id.in_(enrollment['program_ids']))
+        if 'program_names' in enrollment:
+            program = HealthProgram.__table__
+            programs.append(cp.c.program_id.in_(
+                db.select(program.c.id).where(program.c.name.in_(enrollment['program_names']))))
+        if programs:
+            where.append(or_(*programs))
+        if 'status' in enrollment:
+            where.append(cp.c.status.in_(enrollment['status']))
+        if 'enrolled_from' in enrollment:
+            where.append(cp.c.enrollment_date >= _start_of(enrollment['enrolled_from']))
+        if 'enrolled_to' in enrollment:
+            # Inclusive of the whole last day
+            where.append(cp.c.enrollment_date < _start_of(enrollment['enrolled_to']) + timedelta(days=1))
+        conditions.append(client.c.id.in_(db.select(cp.c.client_id).where(*where)))
+    return conditions
+
+
+def _run(normalized, select, after, limit, today):
+    client = Client.__table__
+    conditions = compile_filter(normalized, today)
+    if select == 'count':
+        statement = db.select(func.count()).select_from(client).where(*conditions)
+        return {'count': db.session.execute(statement).scalar()}
+    statement = (db.select(client.c.id).where(client.c.id > after, *conditions)
+                 .order_by(client.c.id).limit(limit + 1))
+    ids = [row[0] for row in db.session.execute(statement)]
+    next_cursor = ids[limit - 1] if len(ids) > limit else None
+    return {'ids': ids[:limit], 'next': next_cursor}
+
+
+def query_cohort(redis_client, spec, select='ids', after=0, limit=100, ttl=300, today=None):
+    """Run a cohort filter; returns ``{'ids', 'next'}`` or ``{'count'}`` plus the filter hash.
+
+    Raises ValueError for an invalid filter.
+    """
+    if select not in SELECTS:
+        raise ValueError('select must be ids or count')
+    normalized = normalize_filter(spec)
+    today = today or datetime.utcnow().date()
+    digest = filter_hash(normalized)
+    version = changes.head_cursor()
+    parts = (digest, today.isoformat(), select, after, limit)
+    result = get_or_build(redis_client, COHORTS_NAMESPACE, parts,
+                          lambda: _run(normalized, select, after, limit, today), ttl=ttl, generation=version)
+    return {**result, 'filter_hash': digest, 'version': version}
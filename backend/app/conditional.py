@@ -0,0 +1,86 @@
+"""HTTP validators (ETag / Last-Modified) for JSON resources.
+
+Views compute the validators from a version they already have at hand (a
+record's ``updated_at``, the change log head) and answer a matching
+``If-None-Match``/``If-Modified-Since`` with an empty 304 before rendering
+any JSON.
+
+The ETag builders and ``validators_match``/``validator_headers`` take no
+request, so the async views (app/aio/views.py) use the same ones and both
+servers hand out interchangeable validators.
+"""
+import hashlib
+from datetime import datetime, timezone
+
+from flask import Response, request
+from werkzeug.http import http_date, quote_etag
+
+from .cache import CLIENT_DETAIL_NAMESPACE, CLIENTS_NAMESPACE
+
+# Clients may keep a copy but must revalidate it each time; patient data never
+# belongs in shared caches.
+CACHE_CONTROL = 'private, no-cache'
+
+
+def make_etag(*parts):
+    """Strong ETag value derived from the resource's version ``parts``."""
+    return hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def client_page_etag(version, after, limit):
+    return make_etag(CLIENTS_NAMESPACE, version, after, limit)
+
+
+def client_etag(client):
+    """ETag of a serialized client."""
+    return make_etag(CLIENT_DETAIL_NAMESPACE, client['id'], client['updated_at'])
+
+
+def program_etag(program, counts):
+    # Enrollment changes do not touch program.updated_at, so the counts are
+    # part of the version; they come from summary rows, so a 304 stays cheap
+    return make_etag('program', program.id, program.updated_at, sorted(counts.items()))
+
+
+def _http_date(value):
+    if isinstance(value, (int, float)):
+        value = datetime.fromtimestamp(value, timezone.utc)
+    elif isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)  # stored timestamps are naive UTC
+    return value.replace(microsecond=0)
+
+
+def validators_match(etag, last_modified, if_none_match, if_modified_since):
+    """True when parsed conditional headers show the client already has this version.
+
+    As in RFC 9110, ``If-None-Match`` wins over ``If-Modified-Since`` when both are sent.
+    """
+    if if_none_match:
+        return if_none_match.contains_weak(etag)
+    if last_modified is not None and if_modified_since is not None:
+        return _http_date(last_modified) <= if_modified_since
+    return False
+
+
+def is_not_modified(etag, last_modified=None):
+    """``validators_match`` for the current Flask request."""
+    return validators_match(etag, last_modified, request.if_none_match, request.if_modified_since)
+
+
+def validator_headers(etag, last_modified=None):
+    headers = {'ETag': quote_etag(etag), 'Cache-Control': CACHE_CONTROL}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(_http_date(last_modified))
+    return headers
+
+
+def add_validators(response, etag, last_modified=None):
+    response.headers.update(validator_headers(etag, last_modified))
+    return response
+
+
+def not_modified(etag, last_modified=None):
+    """Empty 304 response carrying the same validators as a full one."""
+    return add_validators(Response(status=304), etag, last_modified)
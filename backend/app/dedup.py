@@ -0,0 +1,372 @@
+"""Duplicate client detection with blocking keys.
+
+Comparing every client with every other one is quadratic. Instead each
+client gets a few blocking keys in ``client_dedup_key``, and only clients
+that share a key are scored against each other:
+
+* ``n:`` the Soundex codes of the name's words, sorted, so spelling
+  variants and swapped first/last names share a key
+* ``b:`` one word's Soundex code plus a five-year birth band, so an added
+  or dropped middle name still meets its match
+* ``c:`` the normalized contact: a lowercased email, or the last nine
+  digits of a phone number
+
+Keys are written in the same flush as the client for ORM writes, and by the
+importer for bulk batches. ``flask dedup-index`` rebuilds them from scratch;
+``flask bootstrap`` does so when clients exist but no keys do (right after
+the migration that added the table).
+
+``possible_duplicates`` is the inline check run on ``create_client``: one
+indexed query over at most ``DEDUP_MAX_CANDIDATES`` rows, name and contact
+matches ahead of birth-band ones. ``flask
+dedup-clusters`` scores every block across worker processes and prints the
+resulting clusters as NDJSON.
+"""
+import json
+import multiprocessing
+import os
+import re
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from flask_sqlalchemy import SignallingSession
+from sqlalchemy import case, event, func, inspect
+
+from .extensions import db
+from .models.models import Client, ClientDedupKey
+from .streaming import stream_rows
+
+BAND_YEARS = 5
+MAX_NAME_WORDS = 8
+NAME_WEIGHT, DOB_WEIGHT, CONTACT_WEIGHT = 0.6, 0.25, 0.15
+DEFAULT_THRESHOLD = 0.85
+DEFAULT_MAX_BLOCK = 500  # the batch job skips blocks larger than this (e.g. a very common name)
+INDEXED_FIELDS = ('name', 'date_of_birth', 'contact_info')
+CHUNK = 900  # ids per IN list; older SQLite builds allow at most 999 parameters
+
+_SOUNDEX = {letter: digit for digit, letters in (('1', 'bfpv'), ('2', 'cgjkqsxz'), ('3', 'dt'),
+                                                 ('4', 'l'), ('5', 'mn'), ('6', 'r'))
+            for letter in letters}
+_NOT_LETTERS = re.compile(r'[^a-z]+')
+
+
+def name_words(name):
+    """Lowercase ASCII words of a name, accents stripped."""
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    ascii_name = decomposed.encode('ascii', 'ignore').decode().lower()
+    return _NOT_LETTERS.sub(' ', ascii_name).split()[:MAX_NAME_WORDS]
+
+
+def soundex(word):
+    code, last = word[0].upper(), _SOUNDEX.get(word[0])
+    for letter in word[1:]:
+        digit = _SOUNDEX.get(letter)
+        if digit and digit != last:
+            code += digit
+            if len(code) == 4:
+                break
+        if letter not in 'hw':
+            last = digit
+    return code.ljust(4, '0')
+
+
+def normalize_contact(contact_info):
+    value = (contact_info or '').strip().lower()
+    if '@' in value:
+        return value.replace(' ', '')
+    digits = re.sub(r'\D', '', value)
+    return digits[-9:] if len(digits) >= 7 else None
+
+
+def blocking_keys(name, date_of_birth, contact_info):
+    codes = sorted({soundex(word) for word in name_words(name)})
+    keys = set()
+    if codes:
+        keys.add('n:' + ' '.join(codes))
+    if codes and date_of_birth:
+        band = date_of_birth.year // BAND_YEARS * BAND_YEARS
+        keys.update(f'b:{code}:{band}' for code in codes)
+    contact = normalize_contact(contact_info)
+    if contact:
+        keys.add('c:' + contact[:110])
+    return keys
+
+
+def prepare(client_id, name, date_of_birth, contact_info):
+    """The form ``score`` compares: ``(id, sorted name words, date_of_birth, contact)``."""
+    return (client_id, ' '.join(sorted(name_words(name))), date_of_birth, normalize_contact(contact_info))
+
+
+def _dob_similarity(a, b):
+    if a == b:
+        return 1.0
+    if a.year == b.year and a.month == b.day and a.day == b.month:
+        return 0.8  # day and month entered the wrong way round
+    if (a.month, a.day) == (b.month, b.day) and abs(a.year - b.year) == 1:
+        return 0.5
+    return 0.0
+
+
+def score(a, b):
+    """Match score in [0, 1] for two prepared records; fields missing on either side are ignored."""
+    total = NAME_WEIGHT * SequenceMatcher(None, a[1], b[1]).ratio()
+    weight = NAME_WEIGHT
+    if a[2] and b[2]:
+        total += DOB_WEIGHT * _dob_similarity(a[2], b[2])
+        weight += DOB_WEIGHT
+    if a[3] and b[3]:
+        total += CONTACT_WEIGHT * (a[3] == b[3])
+        weight += CONTACT_WEIGHT
+    return total / weight
+
+
+# -- keeping the keys current ------------------------------------------------
+
+def delete_keys(connection, client_ids):
+    table = ClientDedupKey.__table__
+    for start in range(0, len(client_ids), CHUNK):
+        connection.execute(table.delete().where(table.c.client_id.in_(client_ids[start:start + CHUNK])))
+
+
+def insert_keys(connection, records):
+    """Add the keys of ``(id, name, date_of_birth, contact_info)`` records."""
+    rows = [{'key': key, 'client_id': record[0]}
+            for record in records for key in blocking_keys(*record[1:])]
+    if rows:
+        connection.execute(ClientDedupKey.__table__.insert(), rows)
+
+
+def index_new_clients(connection, client_ids):
+    """Add keys for a bulk batch of freshly inserted clients."""
+    client = Client.__table__
+    for start in range(0, len(client_ids), CHUNK):
+        rows = connection.execute(
+            db.select(client.c.id, client.c.name, client.c.date_of_birth, client.c.contact_info)
+            .where(client.c.id.in_(client_ids[start:start + CHUNK]))).fetchall()
+        insert_keys(connection, rows)
+
+
+def _after_flush(session, flush_context):
+    added, changed, removed = [], [], []
+    for obj in session.new:
+        if isinstance(obj, Client):
+            added.append(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Client):
+            state = inspect(obj)
+            if any(state.attrs[field].history.has_changes() for field in INDEXED_FIELDS):
+                changed.append(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Client):
+            removed.append(obj.id)
+    if not (added or changed or removed):
+        return
+    connection = session.connection()
+    if changed or removed:
+        delete_keys(connection, [obj.id for obj in changed] + removed)
+    insert_keys(connection, [(obj.id, obj.name, obj.date_of_birth, obj.contact_info)
+                             for obj in added + changed])
+
+
+event.listen(SignallingSession, 'after_flush', _after_flush)
+
+
+def rebuild(connection):
+    """Recompute every client's keys; returns the number of clients indexed."""
+    client = Client.__table__
+    connection.execute(ClientDedupKey.__table__.delete())
+    statement = (db.select(client.c.id, client.c.name, client.c.date_of_birth, client.c.contact_info)
+                 .order_by(client.c.id))
+    indexed = 0
+    for rows in stream_rows(connection, statement, batch_size=1000):
+        insert_keys(connection, rows)
+        indexed += len(rows)
+    return indexed
+
+
+def needs_backfill(connection):
+    """True when clients exist but none has keys yet."""
+    has_clients = connection.execute(db.select(Client.__table__.c.id).limit(1)).first()
+    has_keys = connection.execute(db.select(ClientDedupKey.__table__.c.client_id).limit(1)).first()
+    return has_clients is not None and has_keys is None
+
+
+# -- inline check ------------------------------------------------------------
+
+def possible_duplicates(name, date_of_birth, contact_info, exclude_id=None):
+    """Existing clients that probably are this person, best match first."""
+    keys = blocking_keys(name, date_of_birth, contact_info)
+    if not keys:
+        return []
+    config = current_app.config
+    candidates = db.session.query(ClientDedupKey.client_id).filter(ClientDedupKey.key.in_(keys))
+    if exclude_id is not None:
+        candidates = candidates.filter(ClientDedupKey.client_id != exclude_id)
+    # A common name's birth band can hold thousands of clients; take the ones
+    # sharing a name or contact key first, then those sharing the most keys.
+    selective_keys = func.sum(case((ClientDedupKey.key.like('b:%'), 0), else_=1))
+    candidates = (candidates.group_by(ClientDedupKey.client_id)
+                  .order_by(selective_keys.desc(), func.count().desc(), ClientDedupKey.client_id)
+                  .limit(config.get('DEDUP_MAX_CANDIDATES', 100)).subquery())
+    rows = (db.session.query(Client.id, Client.name, Client.date_of_birth, Client.contact_info)
+            .join(candidates, candidates.c.client_id == Client.id).all())
+
+    threshold = config.get('DEDUP_THRESHOLD', DEFAULT_THRESHOLD)
+    new = prepare(None, name, date_of_birth, contact_info)
+    matches = []
+    for row in rows:
+        match_score = score(new, prepare(*row))
+        if match_score >= threshold:
+            matches.append({'id': row.id, 'name': row.name,
+                            'date_of_birth': row.date_of_birth.isoformat() if row.date_of_birth else None,
+                            'contact_info': row.contact_info, 'score': round(match_score, 3)})
+    matches.sort(key=lambda match: (-match['score'], match['id']))
+    return matches[:config.get('DEDUP_MAX_RESULTS', 5)]
+
+
+# -- batch clustering --------------------------------------------------------
+
+def _read_blocks(connection, max_block):
+    key = ClientDedupKey.__table__
+    statement = db.select(key.c.key, key.c.client_id).order_by(key.c.key, key.c.client_id)
+    blocks, oversized = [], 0
+    current, members = None, []
+
+    def close():
+        nonlocal oversized
+        if len(members) > max_block:
+            oversized += 1
+        elif len(members) > 1:
+            blocks.append(members)
+
+    for rows in stream_rows(connection, statement, batch_size=5000):
+        for block_key, client_id in rows:
+            if block_key != current:
+                close()
+                current, members = block_key, []
+            members.append(client_id)
+    close()
+    return blocks, oversized
+
+
+def _read_records(connection, client_ids):
+    client = Client.__table__
+    statement = (db.select(client.c.id, client.c.name, client.c.date_of_birth, client.c.contact_info)
+                 .order_by(client.c.id))
+    records = {}
+    for rows in stream_rows(connection, statement, batch_size=5000):
+        for row in rows:
+            if row.id in client_ids:
+                records[row.id] = prepare(*row)
+    return records
+
+
+def _score_blocks(blocks, threshold):
+    """Matching pairs within each block: ``[(id, id, score)]`` (runs in a worker process)."""
+    matches = {}
+    for block in blocks:
+        for i, a in enumerate(block):
+            for b in block[i + 1:]:
+                pair = (a[0], b[0])
+                if pair not in matches:
+                    match_score = score(a, b)
+                    matches[pair] = match_score if match_score >= threshold else None
+    return [(a, b, match_score) for (a, b), match_score in matches.items() if match_score is not None]
+
+
+def _chunks(blocks, pairs_per_chunk):
+    chunk, pairs = [], 0
+    for block in blocks:
+        chunk.append(block)
+        pairs += len(block) * (len(block) - 1) // 2
+        if pairs >= pairs_per_chunk:
+            yield chunk
+            chunk, pairs = [], 0
+    if chunk:
+        yield chunk
+
+
+def find_clusters(connection, threshold=DEFAULT_THRESHOLD, workers=1, max_block=DEFAULT_MAX_BLOCK,
+                  pairs_per_chunk=20000):
+    """Group clients into duplicate clusters.
+
+    Returns ``(clusters, summary)``. Each cluster is ``{'client_ids', 'pairs'}``;
+    ``pairs`` lists the matches (``[id, id, score]``) that joined it.
+    """
+    blocks, oversized = _read_blocks(connection, max_block)
+    records = _read_records(connection, {client_id for block in blocks for client_id in block})
+    blocks = [[records[client_id] for client_id in block if client_id in records] for block in blocks]
+    chunks = list(_chunks(blocks, pairs_per_chunk))
+
+    if workers > 1 and len(chunks) > 1:
+        # "spawn" keeps the workers free of the parent's threads and sockets.
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            results = list(pool.map(_score_blocks, chunks, [threshold] * len(chunks)))
+    else:
+        results = [_score_blocks(chunk, threshold) for chunk in chunks]
+
+    parent = {}
+
+    def find(client_id):
+        parent.setdefault(client_id, client_id)
+        while parent[client_id] != client_id:
+            parent[client_id] = parent[parent[client_id]]
+            client_id = parent[client_id]
+        return client_id
+
+    matches = {}
+    for result in results:
+        for a, b, match_score in result:
+            matches[(a, b)] = match_score
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    clusters = {}
+    for (a, b), match_score in sorted(matches.items()):
+        cluster = clusters.setdefault(find(a), {'client_ids': set(), 'pairs': []})
+        cluster['client_ids'].update((a, b))
+        cluster['pairs'].append([a, b, round(match_score, 3)])
+    clusters = [{'client_ids': sorted(cluster['client_ids']), 'pairs': cluster['pairs']}
+                for _, cluster in sorted(clusters.items())]
+    summary = {'blocks': len(blocks), 'oversized_blocks': oversized, 'matches': len(matches),
+               'clusters': len(clusters)}
+    return clusters, summary
+
+
+@click.command('dedup-index')
+@with_appcontext
+def dedup_index_command():
+    """Rebuild the duplicate-detection blocking keys for every client."""
+    with db.engine.begin() as connection:
+        indexed = rebuild(connection)
+    click.echo(f'Indexed {indexed} clients for duplicate detection.')
+
+
+@click.command('dedup-clusters')
+@click.option('--threshold', type=float, default=None, help='Minimum match score (default DEDUP_THRESHOLD).')
+@click.option('--workers', type=int, default=None, help='Scoring processes (default: CPU count).')
+@click.option('--max-block', type=int, default=DEFAULT_MAX_BLOCK, show_default=True,
+              help='Skip blocks with more clients than this.')
+@click.option('--output', type=click.File('w'), default='-', help='Where to write NDJSON clusters.')
+@with_appcontext
+def dedup_clusters_command(threshold, workers, max_block, output):
+    """Find clusters of likely duplicate clients across the whole table."""
+    if threshold is None:
+        threshold = current_app.config.get('DEDUP_THRESHOLD', DEFAULT_THRESHOLD)
+    with db.engine.connect() as connection:
+        clusters, summary = find_clusters(connection, threshold, workers or os.cpu_count() or 1, max_block)
+    for cluster in clusters:
+        output.write(json.dumps(cluster) + '\n')
+    click.echo(f"Found {summary['clusters']} duplicate clusters from {summary['matches']} matches in "
+               f"{summary['blocks']} blocks ({summary['oversized_blocks']} oversized blocks skipped).",
+               err=True)
+
+
+def init_app(app):
+    app.cli.add_command(dedup_index_command)
+    app.cli.add_command(dedup_clusters_command)
@@ -1,14 +1,16 @@
-from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
+from .rate_limit import rate_limit_key
+from .replicas import RoutingSQLAlchemy
+from .redis_store import RedisStore
 
 # Initialize extensions
-db = SQLAlchemy()
+db = RoutingSQLAlchemy()  # routes @replica_read views to replicas
 jwt = JWTManager()
 cors = CORS()
 limiter = Limiter(
-    key_func=get_remote_address,
+    key_func=rate_limit_key,
     default_limits=["200 per day", "50 per hour"]
-) 
\ No newline at end of file
+) 
+redis_client = RedisStore()
@@ -0,0 +1,176 @@
+import codecs
+import csv
+import io
+import json
+from datetime import datetime
+
+from sqlalchemy import text
+
+from . import dedup
+from .extensions import db
+from .models.models import Client
+
+CLIENT_FIELDS = ('name', 'date_of_birth', 'contact_info')
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+def validate_client_row(data):
+    """Check one incoming client record and return the columns to insert.
+
+    Raises ValueError with a client-facing message.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Row must be an object')
+    name = data.get('name') or ''
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError('Name is required')
+    name = name.strip()
+    if len(name) > Client.name.type.length:
+        raise ValueError(f'Name must be at most {Client.name.type.length} characters')
+    date_of_birth = data.get('date_of_birth') or None
+    if date_of_birth is not None:
+        try:
+            date_of_birth = datetime.strptime(date_of_birth, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            raise ValueError('date_of_birth must be formatted YYYY-MM-DD')
+    contact_info = data.get('contact_info') or None
+    if contact_info is not None and not isinstance(contact_info, str):
+        raise ValueError('contact_info must be a string')
+    if contact_info is not None and len(contact_info) > Client.contact_info.type.length:
+        raise ValueError(f'contact_info must be at most {Client.contact_info.type.length} characters')
+    return {'name': name, 'date_of_birth': date_of_birth, 'contact_info': contact_info}
+
+
+def iter_ndjson(lines):
+    """Yield ``(line_number, record_or_exception)`` for newline-delimited JSON."""
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, ValueError(f'Invalid JSON: {e}')
+
+
+def iter_csv(lines):
+    """Yield ``(line_number, record)`` for CSV with a header row."""
+    reader = csv.DictReader(lines)
+    missing = [field for field in ('name',) if field not in (reader.fieldnames or ())]
+    if missing:
+        raise ValueError(f'CSV header must include: {", ".join(missing)}')
+    for record in reader:
+        yield reader.line_num, record
+
+
+def _copy_batch(rows):
+    """Load a batch with PostgreSQL COPY inside the session's transaction; returns the new ids.
+
+    COPY reports no ids, so they are drawn from the id sequence first and
+    loaded explicitly. Concurrent inserts draw their own, so none collide.
+    """
+    connection = db.session.connection()
+    ids = connection.execute(text(
+        "SELECT nextval(pg_get_serial_sequence('client', 'id')) FROM generate_series(1, :n)"
+    ), {'n': len(rows)}).scalars().all()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for client_id, row in zip(ids, rows):
+        writer.writerow([client_id, row['name'], row['date_of_birth'] or '', row['contact_info'] or '',
+                         row['created_at'], row['updated_at']])
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    cursor.copy_expert(
+        'COPY client (id, name, date_of_birth, contact_info, created_at, updated_at) '
+        "FROM STDIN WITH (FORMAT csv, NULL '')",
+        buffer
+    )
+    return ids
+
+
+def _insert_batch(rows):
+    """Insert a batch with one executemany (SQLite); returns the new ids.
+
+    executemany reports no ids either. SQLite admits one writer at a time and
+    this transaction is it from the INSERT on, so the batch is the newest rows.
+    """
+    db.session.execute(Client.__table__.insert(), rows)
+    newest = db.session.query(Client.id).order_by(Client.id.desc()).limit(len(rows))
+    return [client_id for client_id, in newest]
+
+
+def insert_client_batch(rows):
+    """Insert validated client rows in one statement and commit, with their dedup keys."""
+    now = datetime.utcnow()
+    for row in rows:
+        row['created_at'] = row['updated_at'] = now
+    if db.session.connection().dialect.name == 'postgresql':
+        ids = _copy_batch(rows)
+    else:
+        ids = _insert_batch(rows)
+    dedup.index_new_clients(db.session.connection(), ids)
+    db.session.commit()
+
+
+def import_clients(stream, fmt, batch_size=DEFAULT_BATCH_SIZE, max_errors=MAX_REPORTED_ERRORS):
+    """Validate and insert clients from a byte stream of NDJSON or CSV.
+
+    Rows are read and validated one at a time and inserted in batched
+    transactions, so memory use depends on ``batch_size`` and not on upload
+    size. Invalid rows are skipped and reported by line number. If a batch
+    fails to insert, all of its rows are reported as failed. Only the first
+    ``max_errors`` errors are listed.
+
+    Bytes that are not UTF-8, or CSV the reader cannot parse, end the import:
+    the error is reported against the line where reading stopped, and the
+    rows read before it are still inserted. A CSV header without ``name``
+    raises ValueError before anything is inserted.
+    """
+    position = {'line': 0}
+
+    def count_lines(lines):
+        for line in lines:
+            position['line'] += 1
+            yield line
+
+    lines = count_lines(codecs.iterdecode(stream, 'utf-8'))
+    records = iter_csv(lines) if fmt == 'csv' else iter_ndjson(lines)
+    report = {'inserted': 0, 'failed': 0, 'errors': [], 'errors_truncated': False}
+
+    def add_error(line_number, message):
+        report['failed'] += 1
+        if len(report['errors']) < max_errors:
+            report['errors'].append({'line': line_number, 'error': message})
+        else:
+            report['errors_truncated'] = True
+
+    def flush(batch):
+        try:
+            insert_client_batch([row for _, row in batch])
+            report['inserted'] += len(batch)
+        except Exception as e:
+            db.session.rollback()
+            for line_number, _ in batch:
+                add_error(line_number, f'Insert failed: {e.__class__.__name__}')
+
+    batch = []
+    try:
+        for line_number, record in records:
+            if isinstance(record, Exception):
+                add_error(line_number, str(record))
+                continue
+            try:
+                batch.append((line_number, validate_client_row(record)))
+            except ValueError as e:
+                add_error(line_number, str(e))
+                continue
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+    except UnicodeDecodeError:
+        add_error(position['line'] + 1, 'Not valid UTF-8; import stopped here')
+    except csv.Error as e:
+        add_error(position['line'], f'Invalid CSV: {e}; import stopped here')
+    if batch:
+        flush(batch)
+    return report
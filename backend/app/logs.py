@@ -0,0 +1,198 @@
+"""Structured, non-blocking logging.
+
+Request threads only put records on a bounded in-memory queue. A listener
+thread formats them as JSON lines and writes them to ``LOG_FILE``, or to
+stderr when that is empty. A full queue drops the record and counts it in
+``log_records_dropped_total``; the request is never held up.
+
+The file rotates itself at ``LOG_FILE_MAX_BYTES`` only when
+``LOG_FILE_ROTATE`` is on, which is safe for a single process. Processes
+sharing a file (gunicorn workers) must leave rotation to an external tool
+such as logrotate; the file is reopened once it has been moved away.
+gunicorn.conf.py turns rotation off and logs to stderr unless ``LOG_FILE``
+is set explicitly.
+
+Every request gets an id: an incoming ``X-Request-ID`` header is reused if
+it looks sane, otherwise one is generated. It is sent back in the response
+and attached to every record logged while the request runs.
+
+Access logs (logger ``app.access``) carry method, path, status, duration
+and database time. Only ``ACCESS_LOG_SAMPLE_RATE`` of ordinary requests are
+logged, so the cost stays flat under load. Server errors and requests slower
+than ``ACCESS_LOG_SLOW_MS`` are always logged.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, WatchedFileHandler
+
+from flask import current_app, g, has_request_context, request
+from flask.logging import default_handler
+
+from . import metrics
+
+access_logger = logging.getLogger('app.access')
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._:-]{1,128}$')
+# LogRecord attributes; anything else on a record came from ``extra=``
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message and context."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestQueueHandler(QueueHandler):
+    """Enqueue without blocking, adding the request id in the calling thread."""
+
+    def prepare(self, record):
+        # The listener thread has no request context, so capture it now.
+        # Merge args and render tracebacks here too: they may not outlive the request.
+        if has_request_context() and 'request_id' in g and not hasattr(record, 'request_id'):
+            record.request_id = g.request_id
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.LOG_RECORDS_DROPPED.inc()
+
+
+_handler = None
+_listener = None
+
+
+def _build_handlers(config):
+    path = config.get('LOG_FILE')
+    if path:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if config.get('LOG_FILE_ROTATE', True):
+            handler = RotatingFileHandler(path, maxBytes=config.get('LOG_FILE_MAX_BYTES', 10 * 1024 * 1024),
+                                          backupCount=config.get('LOG_FILE_BACKUP_COUNT', 10))
+        else:
+            # Several processes append to this file; none of them may rotate it
+            handler = WatchedFileHandler(path)
+    else:
+        handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter())
+    return [handler]
+
+
+def _stop_listener():
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()  # drains what is already queued
+
+
+def configure(app):
+    """Route ``app.logger`` (and its children) through the queue; safe to call again."""
+    global _handler, _listener
+    config = app.config
+    _stop_listener()
+    if _listener is not None:
+        for handler in _listener.handlers:
+            handler.close()
+    log_queue = queue.Queue(maxsize=config.get('LOG_QUEUE_SIZE', 10000))
+    if _handler is None:
+        _handler = RequestQueueHandler(log_queue)
+        atexit.register(_stop_listener)
+    else:
+        _handler.queue = log_queue
+    _listener = QueueListener(log_queue, *_build_handlers(config), respect_handler_level=True)
+    _listener.start()
+
+    # Replaces the synchronous handlers rather than adding to them
+    app.logger.removeHandler(default_handler)
+    for handler in list(app.logger.handlers):
+        if handler is not _handler:
+            app.logger.removeHandler(handler)
+    if _handler not in app.logger.handlers:
+        app.logger.addHandler(_handler)
+    app.logger.setLevel(config.get('LOG_LEVEL', 'INFO'))
+
+
+def restart_listener():
+    """Start a fresh queue and listener thread, e.g. in a forked worker."""
+    global _listener
+    if _listener is None:
+        return
+    # The parent's thread did not survive the fork, and its queue's locks may be held
+    log_queue = queue.Queue(maxsize=_handler.queue.maxsize)
+    _handler.queue = log_queue
+    _listener = QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _before_request():
+    incoming = request.headers.get(REQUEST_ID_HEADER, '')
+    g.request_id = incoming if _REQUEST_ID.match(incoming) else uuid.uuid4().hex
+    g.log_start_time = time.perf_counter()
+
+
+def _should_log(config, status, duration_ms):
+    if status >= 500 or duration_ms >= config.get('ACCESS_LOG_SLOW_MS', 1000):
+        return True
+    rate = config.get('ACCESS_LOG_SAMPLE_RATE', 1.0)
+    return rate >= 1 or random.random() < rate
+
+
+def _after_request(response):
+    request_id = g.get('request_id')
+    if request_id:
+        response.headers[REQUEST_ID_HEADER] = request_id
+    if 'log_start_time' not in g:
+        return response
+    duration_ms = (time.perf_counter() - g.log_start_time) * 1000
+    if _should_log(current_app.config, response.status_code, duration_ms):
+        access_logger.info(f'{request.method} {request.path} {response.status_code}', extra={
+            'request_id': request_id,
+            'method': request.method,
+            'path': request.path,
+            'endpoint': metrics.endpoint_label(),
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 2),
+            'db_queries': g.get('db_query_count', 0),
+            'db_ms': round(g.get('db_query_time', 0.0) * 1000, 2),
+            'bytes': response.content_length,
+            'remote_addr': request.remote_addr,
+        })
+    return response
+
+
+def init_app(app):
+    if not app.debug and not app.testing:
+        configure(app)
+        app.logger.info('Health Info System startup')
+    app.before_request(_before_request)
+    app.after_request(_after_request)
@@ -0,0 +1,188 @@
+import os
+import time
+
+from flask import g, has_request_context, request
+from prometheus_client import (CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+                               generate_latest, multiprocess)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+# Gauges use the "livesum" multiprocess mode, so a scrape served by any
+# gunicorn worker adds up the values of every live worker.
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency',
+    ['method', 'endpoint', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight', 'HTTP requests currently being served',
+    multiprocess_mode='livesum'
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    'db_queries_per_request', 'SQL statements issued per HTTP request', ['endpoint'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+DB_TIME_PER_REQUEST = Histogram(
+    'db_time_per_request_seconds', 'Total SQL time per HTTP request', ['endpoint'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+DB_QUERY_DURATION = Histogram(
+    'db_query_duration_seconds', 'SQL statement latency',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+)
+DB_SLOW_QUERIES = Counter(
+    'db_slow_queries_total', 'SQL statements slower than SQL_SLOW_QUERY_MS (profiling only)', ['endpoint']
+)
+DB_REPEATED_STATEMENTS = Counter(
+    'db_repeated_statements_total', 'Requests repeating a statement shape, likely N+1 (profiling only)',
+    ['endpoint']
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    'db_pool_connections_checked_out', 'Database connections currently checked out',
+    multiprocess_mode='livesum'
+)
+DB_POOL_CAPACITY = Gauge(
+    'db_pool_connections_capacity', 'Database pool size plus max overflow',
+    multiprocess_mode='livesum'
+)
+CACHE_OPERATIONS = Counter(
+    'cache_operations_total', 'Cache lookups and rebuilds', ['namespace', 'result']
+)
+REDIS_COMMAND_LATENCY = Histogram(
+    'redis_command_duration_seconds', 'Redis command latency', ['outcome'],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+)
+REDIS_POOL_IN_USE = Gauge(
+    'redis_pool_connections_in_use', 'Redis connections currently in use',
+    multiprocess_mode='livesum'
+)
+RATE_LIMIT_REJECTIONS = Counter(
+    'rate_limit_rejections_total', 'Requests rejected by the rate limiter', ['endpoint']
+)
+RATE_LIMIT_REJECTIONS_BY_KEY = Counter(
+    'rate_limit_rejections_by_key_total', 'Rate limiter rejections by key type (user or ip)', ['key_type']
+)
+LOG_RECORDS_DROPPED = Counter(
+    'log_records_dropped_total', 'Log records dropped because the logging queue was full'
+)
+RATE_LIMIT_STORAGE_FALLBACK = Gauge(
+    'rate_limit_storage_fallback', 'Workers counting rate limits in memory because Redis is unreachable',
+    multiprocess_mode='livesum'
+)
+
+
+def endpoint_label():
+    """Route template of the current request; keeps label cardinality bounded."""
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+
+def record_cache(namespace, result, amount=1):
+    CACHE_OPERATIONS.labels(namespace, result).inc(amount)
+
+
+def record_redis_call(seconds, ok):
+    REDIS_COMMAND_LATENCY.labels('ok' if ok else 'error').observe(seconds)
+
+
+def record_rate_limit_rejection(key_type=None):
+    RATE_LIMIT_REJECTIONS.labels(endpoint_label()).inc()
+    if key_type:
+        RATE_LIMIT_REJECTIONS_BY_KEY.labels(key_type).inc()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_start_time'].pop()
+    elapsed = time.perf_counter() - started
+    DB_QUERY_DURATION.observe(elapsed)
+    if has_request_context() and 'db_query_count' in g:
+        g.db_query_count += 1
+        g.db_query_time += elapsed
+        if 'sql_profile' in g:  # see app/profiling.py
+            g.sql_profile.record(statement, elapsed)
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_CHECKED_OUT.inc()
+
+
+def _on_checkin(dbapi_connection, connection_record):
+    DB_POOL_CHECKED_OUT.dec()
+
+
+_sized_pools = set()
+
+
+def _on_engine_connect(connection, *args):
+    pool = connection.engine.pool
+    if id(pool) in _sized_pools:
+        return
+    _sized_pools.add(id(pool))
+    if hasattr(pool, 'size') and hasattr(pool, '_max_overflow'):
+        DB_POOL_CAPACITY.inc(pool.size() + max(pool._max_overflow, 0))
+
+
+def _before_request():
+    g.request_start_time = time.perf_counter()
+    g.db_query_count = 0
+    g.db_query_time = 0.0
+    REQUESTS_IN_FLIGHT.inc()
+
+
+def _after_request(response):
+    if 'request_start_time' in g:
+        endpoint = endpoint_label()
+        REQUEST_LATENCY.labels(request.method, endpoint, response.status_code).observe(
+            time.perf_counter() - g.request_start_time)
+        DB_QUERIES_PER_REQUEST.labels(endpoint).observe(g.db_query_count)
+        DB_TIME_PER_REQUEST.labels(endpoint).observe(g.db_query_time)
+    return response
+
+
+def _teardown_request(exc):
+    if 'request_start_time' in g:
+        REQUESTS_IN_FLIGHT.dec()
+
+
+def collect():
+    """Render the exposition text, merging every worker in multiprocess mode."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+_engine_listeners_installed = False
+
+
+def init_app(app, redis_client):
+    """Attach request, SQL and pool instrumentation to ``app``."""
+    global _engine_listeners_installed
+    if not _engine_listeners_installed:
+        # Listening on the Engine class also covers engines created later
+        # (binds, replicas, post-fork re-creation).
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'engine_connect', _on_engine_connect)
+        event.listen(Pool, 'checkout', _on_checkout)
+        event.listen(Pool, 'checkin', _on_checkin)
+        _engine_listeners_installed = True
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+    @app.after_request
+    def _sample_redis_pool(response):
+        pool = getattr(redis_client.client, 'connection_pool', None)
+        if pool is not None and hasattr(pool, '_in_use_connections'):
+            REDIS_POOL_IN_USE.set(len(pool._in_use_connections))
+        return response
+
@@ -1,5 +1,8 @@
-from datetime import datetime
-from werkzeug.security import generate_password_hash
+import sqlite3
+from datetime import datetime, timezone
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from werkzeug.security import generate_password_hash, check_password_hash
 from ..extensions import db
 
 class User(db.Model):
@@ -11,28 +14,150 @@ class User(db.Model):
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
 
+    def check_password(self, password):
+        return check_password_hash(self.password_hash, password)
+
 class Client(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    date_of_birth = db.Column(db.Date)
+    name = db.Column(db.String(100), nullable=False, index=True)
+    date_of_birth = db.Column(db.Date, index=True)  # age filters in cohort queries
     contact_info = db.Column(db.String(200))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    def to_dict(self):
+        return serialize_client(self)
+
+def serialize_client(client):
+    """Serialize a Client instance or a column row with the same attributes."""
+    return {
+        'id': client.id,
+        'name': client.name,
+        'date_of_birth': client.date_of_birth.isoformat() if client.date_of_birth else None,
+        'contact_info': client.contact_info,
+        'created_at': client.created_at.isoformat() if client.created_at else None,
+        'updated_at': client.updated_at.isoformat() if client.updated_at else None
+    }
+
+def parse_timestamp(value):
+    """An ISO 8601 timestamp as stored: naive UTC. Raises ValueError.
+
+    Accepts a trailing ``Z``, which ``fromisoformat`` rejects before Python 3.11.
+    """
+    if not isinstance(value, str):
+        raise ValueError(f'Invalid isoformat string: {value!r}')
+    if value[-1:] in ('Z', 'z'):
+        value = value[:-1] + '+00:00'
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+ENROLLMENT_STATUSES = ('active', 'completed', 'withdrawn')
 
 class HealthProgram(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'description': self.description,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
 
 class ClientProgram(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('client_id', 'program_id', name='uq_client_program_client_id_program_id'),
+        db.Index('ix_client_program_client_id_status', 'client_id', 'status'),
+        # Covers cohort queries (program, status, enrolled since) without touching the table
+        db.Index('ix_client_program_cohort', 'program_id', 'status', 'enrollment_date', 'client_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    client_id = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=False)
-    program_id = db.Column(db.Integer, db.ForeignKey('health_program.id'), nullable=False)
+    client_id = db.Column(db.Integer, db.ForeignKey('client.id', ondelete='CASCADE'), nullable=False)
+    program_id = db.Column(db.Integer, db.ForeignKey('health_program.id', ondelete='CASCADE'), nullable=False)
     enrollment_date = db.Column(db.DateTime, default=datetime.utcnow)
     status = db.Column(db.String(20), default='active')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    # Listing code must pick joinedload/selectinload explicitly; these
+    # backrefs stay lazy so a plain attribute access never fans out.
+    # Deleting a client or program leaves its enrollments to ON DELETE
+    # CASCADE: one statement instead of loading and deleting each row.
+    client = db.relationship('Client', backref=db.backref('programs', lazy=True, cascade='all, delete-orphan',
+                                                          passive_deletes=True))
+    program = db.relationship('HealthProgram', backref=db.backref('clients', lazy=True, cascade='all, delete-orphan',
+                                                                  passive_deletes=True))
+
+    def to_dict(self, include_client=False, include_program=False):
+        data = {
+            'id': self.id,
+            'client_id': self.client_id,
+            'program_id': self.program_id,
+            'status': self.status,
+            'enrollment_date': self.enrollment_date.isoformat() if self.enrollment_date else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+        if include_client:
+            data['client'] = serialize_client(self.client)
+        if include_program:
+            data['program'] = self.program.to_dict()
+        return data
+
+# Summary tables behind /api/v1/stats. Database triggers keep them current in
+# the same transaction as each client/enrollment write (see app/stats.py).
+
+class ProgramStatusCount(db.Model):
+    program_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class EnrollmentDayCount(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    program_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class ClientBirthYearCount(db.Model):
+    birth_year = db.Column(db.Integer, primary_key=True, autoincrement=False)  # 0: unknown
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class ChangeLog(db.Model):
+    """One row per insert, update or delete of a client or enrollment, written by triggers (app/changes.py)."""
+    __table_args__ = (
+        db.Index('ix_change_log_txid_id', 'txid', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    txid = db.Column(db.BigInteger, nullable=False, default=0)  # writing transaction (PostgreSQL); 0 on SQLite
+    entity = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(10), nullable=False)
+    changed_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class ChangeLogHorizon(db.Model):
+    """Position up to which the change log has been pruned (a single row)."""
+    id = db.Column(db.Integer, primary_key=True)
+    txid = db.Column(db.BigInteger, nullable=False, default=0)
+    change_id = db.Column(db.Integer, nullable=False, default=0)
+
+class ClientDedupKey(db.Model):
+    """Blocking keys for duplicate detection: clients sharing a key are compared (app/dedup.py)."""
+    key = db.Column(db.String(120), primary_key=True)
+    client_id = db.Column(db.Integer, db.ForeignKey('client.id', ondelete='CASCADE'), primary_key=True,
+                          autoincrement=False, index=True)
 
-    client = db.relationship('Client', backref=db.backref('programs', lazy=True))
-    program = db.relationship('HealthProgram', backref=db.backref('clients', lazy=True)) 
\ No newline at end of file
+@event.listens_for(Engine, 'connect')
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores ON DELETE CASCADE unless each connection asks for it
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
@@ -0,0 +1,63 @@
+from urllib.parse import urlencode
+
+from flask import request, url_for
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def parse_page_args(default_limit=DEFAULT_PAGE_SIZE, max_limit=MAX_PAGE_SIZE, args=None):
+    """Read the ``after``/``limit`` keyset cursor from the query string.
+
+    ``args`` defaults to the current Flask request's. Raises ValueError with a
+    client-facing message on bad input.
+    """
+    if args is None:
+        args = request.args
+    try:
+        after = int(args.get('after', 0))
+        limit = int(args.get('limit', default_limit))
+    except (TypeError, ValueError):
+        raise ValueError('after and limit must be integers')
+    if after < 0:
+        raise ValueError('after must be a non-negative integer')
+    if limit < 1 or limit > max_limit:
+        raise ValueError(f'limit must be between 1 and {max_limit}')
+    return after, limit
+
+
+def keyset_page(query, key_column, after, limit):
+    """Fetch one page of ``query`` ordered by ``key_column`` past ``after``.
+
+    One extra row is requested so we know whether a next page exists without
+    a COUNT(*). Returns ``(rows, next_cursor)``; ``next_cursor`` is None on the
+    last page.
+    """
+    rows = query.filter(key_column > after).order_by(key_column).limit(limit + 1).all()
+    return split_page(rows, key_column, limit)
+
+
+def split_page(rows, key_column, limit):
+    """Trim the look-ahead row off a ``limit + 1`` fetch; returns ``(rows, next_cursor)``."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, getattr(rows[-1], key_column.key)
+    return rows, None
+
+
+def next_page_url(path, args, next_cursor, limit):
+    """URL of the page after ``next_cursor``, keeping the other query arguments."""
+    args = dict(args)
+    args.update(after=next_cursor, limit=limit)
+    return f'{path}?{urlencode(args)}'
+
+
+def add_page_headers(response, next_cursor, limit):
+    """Advertise the next page through ``X-Next-Cursor`` and a ``Link`` header."""
+    if next_cursor is not None:
+        args = request.args.to_dict()
+        args.update(after=next_cursor, limit=limit)
+        next_url = url_for(request.endpoint, **request.view_args, **args)
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response
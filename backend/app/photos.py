@@ -0,0 +1,211 @@
+"""Client photo storage under ``UPLOAD_FOLDER/clients``.
+
+Uploads are streamed to a temporary file in fixed-size chunks and renamed into
+place, so a request never holds a whole image in memory and readers never see
+a partial file. Thumbnails are made in a small thread pool off the request
+path. Pillow releases the GIL while decoding and resampling, so those threads
+do not stall the request threads.
+"""
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from flask import current_app
+
+CHUNK_SIZE = 64 * 1024
+THUMBNAIL_SUFFIX = '.thumb.jpg'
+# (magic bytes, mimetype, extension); WebP is checked separately
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png', 'png'),
+)
+EXTENSIONS = {'jpg': 'image/jpeg', 'png': 'image/png', 'webp': 'image/webp'}
+
+
+class PhotoTooLarge(ValueError):
+    """The upload exceeded ``MAX_CONTENT_LENGTH``."""
+
+
+class UnsupportedPhoto(ValueError):
+    """The upload is not a JPEG, PNG or WebP image."""
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_pending = {}
+
+
+def photo_dir():
+    folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
+    if not os.path.isabs(folder):
+        folder = os.path.join(os.path.dirname(current_app.root_path), folder)
+    return os.path.join(folder, 'clients')
+
+
+def _sniff(head):
+    for magic, mimetype, extension in SIGNATURES:
+        if head.startswith(magic):
+            return mimetype, extension
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp', 'webp'
+    raise UnsupportedPhoto('Photo must be a JPEG, PNG or WebP image')
+
+
+def _read_head(stream, size=16):
+    head = b''
+    while len(head) < size:
+        chunk = stream.read(size - len(head))
+        if not chunk:
+            break
+        head += chunk
+    return head
+
+
+def find_photo(client_id):
+    """Return ``(path, mimetype)`` of the stored original, or None."""
+    directory = photo_dir()
+    for extension, mimetype in EXTENSIONS.items():
+        path = os.path.join(directory, f'{client_id}.{extension}')
+        if os.path.exists(path):
+            return path, mimetype
+    return None
+
+
+def thumbnail_path(client_id):
+    return os.path.join(photo_dir(), f'{client_id}{THUMBNAIL_SUFFIX}')
+
+
+def save_photo(client_id, stream, max_bytes):
+    """Stream an upload to disk and replace any earlier photo of the client.
+
+    Raises UnsupportedPhoto or PhotoTooLarge; nothing is kept in that case.
+    """
+    directory = photo_dir()
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f'.{client_id}.', suffix='.part')
+    try:
+        size = 0
+        with os.fdopen(fd, 'wb') as out:
+            chunk = _read_head(stream)
+            mimetype, extension = _sniff(chunk)
+            while chunk:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise PhotoTooLarge(f'Photo must be at most {max_bytes} bytes')
+                out.write(chunk)
+                chunk = stream.read(CHUNK_SIZE)
+        path = os.path.join(directory, f'{client_id}.{extension}')
+        delete_photos(client_id, keep=path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return {'client_id': client_id, 'content_type': mimetype, 'size': size}
+
+
+def delete_photos(client_id, keep=None):
+    """Remove a client's original and thumbnail, if any (except ``keep``)."""
+    directory = photo_dir()
+    names = [f'{client_id}.{extension}' for extension in EXTENSIONS] + [f'{client_id}{THUMBNAIL_SUFFIX}']
+    for name in names:
+        path = os.path.join(directory, name)
+        if path == keep:
+            continue
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def _render_thumbnail(source, target, size):
+    from PIL import Image, ImageOps
+
+    before = os.stat(source)
+    with Image.open(source) as image:
+        # JPEGs can be decoded at 1/2, 1/4 or 1/8 scale, which is far cheaper
+        # than decoding the full image and shrinking it afterwards.
+        image.draft('RGB', (size, size))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size))
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.part')
+        with os.fdopen(fd, 'wb') as out:
+            image.convert('RGB').save(out, 'JPEG', quality=80, optimize=True)
+    after = os.stat(source)
+    if (before.st_ino, before.st_mtime_ns) != (after.st_ino, after.st_mtime_ns):
+        # Replaced by a newer upload while we worked; its own job will follow.
+        os.unlink(temp_path)
+        return
+    os.replace(temp_path, target)
+
+
+def _get_executor(workers):
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnail')
+                _executor_pid = os.getpid()
+                _pending.clear()
+    return _executor
+
+
+def schedule_thumbnail(client_id):
+    """Queue a thumbnail for the client's current photo; returns the Future or None."""
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        current_app.logger.warning('Pillow is not installed; photo thumbnails are disabled')
+        return None
+    found = find_photo(client_id)
+    if found is None:
+        return None
+    config = current_app.config
+    executor = _get_executor(config.get('PHOTO_THUMBNAIL_WORKERS', 2))
+    future = executor.submit(_render_thumbnail, found[0], thumbnail_path(client_id),
+                             config.get('PHOTO_THUMBNAIL_SIZE', 256))
+    with _executor_lock:
+        _pending[client_id] = future
+    future.add_done_callback(lambda done: _forget(client_id, done))
+    return future
+
+
+def _forget(client_id, future):
+    with _executor_lock:
+        if _pending.get(client_id) is future:
+            del _pending[client_id]
+
+
+def ensure_thumbnail(client_id, timeout):
+    """Path of the client's thumbnail, waiting up to ``timeout`` seconds for it.
+
+    Schedules one if the photo has none yet (e.g. it predates thumbnails).
+    Returns None when there is no photo or the thumbnail is not ready in time.
+    """
+    path = thumbnail_path(client_id)
+    if os.path.exists(path):
+        return path
+    with _executor_lock:
+        future = _pending.get(client_id)
+    if future is None:
+        future = schedule_thumbnail(client_id)
+    if future is None:
+        return None
+    try:
+        future.result(timeout=timeout)
+    except FutureTimeoutError:
+        return None
+    except Exception as e:
+        current_app.logger.error(f"Thumbnail for client {client_id} failed: {e}")
+        return None
+    return path if os.path.exists(path) else None
+
+
+def reset():
+    """Forget the thread pool inherited from a parent process (post-fork)."""
+    global _executor, _executor_pid
+    _executor = None
+    _executor_pid = None
+    _pending.clear()
@@ -0,0 +1,117 @@
+"""Per-request SQL profiling (``SQL_PROFILING``).
+
+The SQL timing listeners in app/metrics.py hand every statement a request
+issues to its profile, so nothing is timed twice. After the response,
+statements slower than ``SQL_SLOW_QUERY_MS`` are logged with their route. A
+statement shape (the SQL with parameters and IN lists folded) that repeats
+``SQL_REPEAT_THRESHOLD`` times in one request is logged as a likely N+1 loop.
+With ``SQL_SERVER_TIMING`` the totals go out in a ``Server-Timing`` header,
+which browser dev tools show next to the request.
+
+Tests use ``capture()`` to see the profiles whatever the config says.
+"""
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import current_app, g
+
+from . import metrics
+
+# Placeholders of the qmark (SQLite), pyformat (psycopg2) and numeric (asyncpg) styles
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s|\$\d+|\?')
+_PLACEHOLDER_LIST = re.compile(r'\?(?:\s*,\s*\?)+')
+MAX_LOGGED_STATEMENT = 500
+
+_captures = []
+_captures_lock = threading.Lock()
+
+
+def statement_shape(statement):
+    """``statement`` with its parameters and IN lists folded, whitespace collapsed."""
+    shape = _PLACEHOLDER.sub('?', statement)
+    shape = _PLACEHOLDER_LIST.sub('?', shape)
+    return ' '.join(shape.split())
+
+
+class RequestProfile:
+    """The statements one request issued."""
+
+    def __init__(self, endpoint, slow_threshold):
+        self.endpoint = endpoint
+        self.slow_threshold = slow_threshold
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.slow = []
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.duration += seconds
+        self.shapes[statement_shape(statement)] += 1
+        if seconds >= self.slow_threshold:
+            self.slow.append((statement, seconds))
+
+    def repeated(self, threshold):
+        """``[(shape, count)]`` of shapes issued at least ``threshold`` times."""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+@contextmanager
+def capture():
+    """Collect the profile of every request finished inside the block."""
+    profiles = []
+    with _captures_lock:
+        _captures.append(profiles)
+    try:
+        yield profiles
+    finally:
+        with _captures_lock:
+            _captures.remove(profiles)
+
+
+def _truncate(statement):
+    statement = ' '.join(statement.split())
+    if len(statement) > MAX_LOGGED_STATEMENT:
+        return statement[:MAX_LOGGED_STATEMENT] + '...'
+    return statement
+
+
+def _before_request():
+    if current_app.config.get('SQL_PROFILING') or _captures:
+        g.sql_profile = RequestProfile(metrics.endpoint_label(),
+                                       current_app.config.get('SQL_SLOW_QUERY_MS', 200) / 1000)
+
+
+def _report(profile, response):
+    config = current_app.config
+    logger = current_app.logger
+    for statement, seconds in profile.slow:
+        metrics.DB_SLOW_QUERIES.labels(profile.endpoint).inc()
+        logger.warning(f"Slow query on {profile.endpoint} ({seconds * 1000:.1f} ms): {_truncate(statement)}")
+    repeated = profile.repeated(config.get('SQL_REPEAT_THRESHOLD', 5))
+    if repeated:
+        metrics.DB_REPEATED_STATEMENTS.labels(profile.endpoint).inc()
+    for shape, count in repeated:
+        logger.warning(f"Possible N+1 on {profile.endpoint}: {count} x {_truncate(shape)}")
+    if config.get('SQL_SERVER_TIMING'):
+        response.headers.add('Server-Timing',
+                             f'db;dur={profile.duration * 1000:.2f};desc="{profile.count} queries"')
+
+
+def _after_request(response):
+    profile = g.pop('sql_profile', None)
+    if profile is None:
+        return response
+    if current_app.config.get('SQL_PROFILING'):
+        _report(profile, response)
+    with _captures_lock:
+        for profiles in _captures:
+            profiles.append(profile)
+    return response
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
@@ -0,0 +1,48 @@
+"""Rate limit keys and storage health.
+
+Limits are counted in the shared Redis storage (``RATELIMIT_STORAGE_URI``), so
+every gunicorn worker sees the same counters. With the moving-window strategy
+each check is a single EVALSHA of an atomic Lua script: one round trip, and
+no race between reading and incrementing. If Redis is unreachable,
+flask-limiter switches to per-process memory with the same limits and probes
+Redis again with exponential backoff.
+"""
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_limiter.util import get_remote_address
+
+
+def rate_limit_key():
+    """Key requests by JWT identity when authenticated, else by client IP.
+
+    Users behind one NAT or proxy then get separate budgets, and one user
+    cannot dodge a limit by spreading requests over several addresses.
+    """
+    try:
+        # optional=True: anonymous requests are not refused here, the view decides
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        # Bad tokens are rejected by @jwt_required(); count them against the IP
+        identity = None
+    if identity is not None:
+        return f'user:{identity}'
+    return f'ip:{get_remote_address()}'
+
+
+def key_type(key):
+    """``'user'`` or ``'ip'``, for metric labels."""
+    return key.split(':', 1)[0]
+
+
+def storage_degraded(limiter):
+    """True while this process counts limits in memory because Redis is down."""
+    return bool(getattr(limiter, '_storage_dead', False))
+
+
+def init_app(app, limiter):
+    from . import metrics
+
+    @app.after_request
+    def _sample_limiter_storage(response):
+        metrics.RATE_LIMIT_STORAGE_FALLBACK.set(1 if storage_degraded(limiter) else 0)
+        return response
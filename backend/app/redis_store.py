@@ -0,0 +1,312 @@
+import threading
+import time
+
+import redis
+
+from . import metrics
+
+
+class CircuitOpenError(redis.ConnectionError):
+    """Raised instead of touching the network while the breaker is open.
+
+    It subclasses ``redis.ConnectionError`` so every existing
+    ``except redis.RedisError`` fallback treats it as an ordinary outage.
+    """
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    After ``failure_threshold`` failures in a row the circuit opens and calls
+    fail immediately for ``cooldown`` seconds. Then a single trial call is let
+    through (half-open); success closes the circuit again, failure re-opens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, cooldown=30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._opened_at = 0.0
+            self._trial_in_flight = False
+            self._stats = {'calls': 0, 'failures': 0, 'short_circuits': 0, 'opened': 0,
+                           'total_latency': 0.0, 'max_latency': 0.0}
+            self._last_error = None
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                return self.HALF_OPEN
+            return self._state
+
+    def _allow(self):
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at < self.cooldown:
+                self._stats['short_circuits'] += 1
+                return False
+            # Cooldown elapsed: let exactly one trial call probe the server.
+            if self._trial_in_flight:
+                self._stats['short_circuits'] += 1
+                return False
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = True
+            return True
+
+    def _record(self, latency, error=None):
+        metrics.record_redis_call(latency, error is None)
+        with self._lock:
+            self._stats['calls'] += 1
+            self._stats['total_latency'] += latency
+            self._stats['max_latency'] = max(self._stats['max_latency'], latency)
+            self._trial_in_flight = False
+            if error is None:
+                self._state = self.CLOSED
+                self._failures = 0
+                return
+            self._stats['failures'] += 1
+            self._failures += 1
+            self._last_error = str(error)
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self._stats['opened'] += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def _release(self):
+        """Free the half-open trial slot without judging the server.
+
+        Used when the call died for reasons unrelated to Redis (a bug in the
+        caller, a cancelled task), so the next call gets to probe instead.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def call(self, func, *args, **kwargs):
+        if not self._allow():
+            raise CircuitOpenError('Redis circuit breaker is open')
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except (redis.ConnectionError, redis.TimeoutError) as e:
+            self._record(time.perf_counter() - started, e)
+            raise
+        except redis.RedisError:
+            # The server answered (WRONGTYPE, NOSCRIPT, ...), so it is reachable
+            self._record(time.perf_counter() - started)
+            raise
+        except BaseException:
+            self._release()
+            raise
+        self._record(time.perf_counter() - started)
+        return result
+
+    async def acall(self, func, *args, **kwargs):
+        """``call`` for coroutine functions (redis.asyncio)."""
+        if not self._allow():
+            raise CircuitOpenError('Redis circuit breaker is open')
+        started = time.perf_counter()
+        try:
+            result = await func(*args, **kwargs)
+        except (redis.ConnectionError, redis.TimeoutError) as e:
+            self._record(time.perf_counter() - started, e)
+            raise
+        except redis.RedisError:
+            # The server answered (WRONGTYPE, NOSCRIPT, ...), so it is reachable
+            self._record(time.perf_counter() - started)
+            raise
+        except BaseException:
+            self._release()
+            raise
+        self._record(time.perf_counter() - started)
+        return result
+
+    def snapshot(self):
+        state = self.state
+        with self._lock:
+            stats = dict(self._stats)
+            calls = stats.pop('calls')
+            total_latency = stats.pop('total_latency')
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'calls': calls,
+                'avg_latency_ms': round(total_latency / calls * 1000, 3) if calls else None,
+                'max_latency_ms': round(stats.pop('max_latency') * 1000, 3),
+                'last_error': self._last_error,
+                **stats
+            }
+
+
+class _GuardedPipeline:
+    """Pipeline proxy whose ``execute`` goes through the circuit breaker.
+
+    Queue commands with separate statements rather than chained calls, since
+    chained calls return the raw pipeline.
+    """
+
+    def __init__(self, pipeline, breaker):
+        self._pipeline = pipeline
+        self._breaker = breaker
+
+    def __getattr__(self, name):
+        return getattr(self._pipeline, name)
+
+    def execute(self, raise_on_error=True):
+        return self._breaker.call(self._pipeline.execute, raise_on_error)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._pipeline.reset()
+
+
+class RedisStore:
+    """App-scoped Redis client backed by one shared connection pool.
+
+    Commands are proxied to ``redis.Redis`` through a circuit breaker, so an
+    unreachable server costs one short socket timeout per breaker threshold
+    instead of one connect timeout per request.
+    """
+
+    def __init__(self, app=None):
+        self._client = None
+        self._pool = None
+        self.breaker = CircuitBreaker()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, client=None):
+        """Bind to ``app``; pass ``client`` to use a ready-made (e.g. fake) client."""
+        config = app.config
+        self.breaker.failure_threshold = config.get('REDIS_BREAKER_THRESHOLD', 5)
+        self.breaker.cooldown = config.get('REDIS_BREAKER_COOLDOWN', 30.0)
+        self.breaker.reset()
+        if client is None:
+            self._pool = redis.ConnectionPool.from_url(
+                config['REDIS_URL'],
+                decode_responses=True,
+                max_connections=config.get('REDIS_MAX_CONNECTIONS', 50),
+                socket_timeout=config.get('REDIS_SOCKET_TIMEOUT', 0.25),
+                socket_connect_timeout=config.get('REDIS_CONNECT_TIMEOUT', 0.25),
+                health_check_interval=config.get('REDIS_HEALTH_CHECK_INTERVAL', 30)
+            )
+            client = redis.Redis(connection_pool=self._pool)
+        else:
+            self._pool = getattr(client, 'connection_pool', None)
+        self._client = client
+        app.extensions['redis'] = self
+
+    @property
+    def client(self):
+        """The underlying ``redis.Redis``; calls made on it bypass the breaker."""
+        return self._client
+
+    @property
+    def available(self):
+        return self._client is not None and self.breaker.state != CircuitBreaker.OPEN
+
+    def __getattr__(self, name):
+        if name.startswith('_') or self._client is None:
+            raise AttributeError(name)
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def guarded(*args, **kwargs):
+            return self.breaker.call(attr, *args, **kwargs)
+        return guarded
+
+    def pipeline(self, transaction=True):
+        return _GuardedPipeline(self._client.pipeline(transaction=transaction), self.breaker)
+
+    def reset(self):
+        """Drop pooled sockets, e.g. in a freshly forked worker."""
+        if self._pool is not None:
+            self._pool.disconnect()
+        self.breaker.reset()
+
+    def health(self):
+        """Ping the server (through the breaker) and report pool and breaker stats."""
+        status = {'configured': self._client is not None}
+        if self._client is None:
+            return status
+        started = time.perf_counter()
+        try:
+            status['ok'] = bool(self.ping())
+            status['ping_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        except redis.RedisError as e:
+            status['ok'] = False
+            status['error'] = str(e)
+        status['breaker'] = self.breaker.snapshot()
+        pool = self._pool
+        if pool is not None and hasattr(pool, '_created_connections'):
+            status['pool'] = {
+                'max_connections': pool.max_connections,
+                'created_connections': pool._created_connections,
+                'in_use_connections': len(pool._in_use_connections)
+            }
+        return status
+
+
+class AsyncRedisStore:
+    """``RedisStore`` counterpart for the asyncio API, on ``redis.asyncio``.
+
+    Uses a blocking pool: once ``max_connections`` are busy, further commands
+    wait for a free connection instead of failing, so thousands of concurrent
+    requests share a bounded number of sockets.
+    """
+
+    def __init__(self):
+        self._client = None
+        self.breaker = CircuitBreaker()
+
+    def init_app(self, config, client=None):
+        """Configure from a Flask-style config mapping; ``client`` as in RedisStore."""
+        self.breaker.failure_threshold = config.get('REDIS_BREAKER_THRESHOLD', 5)
+        self.breaker.cooldown = config.get('REDIS_BREAKER_COOLDOWN', 30.0)
+        self.breaker.reset()
+        if client is None:
+            from redis import asyncio as aioredis
+            pool = aioredis.BlockingConnectionPool.from_url(
+                config['REDIS_URL'],
+                decode_responses=True,
+                max_connections=config.get('REDIS_MAX_CONNECTIONS', 50),
+                timeout=config.get('REDIS_POOL_TIMEOUT', 1.0),
+                socket_timeout=config.get('REDIS_SOCKET_TIMEOUT', 0.25),
+                socket_connect_timeout=config.get('REDIS_CONNECT_TIMEOUT', 0.25)
+            )
+            client = aioredis.Redis(connection_pool=pool)
+        self._client = client
+
+    @property
+    def client(self):
+        return self._client
+
+    def __getattr__(self, name):
+        if name.startswith('_') or self._client is None:
+            raise AttributeError(name)
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        async def guarded(*args, **kwargs):
+            return await self.breaker.acall(attr, *args, **kwargs)
+        return guarded
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            await self._client.connection_pool.disconnect()
@@ -0,0 +1,212 @@
+"""Read-replica routing (``SQLALCHEMY_REPLICA_URIS``).
+
+Views marked ``@replica_read`` run their queries on a replica chosen round
+robin. Flushes always go to the primary. A replica whose connections fail
+is ejected for ``DB_REPLICA_EJECT_SECONDS``. The request that hit the
+failure is run again on the primary. While no replica is healthy, reads
+fall back to the primary.
+
+Read-your-writes: after a user's successful write, that user's reads go to
+the primary for ``READ_YOUR_WRITES_SECONDS``, so they never see replication
+lag in their own changes. The marker is kept in Redis, so every worker
+honours it; while Redis is down only the worker that served the write does.
+
+Each replica gets its own pool (``DB_REPLICA_POOL_SIZE``/``..._MAX_OVERFLOW``,
+or per-replica ``pool_size``/``max_overflow`` when an entry is a dict), and
+the primary's pool takes ``DB_POOL_SIZE``/``DB_MAX_OVERFLOW``. Two SQLite
+files work for local testing.
+"""
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+import redis
+import sqlalchemy
+from flask import current_app, g, has_app_context, has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import event, orm
+from sqlalchemy.engine import make_url
+
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+class RoutingSession(SignallingSession):
+    """Session that sends reads to the replica picked for the current request."""
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if not self._flushing and has_request_context():
+            engine = g.get('db_replica')
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+def _pool_options(url, pool_size, max_overflow):
+    if make_url(url).get_backend_name() == 'sqlite':
+        return {}  # SQLite engines use pools that take no size
+    return {'pool_size': pool_size, 'max_overflow': max_overflow}
+
+
+class ReplicaSet:
+    """The replica engines of this process, with round robin and ejection."""
+
+    def __init__(self):
+        self.engines = []
+        self._ejected_until = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def configure(self, app):
+        self.dispose()
+        config = app.config
+        engines = []
+        for entry in config.get('SQLALCHEMY_REPLICA_URIS') or ():
+            if isinstance(entry, str):
+                entry = {'url': entry}
+            options = _pool_options(entry['url'],
+                                    entry.get('pool_size', config.get('DB_REPLICA_POOL_SIZE', 10)),
+                                    entry.get('max_overflow', config.get('DB_REPLICA_MAX_OVERFLOW', 20)))
+            # Pre-ping replaces connections a restarted replica has dropped
+            engine = sqlalchemy.create_engine(entry['url'], pool_pre_ping=True, **options)
+            event.listen(engine, 'handle_error', self._on_error)
+            engines.append(engine)
+        self.engines = engines
+        self.eject_seconds = config.get('DB_REPLICA_EJECT_SECONDS', 30)
+
+    def _on_error(self, context):
+        # Connection failures and disconnects, not errors in the SQL itself
+        if context.is_disconnect or context.connection is None:
+            self.eject(context.engine)
+            if has_request_context() and g.get('db_replica') is context.engine:
+                g.db_replica_failed = True
+
+    def eject(self, engine):
+        with self._lock:
+            self._ejected_until[engine] = time.monotonic() + self.eject_seconds
+        if has_app_context():
+            current_app.logger.warning(f"Replica {engine.url!r} ejected for {self.eject_seconds}s")
+
+    def choose(self):
+        """The next healthy replica engine, or None."""
+        engines = self.engines
+        if not engines:
+            return None
+        now = time.monotonic()
+        start = next(self._counter)
+        for offset in range(len(engines)):
+            engine = engines[(start + offset) % len(engines)]
+            if self._ejected_until.get(engine, 0) <= now:
+                return engine
+        return None
+
+    def healthy(self):
+        now = time.monotonic()
+        return [engine for engine in self.engines if self._ejected_until.get(engine, 0) <= now]
+
+    def dispose(self):
+        """Close pooled connections, e.g. in a freshly forked worker."""
+        for engine in self.engines:
+            engine.dispose()
+        with self._lock:
+            self._ejected_until.clear()
+
+
+replicas = ReplicaSet()
+_recent_writers = {}  # identity -> monotonic deadline; this process's fallback
+
+
+def _writer_key(identity):
+    return f'ryw:{identity}'
+
+
+def _current_identity():
+    try:
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+
+def _wrote_recently(identity):
+    if _recent_writers.get(identity, 0) > time.monotonic():
+        return True
+    from .extensions import redis_client
+    try:
+        return bool(redis_client.exists(_writer_key(identity)))
+    except redis.RedisError:
+        return False
+
+
+def _record_write(response):
+    if (request.method in WRITE_METHODS and response.status_code < 400 and replicas.engines):
+        identity = _current_identity()
+        if identity is not None:
+            seconds = current_app.config.get('READ_YOUR_WRITES_SECONDS', 5)
+            now = time.monotonic()
+            if len(_recent_writers) > 10000:
+                for stale in [key for key, deadline in _recent_writers.items() if deadline <= now]:
+                    _recent_writers.pop(stale, None)
+            _recent_writers[identity] = now + seconds
+            from .extensions import redis_client
+            try:
+                redis_client.setex(_writer_key(identity), seconds, 1)
+            except redis.RedisError:
+                pass
+    return response
+
+
+@contextmanager
+def primary():
+    """Run the queries inside the block on the primary, e.g. to fill a shared cache."""
+    previous = g.pop('db_replica', None)
+    try:
+        yield
+    finally:
+        if previous is not None:
+            g.db_replica = previous
+
+
+def replica_read(view):
+    """Route a read-only view's queries to a replica (apply below ``@jwt_required``)."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        identity = _current_identity()
+        if identity is not None and _wrote_recently(identity):
+            return view(*args, **kwargs)
+        engine = replicas.choose()
+        if engine is None:
+            return view(*args, **kwargs)
+        g.db_replica = engine
+        try:
+            response = view(*args, **kwargs)
+        except sqlalchemy.exc.DBAPIError:
+            # Views that do not catch database errors themselves end up here
+            if not g.get('db_replica_failed'):
+                raise
+        if g.pop('db_replica_failed', False):
+            # The replica went away mid-request; answer from the primary instead
+            from .extensions import db
+            db.session.rollback()
+            g.pop('db_replica', None)
+            response = view(*args, **kwargs)
+        return response
+    return wrapper
+
+
+def init_app(app):
+    config = app.config
+    uri = config.get('SQLALCHEMY_DATABASE_URI') or ''
+    engine_options = config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    for key, value in _pool_options(uri, config.get('DB_POOL_SIZE', 10),
+                                    config.get('DB_MAX_OVERFLOW', 20)).items():
+        engine_options.setdefault(key, value)
+    replicas.configure(app)
+    _recent_writers.clear()
+    app.after_request(_record_write)
@@ -1,26 +1,44 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token
-from werkzeug.security import check_password_hash
-from ..extensions import db
+from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
+from ..extensions import db, redis_client
 from ..models.models import User
+from ..security import verify_password, login_guard, LoginThrottled
 
 auth_bp = Blueprint('auth', __name__)
 
-@auth_bp.route('/api/v1/auth/login', methods=['POST'])
+@auth_bp.route('/login', methods=['POST'])
 def login():
     try:
         data = request.get_json()
         if not data or 'username' not in data or 'password' not in data:
             return jsonify({'error': 'Username and password are required'}), 400
 
-        user = User.query.filter_by(username=data['username']).first()
-        if not user or not check_password_hash(user.password_hash, data['password']):
-            return jsonify({'error': 'Invalid username or password'}), 401
+        try:
+            with login_guard(data['username'], redis_client) as guard:
+                user = User.query.filter_by(username=data['username']).first()
+                if not user or not verify_password(user.password_hash, data['password']):
+                    guard.record_failure()
+                    return jsonify({'error': 'Invalid username or password'}), 401
+                guard.record_success()
+        except LoginThrottled as e:
+            response = jsonify({'error': str(e)})
+            if e.retry_after:
+                response.headers['Retry-After'] = str(e.retry_after)
+            return response, 429
 
         access_token = create_access_token(identity=user.username)
+        refresh_token = create_refresh_token(identity=user.username)
         return jsonify({
             'message': 'Login successful',
-            'access_token': access_token
+            'access_token': access_token,
+            'refresh_token': refresh_token
         }), 200
     except Exception as e:
-        return jsonify({'error': str(e)}), 500 
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@auth_bp.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh():
+    """Exchange a refresh token for a new access token without re-hashing a password."""
+    access_token = create_access_token(identity=get_jwt_identity())
+    return jsonify({'access_token': access_token}), 200
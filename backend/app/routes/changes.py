@@ -0,0 +1,36 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from ..extensions import limiter
+from ..changes import (get_changes, head_cursor, parse_cursor, CursorExpired,
+                       DEFAULT_LIMIT, MAX_LIMIT)
+
+changes_bp = Blueprint('changes', __name__)
+
+@changes_bp.route('', methods=['GET'])
+@jwt_required()
+@limiter.limit("100 per minute")
+def get_change_feed():
+    """Clients and enrollments created, updated or deleted after ``?since=<cursor>``.
+
+    Without ``since`` only the current cursor is returned: take it, download
+    the full lists, then poll with it. Follow ``cursor`` while ``has_more``.
+    A cursor older than the retained log gets a 410 and needs a full resync.
+    """
+    try:
+        limit = int(request.args.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    if limit < 1 or limit > MAX_LIMIT:
+        return jsonify({'error': f'limit must be between 1 and {MAX_LIMIT}'}), 400
+    since = request.args.get('since')
+    try:
+        if since is None:
+            return jsonify({'changes': [], 'cursor': head_cursor(), 'has_more': False}), 200
+        return jsonify(get_changes(parse_cursor(since), limit)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except CursorExpired as e:
+        return jsonify({'error': 'Gone', 'message': str(e)}), 410
+    except Exception as e:
+        current_app.logger.error(f"Error in get_change_feed: {e}")
+        return jsonify({'error': str(e)}), 500
@@ -1,61 +1,70 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, send_file, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..extensions import db, limiter
-from ..models.models import Client, HealthProgram, ClientProgram
-import redis
+from sqlalchemy.orm import joinedload
+from ..extensions import db, limiter, redis_client
+from ..models.models import Client, HealthProgram, ClientProgram, serialize_client
+from ..cache import (get_or_build, get_cached_record, get_cached_records, publish_invalidation,
+                     CLIENTS_NAMESPACE, CLIENT_DETAIL_NAMESPACE)
+from ..conditional import client_etag, client_page_etag, is_not_modified, not_modified, add_validators
+from .. import changes, dedup, photos, search
+from ..replicas import primary, replica_read
+from ..pagination import parse_page_args, keyset_page, add_page_headers
+from ..streaming import stream_query, stream_json_array
 from datetime import datetime
 import json
 
 clients_bp = Blueprint('clients', __name__)
 
-def get_redis_client():
-    try:
-        return redis.Redis(
-            host=current_app.config['REDIS_HOST'],
-            port=current_app.config['REDIS_PORT'],
-            db=0,
-            decode_responses=True
-        )
-    except redis.ConnectionError as e:
-        current_app.logger.error(f"Redis connection error: {e}")
-        return None
+CLIENT_COLUMNS = (Client.id, Client.name, Client.date_of_birth, Client.contact_info,
+                  Client.created_at, Client.updated_at)
 
-@clients_bp.route('/api/v1/clients/', methods=['GET'])
+@clients_bp.route('', methods=['GET'])
 @jwt_required()
 @limiter.limit("100 per minute")
+@replica_read
 def get_clients():
+    """List clients ordered by id using keyset pagination.
+
+    ``?after=<id>&limit=<n>`` selects a page; the cursor for the next page is
+    returned in the ``X-Next-Cursor`` and ``Link`` headers. ``?stream=true``
+    streams every client past ``after`` off a server-side cursor instead.
+
+    Pages are cached and validated by the change log head (app/changes.py),
+    which every committed client write moves, so a poll with a current
+    ``If-None-Match`` costs one indexed query and a 304.
+    """
     try:
-        redis_client = get_redis_client()
-        cache_key = 'clients_list'
-        
-        # Try to get from cache first
-        if redis_client:
-            cached_data = redis_client.get(cache_key)
-            if cached_data:
-                return jsonify(json.loads(cached_data))
-        
-        # If not in cache, get from database
-        clients = Client.query.all()
-        result = [{
-            'id': client.id,
-            'name': client.name,
-            'date_of_birth': client.date_of_birth.isoformat() if client.date_of_birth else None,
-            'contact_info': client.contact_info
-        } for client in clients]
-        
-        # Cache the result
-        if redis_client:
-            try:
-                redis_client.setex(cache_key, 300, json.dumps(result))  # Cache for 5 minutes
-            except redis.RedisError as e:
-                current_app.logger.error(f"Redis cache error: {e}")
-        
-        return jsonify(result)
+        after, limit = parse_page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        rows = stream_query(db.session.query(*CLIENT_COLUMNS), Client.id, after)
+        return Response(stream_with_context(stream_json_array(rows, serialize_client)),
+                        mimetype='application/json')
+
+    try:
+        version, changed_at = changes.head_version()
+        etag = client_page_etag(version, after, limit)
+        if is_not_modified(etag, changed_at):
+            return not_modified(etag, changed_at)
+
+        def build_page():
+            # Shared cache fills read the primary so they never store replica lag
+            with primary():
+                rows, next_cursor = keyset_page(db.session.query(*CLIENT_COLUMNS), Client.id, after, limit)
+            return {'items': [serialize_client(row) for row in rows], 'next': next_cursor}
+
+        page = get_or_build(redis_client, CLIENTS_NAMESPACE, ('list', after, limit),
+                            build_page, ttl=current_app.config.get('CLIENTS_CACHE_TTL', 300),
+                            generation=version)
+        response = add_page_headers(jsonify(page['items']), page['next'], limit)
+        return add_validators(response, etag, changed_at)
     except Exception as e:
         current_app.logger.error(f"Error in get_clients: {e}")
         return jsonify({'error': str(e)}), 500
 
-@clients_bp.route('/api/v1/clients/', methods=['POST'])
+@clients_bp.route('', methods=['POST'])
 @jwt_required()
 @limiter.limit("20 per minute")
 def create_client():
@@ -71,51 +80,264 @@ def create_client():
         )
         db.session.add(client)
         db.session.commit()
-        
-        # Clear the cache
-        redis_client = get_redis_client()
-        if redis_client:
-            redis_client.delete('clients_list')
+
+        try:
+            duplicates = dedup.possible_duplicates(client.name, client.date_of_birth, client.contact_info,
+                                                   exclude_id=client.id)
+        except Exception as e:
+            # Advisory only: the client is already saved
+            current_app.logger.warning(f"Duplicate check failed for client {client.id}: {e}")
+            duplicates = []
             
         return jsonify({
             'id': client.id,
             'name': client.name,
+            'possible_duplicates': duplicates,
             'message': 'Client created successfully'
         }), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@clients_bp.route('/api/v1/clients/<int:client_id>', methods=['GET'])
+@clients_bp.route('/search', methods=['GET'])
+@jwt_required()
+@limiter.limit("100 per minute")
+@replica_read
+def search_clients():
+    """Ranked search over client name and contact info (``?q=&limit=``)."""
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'error': 'q is required'}), 400
+    try:
+        limit = int(request.args.get('limit', search.DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    if limit < 1 or limit > search.MAX_LIMIT:
+        return jsonify({'error': f'limit must be between 1 and {search.MAX_LIMIT}'}), 400
+    try:
+        rows = search.search_clients(q, limit)
+        return jsonify([serialize_client(row) for row in rows])
+    except Exception as e:
+        current_app.logger.error(f"Error in search_clients: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@clients_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+@limiter.limit("5 per minute")
+def bulk_import_clients():
+    """Import clients from a streamed NDJSON or CSV body.
+
+    The format comes from ``?format=ndjson|csv`` or the Content-Type
+    (``application/x-ndjson`` or ``text/csv``). The response reports how many
+    rows were inserted and which lines were rejected and why.
+    """
+    fmt = request.args.get('format')
+    if fmt is None:
+        fmt = 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+    try:
+        from ..importer import import_clients  # only bulk uploads need the CSV/COPY machinery
+        report = import_clients(request.stream, fmt,
+                                batch_size=current_app.config.get('BULK_IMPORT_BATCH_SIZE', 1000))
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error in bulk_import_clients: {e}")
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify(report), 200
+
+def _client_not_found():
+    return jsonify({'error': 'Not Found', 'message': 'Client not found'}), 404
+
+def _invalidate_client(client_id):
+    """Drop a client from every cache layer after a committed write.
+
+    List pages need nothing: the write moved the change log head they are keyed by.
+    """
+    publish_invalidation(redis_client, CLIENT_DETAIL_NAMESPACE, client_id)
+
+def _load_client(client_id):
+    with primary():
+        client = db.session.query(*CLIENT_COLUMNS).filter(Client.id == client_id).first()
+    return serialize_client(client) if client else None
+
+@clients_bp.route('/<int:client_id>', methods=['GET'])
 @jwt_required()
 @limiter.limit("100 per minute")
+@replica_read
 def get_client(client_id):
+    """Return one client from the in-process cache, then Redis, then the database.
+
+    The ETag and Last-Modified come from ``updated_at``, so an unchanged
+    record is usually answered with a 304 straight from the in-process cache.
+    """
     try:
-        client = Client.query.get_or_404(client_id)
-        return jsonify({
-            'id': client.id,
-            'name': client.name,
-            'date_of_birth': client.date_of_birth.isoformat() if client.date_of_birth else None,
-            'contact_info': client.contact_info
-        })
+        client = get_cached_record(redis_client, CLIENT_DETAIL_NAMESPACE, client_id,
+                                   lambda: _load_client(client_id),
+                                   ttl=current_app.config.get('CLIENTS_CACHE_TTL', 300))
+        if client is None:
+            return _client_not_found()
+        etag = client_etag(client)
+        if is_not_modified(etag, client['updated_at']):
+            return not_modified(etag, client['updated_at'])
+        return add_validators(jsonify(client), etag, client['updated_at'])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@clients_bp.route('/api/v1/clients/<int:client_id>', methods=['DELETE'])
+def _load_clients(client_ids):
+    ids = [int(client_id) for client_id in client_ids]
+    # Older SQLite builds allow at most 999 bound parameters per statement
+    chunk = 900 if db.session.connection().dialect.name == 'sqlite' else len(ids)
+    clients = {}
+    with primary():
+        for start in range(0, len(ids), chunk):
+            rows = db.session.query(*CLIENT_COLUMNS).filter(Client.id.in_(ids[start:start + chunk]))
+            clients.update((row.id, serialize_client(row)) for row in rows)
+    return clients
+
+@clients_bp.route('/batch-get', methods=['POST'])
+@jwt_required()
+@limiter.limit("60 per minute")
+@replica_read
+def batch_get_clients():
+    """Look up many clients by id in one call: ``{"ids": [3, 1, 7]}``.
+
+    Results come back in request order, one ``{"id", "found", "client"}`` per
+    id. Cached records are read with one MGET and the rest with one IN query.
+    """
+    data = request.get_json(silent=True)
+    ids = data.get('ids') if isinstance(data, dict) else None
+    max_ids = current_app.config.get('CLIENT_BATCH_GET_MAX', 5000)
+    if not isinstance(ids, list) or not ids:
+        return jsonify({'error': 'ids must be a non-empty list of client ids'}), 400
+    if any(not isinstance(client_id, int) or isinstance(client_id, bool) for client_id in ids):
+        return jsonify({'error': 'ids must be integers'}), 400
+    if len(ids) > max_ids:
+        return jsonify({'error': f'At most {max_ids} ids per request'}), 400
+    try:
+        clients = get_cached_records(redis_client, CLIENT_DETAIL_NAMESPACE, ids, _load_clients,
+                                     ttl=current_app.config.get('CLIENTS_CACHE_TTL', 300))
+        results = []
+        for client_id in ids:
+            client = clients[str(client_id)]
+            results.append({'id': client_id, 'found': client is not None, 'client': client})
+        return jsonify({'results': results}), 200
+    except Exception as e:
+        current_app.logger.error(f"Error in batch_get_clients: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@clients_bp.route('/<int:client_id>', methods=['PUT'])
+@jwt_required()
+@limiter.limit("20 per minute")
+def update_client(client_id):
+    try:
+        client = Client.query.get(client_id)
+        if client is None:
+            return _client_not_found()
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+        if 'name' in data:
+            if not data['name']:
+                return jsonify({'error': 'Name is required'}), 400
+            client.name = data['name']
+        if 'date_of_birth' in data:
+            client.date_of_birth = datetime.strptime(data['date_of_birth'], '%Y-%m-%d').date() if data['date_of_birth'] else None
+        if 'contact_info' in data:
+            client.contact_info = data['contact_info']
+        db.session.commit()
+
+        _invalidate_client(client_id)
+
+        return jsonify(client.to_dict()), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@clients_bp.route('/<int:client_id>', methods=['DELETE'])
 @jwt_required()
 @limiter.limit("20 per minute")
 def delete_client(client_id):
     try:
-        client = Client.query.get_or_404(client_id)
+        client = Client.query.get(client_id)
+        if client is None:
+            return _client_not_found()
         db.session.delete(client)
         db.session.commit()
-        
-        # Clear the cache
-        redis_client = get_redis_client()
-        if redis_client:
-            redis_client.delete('clients_list')
-            
+
+        _invalidate_client(client_id)
+        photos.delete_photos(client_id)
+
         return jsonify({'message': 'Client deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': str(e)}), 500 
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@clients_bp.route('/<int:client_id>/programs', methods=['GET'])
+@jwt_required()
+@limiter.limit("100 per minute")
+@replica_read
+def get_client_programs(client_id):
+    """List a client's enrollments with their programs in a single joined query."""
+    if not db.session.query(Client.id).filter(Client.id == client_id).first():
+        return _client_not_found()
+    enrollments = (ClientProgram.query
+                   .options(joinedload(ClientProgram.program))
+                   .filter(ClientProgram.client_id == client_id)
+                   .order_by(ClientProgram.id))
+    return jsonify([enrollment.to_dict(include_program=True) for enrollment in enrollments])
+
+@clients_bp.route('/<int:client_id>/photo', methods=['PUT'])
+@jwt_required()
+@limiter.limit("20 per minute")
+def upload_client_photo(client_id):
+    """Store the request body (a JPEG, PNG or WebP image) as the client's photo.
+
+    The body is streamed to disk; the thumbnail is made in the background.
+    """
+    if not db.session.query(Client.id).filter(Client.id == client_id).first():
+        return _client_not_found()
+    max_bytes = current_app.config['MAX_CONTENT_LENGTH']
+    if request.content_length is not None and request.content_length > max_bytes:
+        return jsonify({'error': f'Photo must be at most {max_bytes} bytes'}), 413
+    try:
+        info = photos.save_photo(client_id, request.stream, max_bytes)
+    except photos.PhotoTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except photos.UnsupportedPhoto as e:
+        return jsonify({'error': str(e)}), 415
+    except Exception as e:
+        current_app.logger.error(f"Error in upload_client_photo: {e}")
+        return jsonify({'error': str(e)}), 500
+    photos.schedule_thumbnail(client_id)
+    return jsonify(dict(info, message='Photo uploaded successfully')), 200
+
+@clients_bp.route('/<int:client_id>/photo', methods=['GET'])
+@jwt_required()
+@limiter.limit("600 per minute")
+def get_client_photo(client_id):
+    """Serve the client's photo, or its thumbnail with ``?size=thumb``.
+
+    Supports ETag/If-None-Match, Last-Modified and Range requests; the file is
+    handed to the server's sendfile path rather than read into Python.
+    """
+    size = request.args.get('size', 'original')
+    if size not in ('original', 'thumb'):
+        return jsonify({'error': 'size must be original or thumb'}), 400
+    config = current_app.config
+    if size == 'thumb':
+        path = photos.ensure_thumbnail(client_id, config.get('PHOTO_THUMBNAIL_WAIT', 5))
+        mimetype = 'image/jpeg'
+    else:
+        found = photos.find_photo(client_id)
+        path, mimetype = found if found else (None, None)
+    if path is None:
+        return jsonify({'error': 'Not Found', 'message': 'Photo not found'}), 404
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=True)
+    # Patient photos: cacheable by the browser only, never by shared proxies
+    response.headers['Cache-Control'] = f"private, max-age={config.get('PHOTO_CACHE_MAX_AGE', 3600)}"
+    return response
@@ -0,0 +1,33 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from ..extensions import limiter, redis_client
+from ..cohorts import query_cohort
+from ..pagination import parse_page_args
+from ..replicas import replica_read
+
+cohorts_bp = Blueprint('cohorts', __name__)
+
+@cohorts_bp.route('/query', methods=['POST'])
+@jwt_required()
+@limiter.limit("60 per minute")
+@replica_read
+def cohort_query():
+    """Clients matching a declarative filter, as a page of ids or a count.
+
+    Body: ``{"filter": {...}, "select": "ids"|"count", "after": 0, "limit": 100}``;
+    see app/cohorts.py for the filter fields. Pages of ids continue from the
+    ``next`` cursor.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or 'filter' not in data:
+        return jsonify({'error': 'filter is required'}), 400
+    try:
+        after, limit = parse_page_args(args=data)
+        result = query_cohort(redis_client, data['filter'], data.get('select', 'ids'), after, limit,
+                              ttl=current_app.config.get('COHORT_CACHE_TTL', 300))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error in cohort_query: {e}")
+        return jsonify({'error': str(e)}), 500
+    return jsonify(result), 200
@@ -0,0 +1,85 @@
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from flask_jwt_extended import jwt_required
+from ..extensions import db, limiter
+from ..models.models import Client, HealthProgram, ClientProgram, parse_timestamp
+from ..replicas import replica_read
+from ..streaming import stream_rows, encode_ndjson, encode_csv, gzip_stream
+
+export_bp = Blueprint('export', __name__)
+
+MIMETYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+def _clients_statement():
+    client = Client.__table__
+    return db.select(client.c.id, client.c.name, client.c.date_of_birth, client.c.contact_info,
+                     client.c.created_at, client.c.updated_at), client.c.updated_at, client.c.id
+
+def _enrollments_statement():
+    enrollment = ClientProgram.__table__
+    client = Client.__table__
+    program = HealthProgram.__table__
+    statement = db.select(
+        enrollment.c.id,
+        enrollment.c.client_id,
+        client.c.name.label('client_name'),
+        enrollment.c.program_id,
+        program.c.name.label('program_name'),
+        enrollment.c.status,
+        enrollment.c.enrollment_date,
+        enrollment.c.created_at,
+        enrollment.c.updated_at
+    ).select_from(
+        enrollment.join(client, enrollment.c.client_id == client.c.id)
+                  .join(program, enrollment.c.program_id == program.c.id)
+    )
+    return statement, enrollment.c.updated_at, enrollment.c.id
+
+def _export(name, build_statement):
+    """Stream every row of an export as NDJSON or CSV, optionally gzipped.
+
+    Query parameters: ``format`` (ndjson or csv), ``updated_since`` (ISO 8601
+    timestamp; UTC unless it carries an offset) and ``gzip``. Gzip is also used when the client sends
+    ``Accept-Encoding: gzip``.
+    """
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in MIMETYPES:
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+
+    statement, updated_column, order_column = build_statement()
+    updated_since = request.args.get('updated_since')
+    if updated_since:
+        try:
+            statement = statement.where(updated_column >= parse_timestamp(updated_since))
+        except ValueError:
+            return jsonify({'error': 'updated_since must be an ISO 8601 timestamp'}), 400
+    statement = statement.order_by(order_column)
+    columns = [column.name for column in statement.selected_columns]
+
+    encode = encode_csv if fmt == 'csv' else encode_ndjson
+    batches = stream_rows(db.session.connection(), statement,
+                          batch_size=current_app.config.get('EXPORT_BATCH_SIZE', 2000))
+    body = encode(batches, columns)
+
+    headers = {'Content-Disposition': f'attachment; filename={name}.{fmt}'}
+    use_gzip = (request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+                or 'gzip' in request.accept_encodings)
+    if use_gzip:
+        body = gzip_stream(body, level=current_app.config.get('EXPORT_GZIP_LEVEL', 3))
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+
+    return Response(stream_with_context(body), mimetype=MIMETYPES[fmt], headers=headers)
+
+@export_bp.route('/clients', methods=['GET'])
+@jwt_required()
+@limiter.limit("10 per minute")
+@replica_read
+def export_clients():
+    return _export('clients', _clients_statement)
+
+@export_bp.route('/enrollments', methods=['GET'])
+@jwt_required()
+@limiter.limit("10 per minute")
+@replica_read
+def export_enrollments():
+    return _export('enrollments', _enrollments_statement)
@@ -1,5 +1,8 @@
 from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required
 from flask_swagger_ui import get_swaggerui_blueprint
+from .. import cache
+from ..extensions import redis_client
 
 main_bp = Blueprint('main', __name__)
 
@@ -38,4 +41,25 @@ def api_info():
             'auth': '/api/v1/auth/login',
             'docs': '/api/v1/docs'
         }
-    }) 
\ No newline at end of file
+    }) 
+
+@main_bp.route('/api/v1/cache/stats')
+@jwt_required()
+def cache_stats():
+    """Cache hit/miss/rebuild counters of the worker serving this request."""
+    snapshot = cache.stats.snapshot()
+    snapshot['local'] = {cache.CLIENT_DETAIL_NAMESPACE: cache.local_clients.snapshot()}
+    return jsonify(snapshot)
+
+
+@main_bp.route('/api/v1/health')
+def health():
+    """Liveness plus the Redis circuit-breaker state; safe to expose unauthenticated."""
+    return jsonify({'status': 'ok', 'redis': {'breaker': redis_client.breaker.state}})
+
+
+@main_bp.route('/api/v1/health/details')
+@jwt_required()
+def health_details():
+    """Redis latency, pool and circuit-breaker stats, including the last error."""
+    return jsonify({'status': 'ok', 'redis': redis_client.health()})
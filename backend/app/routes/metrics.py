@@ -0,0 +1,12 @@
+from flask import Blueprint, Response
+from prometheus_client import CONTENT_TYPE_LATEST
+from ..extensions import limiter
+from .. import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics')
+@limiter.exempt
+def prometheus_metrics():
+    """Prometheus exposition endpoint scraped by monitoring/prometheus.yml."""
+    return Response(metrics.collect(), mimetype=CONTENT_TYPE_LATEST)
@@ -0,0 +1,225 @@
+from datetime import datetime
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from ..extensions import db, limiter
+from ..models.models import Client, HealthProgram, ClientProgram, ENROLLMENT_STATUSES, parse_timestamp
+from ..replicas import replica_read
+from ..stats import status_counts_statement
+from ..pagination import parse_page_args, keyset_page, add_page_headers
+from ..conditional import program_etag, is_not_modified, not_modified, add_validators
+
+programs_bp = Blueprint('programs', __name__)
+
+def _program_not_found():
+    return jsonify({'error': 'Not Found', 'message': 'Program not found'}), 404
+
+def _enrollment_counts(program_ids):
+    """Enrollee counts by status for several programs.
+
+    Read from the trigger-maintained ``program_status_count`` rows (see
+    app/stats.py): a few rows per program however many enrollments it has.
+    """
+    counts = {program_id: {} for program_id in program_ids}
+    if not program_ids:
+        return counts
+    for program_id, status, count in db.session.execute(status_counts_statement(program_ids)):
+        counts[program_id][status] = count
+    return counts
+
+def _validate_status(data):
+    status = data.get('status', 'active')
+    if status not in ENROLLMENT_STATUSES:
+        raise ValueError(f"status must be one of: {', '.join(ENROLLMENT_STATUSES)}")
+    return status
+
+@programs_bp.route('', methods=['GET'])
+@jwt_required()
+@limiter.limit("100 per minute")
+@replica_read
+def get_programs():
+    """List programs by id (keyset pagination) with enrollee counts per status."""
+    try:
+        after, limit = parse_page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        programs, next_cursor = keyset_page(HealthProgram.query, HealthProgram.id, after, limit)
+        counts = _enrollment_counts([program.id for program in programs])
+        result = [dict(program.to_dict(), enrollments=counts[program.id]) for program in programs]
+        return add_page_headers(jsonify(result), next_cursor, limit)
+    except Exception as e:
+        current_app.logger.error(f"Error in get_programs: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@programs_bp.route('', methods=['POST'])
+@jwt_required()
+@limiter.limit("20 per minute")
+def create_program():
+    try:
+        data = request.get_json()
+        if not data or not data.get('name'):
+            return jsonify({'error': 'Name is required'}), 400
+        program = HealthProgram(name=data['name'], description=data.get('description'))
+        db.session.add(program)
+        db.session.commit()
+        return jsonify(program.to_dict()), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@programs_bp.route('/<int:program_id>', methods=['GET'])
+@jwt_required()
+@limiter.limit("100 per minute")
+@replica_read
+def get_program(program_id):
+    program = HealthProgram.query.get(program_id)
+    if program is None:
+        return _program_not_found()
+    counts = _enrollment_counts([program_id])[program_id]
+    etag = program_etag(program, counts)
+    if is_not_modified(etag):
+        return not_modified(etag)
+    return add_validators(jsonify(dict(program.to_dict(), enrollments=counts)), etag)
+
+@programs_bp.route('/<int:program_id>', methods=['PUT'])
+@jwt_required()
+@limiter.limit("20 per minute")
+def update_program(program_id):
+    try:
+        program = HealthProgram.query.get(program_id)
+        if program is None:
+            return _program_not_found()
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+        if 'name' in data:
+            if not data['name']:
+                return jsonify({'error': 'Name is required'}), 400
+            program.name = data['name']
+        if 'description' in data:
+            program.description = data['description']
+        db.session.commit()
+        return jsonify(program.to_dict()), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@programs_bp.route('/<int:program_id>', methods=['DELETE'])
+@jwt_required()
+@limiter.limit("20 per minute")
+def delete_program(program_id):
+    try:
+        program = HealthProgram.query.get(program_id)
+        if program is None:
+            return _program_not_found()
+        db.session.delete(program)
+        db.session.commit()
+        return jsonify({'message': 'Program deleted successfully'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@programs_bp.route('/<int:program_id>/enrollments', methods=['GET'])
+@jwt_required()
+@limiter.limit("100 per minute")
+@replica_read
+def get_program_enrollments(program_id):
+    """List a program's enrollments with their clients in a single joined query.
+
+    Supports ``?status=`` plus the usual ``after``/``limit`` keyset cursor.
+    """
+    try:
+        after, limit = parse_page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if HealthProgram.query.get(program_id) is None:
+        return _program_not_found()
+
+    query = (ClientProgram.query
+             .options(joinedload(ClientProgram.client))
+             .filter(ClientProgram.program_id == program_id))
+    status = request.args.get('status')
+    if status:
+        query = query.filter(ClientProgram.status == status)
+    enrollments, next_cursor = keyset_page(query, ClientProgram.id, after, limit)
+    result = [enrollment.to_dict(include_client=True) for enrollment in enrollments]
+    return add_page_headers(jsonify(result), next_cursor, limit)
+
+@programs_bp.route('/<int:program_id>/enrollments', methods=['POST'])
+@jwt_required()
+@limiter.limit("20 per minute")
+def enroll_client(program_id):
+    try:
+        data = request.get_json()
+        if not data or 'client_id' not in data:
+            return jsonify({'error': 'client_id is required'}), 400
+        client_id = data['client_id']
+        if not isinstance(client_id, int) or isinstance(client_id, bool):
+            return jsonify({'error': 'client_id must be an integer'}), 400
+        try:
+            status = _validate_status(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        try:
+            enrollment_date = (parse_timestamp(data['enrollment_date'])
+                               if data.get('enrollment_date') else datetime.utcnow())
+        except ValueError:
+            return jsonify({'error': 'enrollment_date must be an ISO 8601 timestamp'}), 400
+        if HealthProgram.query.get(program_id) is None:
+            return _program_not_found()
+        if Client.query.get(client_id) is None:
+            return jsonify({'error': 'Not Found', 'message': 'Client not found'}), 404
+
+        enrollment = ClientProgram(client_id=client_id, program_id=program_id,
+                                   status=status, enrollment_date=enrollment_date)
+        db.session.add(enrollment)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'error': 'Client is already enrolled in this program'}), 409
+        return jsonify(enrollment.to_dict()), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+def _get_enrollment(program_id, enrollment_id):
+    return ClientProgram.query.filter_by(id=enrollment_id, program_id=program_id).first()
+
+@programs_bp.route('/<int:program_id>/enrollments/<int:enrollment_id>', methods=['PATCH'])
+@jwt_required()
+@limiter.limit("20 per minute")
+def update_enrollment(program_id, enrollment_id):
+    try:
+        enrollment = _get_enrollment(program_id, enrollment_id)
+        if enrollment is None:
+            return jsonify({'error': 'Not Found', 'message': 'Enrollment not found'}), 404
+        data = request.get_json()
+        if not data or 'status' not in data:
+            return jsonify({'error': 'status is required'}), 400
+        try:
+            enrollment.status = _validate_status(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        db.session.commit()
+        return jsonify(enrollment.to_dict()), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@programs_bp.route('/<int:program_id>/enrollments/<int:enrollment_id>', methods=['DELETE'])
+@jwt_required()
+@limiter.limit("20 per minute")
+def delete_enrollment(program_id, enrollment_id):
+    try:
+        enrollment = _get_enrollment(program_id, enrollment_id)
+        if enrollment is None:
+            return jsonify({'error': 'Not Found', 'message': 'Enrollment not found'}), 404
+        db.session.delete(enrollment)
+        db.session.commit()
+        return jsonify({'message': 'Enrollment deleted successfully'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
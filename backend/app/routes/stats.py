@@ -0,0 +1,29 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from ..extensions import limiter
+from ..replicas import replica_read
+from ..stats import get_stats, DEFAULT_DAYS, MAX_DAYS
+
+stats_bp = Blueprint('stats', __name__)
+
+@stats_bp.route('', methods=['GET'])
+@jwt_required()
+@limiter.limit("100 per minute")
+@replica_read
+def get_dashboard_stats():
+    """Enrollees per program and status, enrollments per day and client age bands.
+
+    Read from the summary tables, so the cost does not grow with the number of
+    enrollments. ``?days=`` sets the daily window (default 30).
+    """
+    try:
+        days = int(request.args.get('days', DEFAULT_DAYS))
+    except ValueError:
+        return jsonify({'error': 'days must be an integer'}), 400
+    if days < 1 or days > MAX_DAYS:
+        return jsonify({'error': f'days must be between 1 and {MAX_DAYS}'}), 400
+    try:
+        return jsonify(get_stats(days)), 200
+    except Exception as e:
+        current_app.logger.error(f"Error in get_dashboard_stats: {e}")
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,182 @@
+"""Indexed client search.
+
+PostgreSQL uses pg_trgm GIN indexes on ``client.name`` and
+``client.contact_info``; the database keeps them current on every write.
+SQLite uses an external-content FTS5 table with the trigram tokenizer, kept in
+sync by triggers, so ORM writes, bulk Core inserts and deletes all update it
+inside their own transaction.
+"""
+from itertools import combinations
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import DDL, event, text
+
+from .extensions import db
+from .models.models import Client
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Trigram matching needs at least three characters; shorter queries fall
+# back to an indexed prefix range on client.name.
+MIN_TRIGRAM_LENGTH = 3
+
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS client_search USING fts5("
+    "name, contact_info, content='client', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS client_search_ai AFTER INSERT ON client BEGIN "
+    "INSERT INTO client_search(rowid, name, contact_info) VALUES (new.id, new.name, new.contact_info); END",
+    "CREATE TRIGGER IF NOT EXISTS client_search_ad AFTER DELETE ON client BEGIN "
+    "INSERT INTO client_search(client_search, rowid, name, contact_info) "
+    "VALUES ('delete', old.id, old.name, old.contact_info); END",
+    "CREATE TRIGGER IF NOT EXISTS client_search_au AFTER UPDATE OF name, contact_info ON client BEGIN "
+    "INSERT INTO client_search(client_search, rowid, name, contact_info) "
+    "VALUES ('delete', old.id, old.name, old.contact_info); "
+    "INSERT INTO client_search(rowid, name, contact_info) VALUES (new.id, new.name, new.contact_info); END",
+)
+
+POSTGRESQL_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_client_name_trgm ON client USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_client_contact_info_trgm ON client USING gin (contact_info gin_trgm_ops)",
+)
+
+for _statement in SQLITE_DDL:
+    event.listen(Client.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+for _statement in POSTGRESQL_DDL:
+    event.listen(Client.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+event.listen(Client.__table__, 'before_drop',
+             DDL('DROP TABLE IF EXISTS client_search').execute_if(dialect='sqlite'))
+
+CLIENT_COLUMNS = 'c.id, c.name, c.date_of_birth, c.contact_info, c.created_at, c.updated_at'
+RESULT_COLUMNS = (Client.id, Client.name, Client.date_of_birth, Client.contact_info,
+                  Client.created_at, Client.updated_at)
+MAX_FUZZY_TRIGRAMS = 8
+
+
+def install(connection):
+    """Create the search index on an existing database (idempotent)."""
+    statements = {'sqlite': SQLITE_DDL, 'postgresql': POSTGRESQL_DDL}.get(connection.dialect.name, ())
+    for statement in statements:
+        connection.execute(text(statement))
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text("INSERT INTO client_search(client_search) VALUES ('rebuild')"))
+
+
+def _fts_phrase(value):
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _trigrams(value):
+    value = f'  {value.lower()} '
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def similarity(a, b):
+    """Trigram similarity in [0, 1], the same measure pg_trgm uses."""
+    if not a or not b:
+        return 0.0
+    left, right = _trigrams(a), _trigrams(b)
+    return len(left & right) / len(left | right)
+
+
+def _rank(rows, q, limit):
+    lowered = q.lower()
+
+    def score(row):
+        name = row.name.lower()
+        best = max(similarity(q, row.name), similarity(q, row.contact_info or ''))
+        if name.startswith(lowered):
+            best += 1.0
+        elif lowered in name or lowered in (row.contact_info or '').lower():
+            best += 0.5
+        return best
+
+    return sorted(rows, key=lambda row: (-score(row), row.id))[:limit]
+
+
+def _search_sqlite(session, q, limit):
+    # FTS5 gathers a bounded candidate set in rowid order (it stops at the
+    # cap instead of ranking every match), and the candidates are scored in
+    # Python. Exact substring hits come first. If there are not enough, a
+    # fuzzy pass matches rows that share any two of the query's trigrams,
+    # which tolerates a typo anywhere in the query.
+    cap = current_app.config.get('SEARCH_CANDIDATE_LIMIT', 400)
+    candidates = text('SELECT rowid FROM client_search WHERE client_search MATCH :match LIMIT :cap')
+    ids = [row[0] for row in session.execute(candidates, {'match': _fts_phrase(q), 'cap': cap})]
+    if len(ids) < limit:
+        trigrams = sorted({q[i:i + 3] for i in range(len(q) - 2)})[:MAX_FUZZY_TRIGRAMS]
+        if len(trigrams) > 1:
+            pairs = ' OR '.join(f'({_fts_phrase(a)} AND {_fts_phrase(b)})'
+                                for a, b in combinations(trigrams, 2))
+            seen = set(ids)
+            ids.extend(row[0] for row in session.execute(candidates, {'match': pairs, 'cap': cap})
+                       if row[0] not in seen)
+    if not ids:
+        return []
+    rows = session.query(*RESULT_COLUMNS).filter(Client.id.in_(ids)).all()
+    return _rank(rows, q, limit)
+
+
+def _search_postgresql(session, q, limit):
+    # The trigram GIN indexes serve both the similarity operator and the
+    # ILIKE substring match. The inner LIMIT bounds how many rows are ranked.
+    statement = text(
+        'SELECT * FROM ('
+        f'SELECT {CLIENT_COLUMNS}, '
+        'GREATEST(similarity(c.name, :q), similarity(coalesce(c.contact_info, \'\'), :q)) AS rank '
+        'FROM client c '
+        'WHERE c.name % :q OR c.name ILIKE :pattern OR c.contact_info ILIKE :pattern '
+        'LIMIT :cap) candidates '
+        'ORDER BY rank DESC, id LIMIT :limit'
+    ).columns(*RESULT_COLUMNS, db.column('rank', db.Float))
+    pattern = '%' + q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    cap = current_app.config.get('SEARCH_CANDIDATE_LIMIT', 400)
+    return session.execute(statement, {'q': q, 'pattern': pattern, 'cap': cap, 'limit': limit}).fetchall()
+
+
+def _search_prefix(session, q, limit):
+    # Range scans on the client.name index; tries the query as typed and
+    # capitalised, since names are usually stored capitalised.
+    rows = []
+    for prefix in dict.fromkeys((q, q[:1].upper() + q[1:])):
+        query = (session.query(*RESULT_COLUMNS)
+                 .filter(Client.name >= prefix, Client.name < prefix + '\uffff')
+                 .order_by(Client.name)
+                 .limit(limit - len(rows)))
+        rows.extend(query)
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+def search_clients(q, limit=DEFAULT_LIMIT):
+    """Return up to ``limit`` client rows matching ``q``, best matches first."""
+    q = q.strip()
+    session = db.session
+    if len(q) < MIN_TRIGRAM_LENGTH:
+        return _search_prefix(session, q, limit)
+    dialect = session.connection().dialect.name
+    if dialect == 'postgresql':
+        return _search_postgresql(session, q, limit)
+    if dialect == 'sqlite':
+        return _search_sqlite(session, q, limit)
+    # Other backends: unindexed substring match, kept only so search works.
+    pattern = f'%{q}%'
+    return (session.query(*RESULT_COLUMNS)
+            .filter(db.or_(Client.name.ilike(pattern), Client.contact_info.ilike(pattern)))
+            .order_by(Client.id).limit(limit).all())
+
+
+@click.command('search-index')
+@with_appcontext
+def search_index_command():
+    """Create or rebuild the client search index."""
+    with db.engine.begin() as connection:
+        install(connection)
+    click.echo('Client search index is up to date.')
+
+
+def init_app(app):
+    app.cli.add_command(search_index_command)
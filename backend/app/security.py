@@ -0,0 +1,171 @@
+"""Password verification kept off the request threads.
+
+PBKDF2 is pure CPU and holds the GIL, so verifying a hash inline stalls every
+other thread in the worker. Hashes are checked in a small process pool
+instead, behind two guards: a per-process cap on pending verifications and
+a per-username concurrency limit. A login burst is shed with 429s instead of
+starving the API.
+
+Repeated failures slow down, rather than lock out, further attempts. They
+are counted per username *and* client address, so someone guessing
+passwords only delays their own attempts, never the account owner's.
+"""
+import math
+import os
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import redis
+from flask import current_app
+from flask_limiter.util import get_remote_address
+from werkzeug.security import check_password_hash
+
+
+class LoginThrottled(Exception):
+    """Raised when a login attempt is refused before any hashing happens."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after  # seconds, when known
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_pending = None
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    global _pool, _pool_pid
+    if _pool is not None and _pool_pid == os.getpid():
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # Imported here: most workers never need a pool before their first login.
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # "spawn" keeps the helpers free of the parent's threads and sockets.
+            _pool = ProcessPoolExecutor(max_workers=workers,
+                                        mp_context=multiprocessing.get_context('spawn'))
+            _pool_pid = os.getpid()
+    return _pool
+
+
+def _get_pending_semaphore(limit):
+    global _pending
+    if _pending is None:
+        with _pool_lock:
+            if _pending is None:
+                _pending = threading.BoundedSemaphore(limit)
+    return _pending
+
+
+def reset():
+    """Forget the pool and guards inherited from a parent process (post-fork)."""
+    global _pool, _pool_pid, _pending
+    _pool = None
+    _pool_pid = None
+    _pending = None
+    with _in_flight_lock:
+        _in_flight.clear()
+
+
+def shutdown():
+    global _pool
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.shutdown(wait=False)
+    _pool = None
+
+
+def verify_password(password_hash, password):
+    """Check ``password`` against ``password_hash`` in the hashing pool.
+
+    Runs inline when ``PASSWORD_HASH_WORKERS`` is 0. Raises LoginThrottled if
+    too many verifications are already queued in this process.
+    """
+    config = current_app.config
+    workers = config.get('PASSWORD_HASH_WORKERS', 2)
+    if not password_hash:
+        return False
+    if workers <= 0:
+        return check_password_hash(password_hash, password)
+
+    pending = _get_pending_semaphore(config.get('PASSWORD_HASH_MAX_PENDING', 16))
+    if not pending.acquire(blocking=False):
+        raise LoginThrottled('Too many logins in progress, please retry shortly')
+    try:
+        future = _get_pool(workers).submit(check_password_hash, password_hash, password)
+        try:
+            return future.result(timeout=config.get('PASSWORD_HASH_TIMEOUT', 5))
+        except FutureTimeoutError:
+            future.cancel()
+            raise LoginThrottled('Login timed out, please retry shortly')
+    finally:
+        pending.release()
+
+
+class login_guard:
+    """Context manager limiting concurrent logins per username and failed ones per username and address.
+
+    Concurrency is limited per process. After ``LOGIN_MAX_FAILURES`` failures
+    from one address, each further failure makes that address wait before
+    its next attempt, starting at ``LOGIN_BACKOFF_SECONDS`` and doubling up
+    to ``LOGIN_BACKOFF_MAX``. The counters are kept in Redis so they apply
+    across workers; while Redis is unreachable, only the local concurrency
+    limit applies. Use within a request.
+    """
+
+    def __init__(self, username, redis_client):
+        self.username = username
+        self.redis_client = redis_client
+        scope = f'{username}:{get_remote_address()}'
+        self.failure_key = f'login:failures:{scope}'
+        self.backoff_key = f'login:backoff:{scope}'
+
+    def __enter__(self):
+        config = current_app.config
+        try:
+            backoff_ms = self.redis_client.pttl(self.backoff_key)
+        except redis.RedisError:
+            backoff_ms = -2
+        if backoff_ms > 0:
+            raise LoginThrottled('Too many failed login attempts, please retry later',
+                                 retry_after=math.ceil(backoff_ms / 1000))
+
+        with _in_flight_lock:
+            if _in_flight.get(self.username, 0) >= config.get('LOGIN_MAX_CONCURRENT_PER_USER', 2):
+                raise LoginThrottled('Too many concurrent login attempts for this user')
+            _in_flight[self.username] = _in_flight.get(self.username, 0) + 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with _in_flight_lock:
+            remaining = _in_flight.get(self.username, 1) - 1
+            if remaining:
+                _in_flight[self.username] = remaining
+            else:
+                _in_flight.pop(self.username, None)
+        return False
+
+    def record_failure(self):
+        config = current_app.config
+        try:
+            pipe = self.redis_client.pipeline()
+            pipe.incr(self.failure_key)
+            pipe.expire(self.failure_key, config.get('LOGIN_FAILURE_WINDOW', 900))
+            failures = pipe.execute()[0]
+            excess = failures - config.get('LOGIN_MAX_FAILURES', 10)
+            if excess >= 0:
+                delay = min(config.get('LOGIN_BACKOFF_SECONDS', 1) * 2 ** min(excess, 20),
+                            config.get('LOGIN_BACKOFF_MAX', 300))
+                self.redis_client.set(self.backoff_key, 1, px=max(int(delay * 1000), 1))
+        except redis.RedisError:
+            pass
+
+    def record_success(self):
+        try:
+            self.redis_client.delete(self.failure_key, self.backoff_key)
+        except redis.RedisError:
+            pass
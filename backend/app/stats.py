@@ -0,0 +1,315 @@
+"""Program statistics from incrementally maintained summary tables.
+
+Row triggers on ``client_program`` and ``client`` keep three small tables
+current inside each write's own transaction. ORM writes, bulk Core inserts,
+COPY and cascading deletes are all covered:
+
+* ``program_status_count``: enrollees per program and status
+* ``enrollment_day_count``: enrollments per program and enrollment day
+* ``client_birth_year_count``: clients per birth year (0 when unknown)
+
+Reads touch O(programs + days + birth years) rows, whatever the number of
+enrollments. Age bands are derived from birth years at read time, so the
+counters never go stale as clients get older. ``flask stats-rebuild`` recounts
+from source and corrects any drift without locking writers out; run it
+periodically (``--every``) as a safety net.
+"""
+import time
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import DDL, event, func, select, text
+
+from .extensions import db
+from .models.models import ClientBirthYearCount, EnrollmentDayCount, HealthProgram, ProgramStatusCount
+
+STATS_TABLES = ('program_status_count', 'enrollment_day_count', 'client_birth_year_count')
+AGE_BANDS = (0, 18, 35, 50, 65)  # lower bounds; the last band is open-ended
+DEFAULT_DAYS = 30
+MAX_DAYS = 366
+
+# Upserts and decrements shared by the SQLite and PostgreSQL triggers. Only
+# the SELECT ... WHERE form lets SQLite skip a row inside a trigger body.
+_STATUS_UP = (
+    "INSERT INTO program_status_count (program_id, status, count) "
+    "SELECT {row}.program_id, COALESCE({row}.status, 'active'), 1 WHERE true "
+    "ON CONFLICT (program_id, status) DO UPDATE SET count = program_status_count.count + 1"
+)
+_STATUS_DOWN = (
+    "UPDATE program_status_count SET count = count - 1 "
+    "WHERE program_id = {row}.program_id AND status = COALESCE({row}.status, 'active')"
+)
+_DAY_UP = (
+    "INSERT INTO enrollment_day_count (day, program_id, count) "
+    "SELECT {day}, {row}.program_id, 1 WHERE {row}.enrollment_date IS NOT NULL "
+    "ON CONFLICT (day, program_id) DO UPDATE SET count = enrollment_day_count.count + 1"
+)
+_DAY_DOWN = (
+    "UPDATE enrollment_day_count SET count = count - 1 "
+    "WHERE day = {day} AND program_id = {row}.program_id"
+)
+_YEAR_UP = (
+    "INSERT INTO client_birth_year_count (birth_year, count) SELECT {year}, 1 WHERE true "
+    "ON CONFLICT (birth_year) DO UPDATE SET count = client_birth_year_count.count + 1"
+)
+_YEAR_DOWN = "UPDATE client_birth_year_count SET count = count - 1 WHERE birth_year = {year}"
+
+
+def _sqlite_year(row):
+    return f"COALESCE(CAST(substr({row}.date_of_birth, 1, 4) AS INTEGER), 0)"
+
+
+def _sqlite_body(*statements):
+    return ' BEGIN ' + ' '.join(statement + ';' for statement in statements) + ' END'
+
+
+def _sqlite_ddl():
+    enrollment = {'new': dict(row='new', day='date(new.enrollment_date)'),
+                  'old': dict(row='old', day='date(old.enrollment_date)')}
+    return (
+        "CREATE TRIGGER IF NOT EXISTS stats_client_program_ai AFTER INSERT ON client_program"
+        + _sqlite_body(_STATUS_UP.format(**enrollment['new']), _DAY_UP.format(**enrollment['new'])),
+        "CREATE TRIGGER IF NOT EXISTS stats_client_program_ad AFTER DELETE ON client_program"
+        + _sqlite_body(_STATUS_DOWN.format(**enrollment['old']), _DAY_DOWN.format(**enrollment['old'])),
+        "CREATE TRIGGER IF NOT EXISTS stats_client_program_au "
+        "AFTER UPDATE OF program_id, status, enrollment_date ON client_program"
+        + _sqlite_body(_STATUS_DOWN.format(**enrollment['old']), _DAY_DOWN.format(**enrollment['old']),
+                       _STATUS_UP.format(**enrollment['new']), _DAY_UP.format(**enrollment['new'])),
+        "CREATE TRIGGER IF NOT EXISTS stats_client_ai AFTER INSERT ON client"
+        + _sqlite_body(_YEAR_UP.format(year=_sqlite_year('new'))),
+        "CREATE TRIGGER IF NOT EXISTS stats_client_ad AFTER DELETE ON client"
+        + _sqlite_body(_YEAR_DOWN.format(year=_sqlite_year('old'))),
+        "CREATE TRIGGER IF NOT EXISTS stats_client_au AFTER UPDATE OF date_of_birth ON client"
+        + _sqlite_body(_YEAR_DOWN.format(year=_sqlite_year('old')), _YEAR_UP.format(year=_sqlite_year('new'))),
+    )
+
+
+def _postgresql_ddl():
+    old = dict(row='OLD', day='OLD.enrollment_date::date')
+    new = dict(row='NEW', day='NEW.enrollment_date::date')
+    old_year = "COALESCE(EXTRACT(YEAR FROM OLD.date_of_birth)::int, 0)"
+    new_year = "COALESCE(EXTRACT(YEAR FROM NEW.date_of_birth)::int, 0)"
+    return (
+        "CREATE OR REPLACE FUNCTION stats_client_program() RETURNS trigger AS $$ BEGIN "
+        "IF TG_OP IN ('UPDATE', 'DELETE') THEN "
+        f"{_STATUS_DOWN.format(**old)}; {_DAY_DOWN.format(**old)}; END IF; "
+        "IF TG_OP IN ('INSERT', 'UPDATE') THEN "
+        f"{_STATUS_UP.format(**new)}; {_DAY_UP.format(**new)}; END IF; "
+        "RETURN NULL; END $$ LANGUAGE plpgsql",
+        "CREATE OR REPLACE FUNCTION stats_client() RETURNS trigger AS $$ BEGIN "
+        f"IF TG_OP IN ('UPDATE', 'DELETE') THEN {_YEAR_DOWN.format(year=old_year)}; END IF; "
+        f"IF TG_OP IN ('INSERT', 'UPDATE') THEN {_YEAR_UP.format(year=new_year)}; END IF; "
+        "RETURN NULL; END $$ LANGUAGE plpgsql",
+        "DROP TRIGGER IF EXISTS stats_client_program ON client_program",
+        "CREATE TRIGGER stats_client_program "
+        "AFTER INSERT OR DELETE OR UPDATE OF program_id, status, enrollment_date ON client_program "
+        "FOR EACH ROW EXECUTE FUNCTION stats_client_program()",
+        "DROP TRIGGER IF EXISTS stats_client ON client",
+        "CREATE TRIGGER stats_client AFTER INSERT OR DELETE OR UPDATE OF date_of_birth ON client "
+        "FOR EACH ROW EXECUTE FUNCTION stats_client()",
+    )
+
+
+SQLITE_DDL = _sqlite_ddl()
+POSTGRESQL_DDL = _postgresql_ddl()
+
+# After the whole metadata, so the summary tables exist before the triggers.
+for _statement in SQLITE_DDL:
+    event.listen(db.metadata, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+for _statement in POSTGRESQL_DDL:
+    event.listen(db.metadata, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+
+# Key columns of each summary table, and the recount of it from source
+STATS_KEYS = {
+    'program_status_count': ('program_id', 'status'),
+    'enrollment_day_count': ('day', 'program_id'),
+    'client_birth_year_count': ('birth_year',),
+}
+COUNT_SQL = {
+    'program_status_count':
+        "SELECT program_id, COALESCE(status, 'active'), count(*) FROM client_program "
+        "GROUP BY program_id, COALESCE(status, 'active')",
+    'enrollment_day_count':
+        "SELECT {day}, program_id, count(*) FROM client_program WHERE enrollment_date IS NOT NULL "
+        "GROUP BY {day}, program_id",
+    'client_birth_year_count':
+        "SELECT {year}, count(*) FROM client GROUP BY {year}",
+}
+
+
+def install(connection):
+    """Create the triggers on an existing database and fill the tables (idempotent)."""
+    statements = {'sqlite': SQLITE_DDL, 'postgresql': POSTGRESQL_DDL}.get(connection.dialect.name, ())
+    for statement in statements:
+        connection.execute(text(statement))
+    rebuild(connection)
+
+
+def _snapshot(connection):
+    # {(table, key columns...): count}, skipping zero rows left behind by decrements
+    snapshot = {}
+    for table in STATS_TABLES:
+        columns = ', '.join(STATS_KEYS[table])
+        for row in connection.execute(text(f'SELECT {columns}, count FROM {table} WHERE count <> 0')):
+            snapshot[(table,) + tuple(row[:-1])] = row[-1]
+    return snapshot
+
+
+def measure_drift(connection):
+    """``{(table, key columns...): correction}`` for every summary row that is off.
+
+    Recounts from source and compares with the summary tables. Both must be
+    read from one snapshot (REPEATABLE READ on PostgreSQL), which the
+    triggers keep consistent, so no lock is needed.
+    """
+    if connection.dialect.name == 'postgresql':
+        day, year = 'enrollment_date::date', 'COALESCE(EXTRACT(YEAR FROM date_of_birth)::int, 0)'
+    else:
+        day, year = 'date(enrollment_date)', 'COALESCE(CAST(substr(date_of_birth, 1, 4) AS INTEGER), 0)'
+    expected = {}
+    for table in STATS_TABLES:
+        for row in connection.execute(text(COUNT_SQL[table].format(day=day, year=year))):
+            expected[(table,) + tuple(row[:-1])] = row[-1]
+    stored = _snapshot(connection)
+    drift = {}
+    for key in expected.keys() | stored.keys():
+        correction = expected.get(key, 0) - stored.get(key, 0)
+        if correction:
+            drift[key] = correction
+    return drift
+
+
+def apply_drift(connection, drift):
+    """Add each correction to its row and prune rows that reached zero.
+
+    Corrections are relative, so they commute with the triggers' own
+    increments: writes committed since the drift was measured are kept.
+    """
+    for (table, *key), correction in drift.items():
+        columns = STATS_KEYS[table]
+        values = dict(zip(columns, key), correction=correction)
+        connection.execute(text(
+            f"INSERT INTO {table} ({', '.join(columns)}, count) "
+            f"VALUES ({', '.join(':' + column for column in columns)}, :correction) "
+            f"ON CONFLICT ({', '.join(columns)}) DO UPDATE SET count = {table}.count + excluded.count"
+        ), values)
+    for table in STATS_TABLES:
+        connection.execute(text(f'DELETE FROM {table} WHERE count = 0'))
+
+
+def rebuild(connection):
+    """Correct the summary tables from source in the caller's transaction; returns rows changed.
+
+    Only safe against concurrent writers when the transaction reads a single
+    snapshot; ``reconcile`` arranges that.
+    """
+    drift = measure_drift(connection)
+    apply_drift(connection, drift)
+    return len(drift)
+
+
+def reconcile(engine):
+    """``rebuild`` for a live database, without blocking writers; returns rows changed.
+
+    The drift is measured in a read-only REPEATABLE READ transaction and
+    applied in a short second one, so nothing holds a table lock.
+    """
+    with engine.connect() as connection:
+        if engine.dialect.name == 'postgresql':
+            connection = connection.execution_options(isolation_level='REPEATABLE READ')
+        with connection.begin():
+            if engine.dialect.name == 'postgresql':
+                connection.execute(text('SET TRANSACTION READ ONLY'))
+            drift = measure_drift(connection)
+    if drift:
+        with engine.begin() as connection:
+            apply_drift(connection, drift)
+    return len(drift)
+
+
+def status_counts_statement(program_ids):
+    """``(program_id, status, count)`` rows for several programs, zero rows left out.
+
+    Shared by the Flask and async program views.
+    """
+    return (select(ProgramStatusCount.program_id, ProgramStatusCount.status, ProgramStatusCount.count)
+            .where(ProgramStatusCount.program_id.in_(program_ids), ProgramStatusCount.count > 0))
+
+
+def _age_bands(birth_years, today):
+    labels = [f'{low}-{high - 1}' for low, high in zip(AGE_BANDS, AGE_BANDS[1:])] + [f'{AGE_BANDS[-1]}+']
+    bands = dict.fromkeys(labels + ['unknown'], 0)
+    for birth_year, count in birth_years:
+        if not birth_year:
+            bands['unknown'] += count
+            continue
+        # Age reached this calendar year; off by at most one before the birthday.
+        age = max(today.year - birth_year, 0)
+        bands[labels[bisect_right(AGE_BANDS, age) - 1]] += count
+    return bands
+
+
+def get_stats(days=DEFAULT_DAYS, today=None):
+    """Dashboard statistics: per-program status counts, daily enrollments, age bands."""
+    today = today or datetime.utcnow().date()  # enrollment dates are UTC
+    since = today - timedelta(days=days - 1)
+    session = db.session
+
+    programs = {}
+    rows = (session.query(HealthProgram.id, HealthProgram.name, ProgramStatusCount.status,
+                          ProgramStatusCount.count)
+            .outerjoin(ProgramStatusCount, db.and_(ProgramStatusCount.program_id == HealthProgram.id,
+                                                   ProgramStatusCount.count > 0))
+            .order_by(HealthProgram.id))
+    for program_id, name, status, count in rows:
+        program = programs.setdefault(program_id, {'id': program_id, 'name': name,
+                                                   'enrollments': {}, 'total': 0})
+        if status is not None:
+            program['enrollments'][status] = count
+            program['total'] += count
+
+    per_day = {since + timedelta(days=offset): 0 for offset in range(days)}
+    rows = (session.query(EnrollmentDayCount.day, func.sum(EnrollmentDayCount.count))
+            .filter(EnrollmentDayCount.day.between(since, today))
+            .group_by(EnrollmentDayCount.day))
+    for day, count in rows:
+        per_day[day] = int(count)
+
+    birth_years = (session.query(ClientBirthYearCount.birth_year, ClientBirthYearCount.count)
+                   .filter(ClientBirthYearCount.count > 0))
+    return {
+        'programs': list(programs.values()),
+        'enrollments_per_day': [{'date': day.isoformat(), 'count': count}
+                                for day, count in sorted(per_day.items())],
+        'age_bands': _age_bands(birth_years, today),
+    }
+
+
+@click.command('stats-rebuild')
+@click.option('--every', type=int, default=None, metavar='SECONDS',
+              help='Keep running and reconcile every SECONDS.')
+@with_appcontext
+def stats_rebuild_command(every):
+    """Rebuild the program statistics tables from clients and enrollments."""
+    while True:
+        try:
+            drift = reconcile(db.engine)
+        except Exception as e:
+            if not every:
+                raise
+            # e.g. the database restarting; the next round picks up the drift
+            current_app.logger.error(f'Program statistics rebuild failed: {e}')
+        else:
+            if drift:
+                current_app.logger.warning(f'Program statistics had drifted; {drift} rows corrected')
+            click.echo(f'Program statistics rebuilt; rows corrected: {drift}.')
+        if not every:
+            break
+        time.sleep(every)
+
+
+def init_app(app):
+    app.cli.add_command(stats_rebuild_command)
@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+
+STREAM_BATCH_SIZE = 500
+
+
+def stream_query(query, key_column, after=0, batch_size=STREAM_BATCH_SIZE):
+    """Iterate ``query`` rows off a server-side cursor in ``key_column`` order."""
+    return (query.filter(key_column > after)
+            .order_by(key_column)
+            .execution_options(stream_results=True)
+            .yield_per(batch_size))
+
+
+def stream_json_array(items, serialize, chunk_size=STREAM_BATCH_SIZE):
+    """Yield a JSON array in chunks of ``chunk_size`` elements.
+
+    The body is never held in memory as a whole, and rows are grouped so the
+    server is not issuing one socket write per row.
+    """
+    yield '['
+    chunk = []
+    separator = ''
+    for item in items:
+        chunk.append(separator + json.dumps(serialize(item)))
+        separator = ','
+        if len(chunk) >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+    yield ']'
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f'{value.__class__.__name__} is not JSON serializable')
+
+
+def stream_rows(connection, statement, batch_size=STREAM_BATCH_SIZE):
+    """Yield batches of Core rows for ``statement`` off a server-side cursor.
+
+    On PostgreSQL ``stream_results`` makes psycopg2 use a named cursor, so only
+    ``batch_size`` rows are held in memory at any time.
+    """
+    result = connection.execution_options(stream_results=True).execute(statement)
+    try:
+        while True:
+            rows = result.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        result.close()
+
+
+def encode_ndjson(batches, columns):
+    """Encode row batches as newline-delimited JSON, one chunk per batch."""
+    for rows in batches:
+        yield ''.join(json.dumps(dict(zip(columns, row)), default=_json_default) + '\n'
+                      for row in rows)
+
+
+def encode_csv(batches, columns):
+    """Encode row batches as CSV with a header row, one chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows([value.isoformat() if isinstance(value, (date, datetime)) else value
+                          for value in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_stream(chunks, level=6):
+    """Gzip a stream of text chunks incrementally."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,326 @@
+"""Reproducible API benchmark.
+
+Seeds a SQLite database, serves the app from a threaded WSGI server with an
+in-memory fake Redis, and drives each endpoint at a fixed concurrency::
+
+    python -m benchmarks.run --clients 10000 --concurrency 8 --output bench.json
+    python -m benchmarks.run --output new.json --compare bench.json
+
+Latency percentiles, requests/sec and SQL statements per request are written
+as JSON. ``--compare`` prints the change against an earlier run and exits
+non-zero when a scenario's p95 latency or throughput regresses by more than
+``--max-regression``.
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from statistics import mean
+
+import requests
+from flask import g, request
+from werkzeug.serving import make_server
+
+from app import cache, create_app
+from app.extensions import db, redis_client
+from app.importer import insert_client_batch
+from app.models.models import User
+from config import TestingConfig
+
+SCENARIOS = ('login', 'list', 'detail', 'create', 'delete')
+USERNAME = 'bench'
+PASSWORD = 'bench-password'
+SEED_BATCH_SIZE = 1000
+LIST_PAGE_SIZE = 50
+
+
+class BenchmarkConfig(TestingConfig):
+    RATELIMIT_ENABLED = False
+    LOGIN_MAX_CONCURRENT_PER_USER = 10 ** 6
+    LOGIN_MAX_FAILURES = 10 ** 6
+
+
+def build_app(database_path, hash_workers):
+    try:
+        import fakeredis
+    except ImportError:
+        sys.exit('The benchmark needs fakeredis as its Redis stand-in: pip install fakeredis')
+    config_class = type('RunConfig', (BenchmarkConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database_path}',
+        'PASSWORD_HASH_WORKERS': hash_workers,
+    })
+    app = create_app(config_class)
+    redis_client.init_app(app, client=fakeredis.FakeStrictRedis(decode_responses=True))
+    return app
+
+
+def seed(app, clients):
+    """Create the benchmark user and ``clients`` client rows; returns their ids."""
+    rng = random.Random(0)
+    with app.app_context():
+        db.create_all()
+        user = User(username=USERNAME)
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+        for start in range(0, clients, SEED_BATCH_SIZE):
+            insert_client_batch([{
+                'name': f'Client {i}',
+                'date_of_birth': datetime(1940 + rng.randrange(80), rng.randrange(1, 13), 1).date(),
+                'contact_info': f'client{i}@example.com'
+            } for i in range(start, min(start + SEED_BATCH_SIZE, clients))])
+        return [row[0] for row in db.session.execute(db.text('SELECT id FROM client'))]
+
+
+class QueryRecorder:
+    """Collects the per-request SQL statement count that ``app.metrics`` keeps in ``g``."""
+
+    def __init__(self, app):
+        self._lock = threading.Lock()
+        self._counts = {}
+        app.after_request(self._record)
+
+    def _record(self, response):
+        if 'db_query_count' in g:
+            with self._lock:
+                self._counts.setdefault(request.endpoint, []).append(g.db_query_count)
+        return response
+
+    def take(self):
+        with self._lock:
+            counts, self._counts = self._counts, {}
+        return [count for values in counts.values() for count in values]
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, statuses, elapsed, queries):
+    latencies = sorted(latencies)
+    ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        'requests': len(latencies),
+        'errors': sum(1 for status in statuses if status >= 400),
+        'statuses': {str(code): statuses.count(code) for code in sorted(set(statuses))},
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'latency_ms': {
+            'mean': ms(mean(latencies)) if latencies else None,
+            'p50': ms(percentile(latencies, 0.50)),
+            'p95': ms(percentile(latencies, 0.95)),
+            'p99': ms(percentile(latencies, 0.99)),
+            'max': ms(latencies[-1]) if latencies else None,
+        },
+        'queries_per_request': round(mean(queries), 2) if queries else None,
+    }
+
+
+def drive(send, total, concurrency):
+    """Call ``send(session, i)`` for i in range(total) from ``concurrency`` threads."""
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies, statuses = [], []
+
+    def worker():
+        session = requests.Session()
+        while True:
+            with lock:
+                i = next(counter)
+            if i >= total:
+                return
+            started = time.perf_counter()
+            status = send(session, i)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses.append(status)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - started
+
+
+def run_benchmark(clients=10000, requests_per_scenario=2000, login_requests=100,
+                  concurrency=8, scenarios=SCENARIOS, hash_workers=2, seed_value=42):
+    """Run the selected scenarios and return the results as a dict."""
+    with tempfile.TemporaryDirectory() as workdir:
+        app = build_app(os.path.join(workdir, 'bench.db'), hash_workers)
+        client_ids = seed(app, clients)
+        recorder = QueryRecorder(app)
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)  # no per-request access log
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f'http://127.0.0.1:{server.server_port}/api/v1'
+        try:
+            token = requests.post(f'{base}/auth/login',
+                                  json={'username': USERNAME, 'password': PASSWORD}).json()['access_token']
+            headers = {'Authorization': f'Bearer {token}'}
+            created = []
+            created_lock = threading.Lock()
+
+            def login(session, i):
+                return session.post(f'{base}/auth/login',
+                                    json={'username': USERNAME, 'password': PASSWORD}).status_code
+
+            def list_page(session, i):
+                after = random.Random(seed_value + i).choice(client_ids)
+                return session.get(f'{base}/clients', params={'after': after, 'limit': LIST_PAGE_SIZE},
+                                   headers=headers).status_code
+
+            def detail(session, i):
+                client_id = random.Random(seed_value + i).choice(client_ids)
+                return session.get(f'{base}/clients/{client_id}', headers=headers).status_code
+
+            def create(session, i):
+                response = session.post(f'{base}/clients', headers=headers, json={
+                    'name': f'Bench {i}', 'date_of_birth': '1990-01-01',
+                    'contact_info': f'bench{i}@example.com'})
+                if response.status_code == 201:
+                    with created_lock:
+                        created.append(response.json()['id'])
+                return response.status_code
+
+            def delete(session, i):
+                with created_lock:
+                    client_id = created.pop()
+                return session.delete(f'{base}/clients/{client_id}', headers=headers).status_code
+
+            plans = {'login': (login, login_requests), 'list': (list_page, requests_per_scenario),
+                     'detail': (detail, requests_per_scenario), 'create': (create, requests_per_scenario),
+                     'delete': (delete, None)}
+            results = {}
+            for name in scenarios:
+                send, total = plans[name]
+                if total is None:
+                    total = min(requests_per_scenario, len(created))
+                recorder.take()
+                latencies, statuses, elapsed = drive(send, total, concurrency)
+                results[name] = summarize(latencies, statuses, elapsed, recorder.take())
+        finally:
+            server.shutdown()
+            with app.app_context():
+                db.engine.dispose()
+
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'clients': clients,
+            'requests_per_scenario': requests_per_scenario,
+            'login_requests': login_requests,
+            'concurrency': concurrency,
+            'hash_workers': hash_workers,
+        },
+        'scenarios': results,
+        'cache': cache.stats.snapshot()['namespaces'],
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, max_regression=0.2):
+    """Return ``(rows, regressions)`` comparing two result dicts scenario by scenario."""
+    rows, regressions = [], []
+    for name, result in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        p95, old_p95 = result['latency_ms']['p95'], before['latency_ms']['p95']
+        rps, old_rps = result['rps'], before['rps']
+        p95_change = (p95 - old_p95) / old_p95 if old_p95 else 0.0
+        rps_change = (rps - old_rps) / old_rps if old_rps else 0.0
+        rows.append((name, old_p95, p95, p95_change, old_rps, rps, rps_change))
+        if p95_change > max_regression or rps_change < -max_regression:
+            regressions.append(name)
+    return rows, regressions
+
+
+def format_results(results):
+    lines = [f"{'scenario':<10}{'reqs':>7}{'errors':>8}{'rps':>10}{'p50 ms':>10}"
+             f"{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}"]
+    for name, result in results['scenarios'].items():
+        latency = result['latency_ms']
+        lines.append(f"{name:<10}{result['requests']:>7}{result['errors']:>8}{result['rps'] or 0:>10}"
+                     f"{latency['p50'] or 0:>10}{latency['p95'] or 0:>10}{latency['p99'] or 0:>10}"
+                     f"{result['queries_per_request'] or 0:>9}")
+    return '\n'.join(lines)
+
+
+def format_comparison(rows):
+    lines = [f"{'scenario':<10}{'p95 before':>12}{'p95 after':>12}{'change':>9}"
+             f"{'rps before':>12}{'rps after':>12}{'change':>9}"]
+    for name, old_p95, p95, p95_change, old_rps, rps, rps_change in rows:
+        lines.append(f"{name:<10}{old_p95:>12}{p95:>12}{p95_change:>+9.1%}"
+                     f"{old_rps:>12}{rps:>12}{rps_change:>+9.1%}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--clients', type=int, default=10000, help='client rows to seed')
+    parser.add_argument('--requests', type=int, default=2000, help='requests per scenario')
+    parser.add_argument('--login-requests', type=int, default=100,
+                        help='requests for the login scenario (each one hashes a password)')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument('--hash-workers', type=int, default=2, help='PASSWORD_HASH_WORKERS (0 = inline)')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='earlier results JSON to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='allowed fractional p95/rps regression before exiting with status 1')
+    args = parser.parse_args(argv)
+
+    scenarios = [name for name in args.scenarios.split(',') if name]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = run_benchmark(clients=args.clients, requests_per_scenario=args.requests,
+                            login_requests=args.login_requests, concurrency=args.concurrency,
+                            scenarios=scenarios, hash_workers=args.hash_workers)
+    print(format_results(results))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows, regressions = compare(results, baseline, args.max_regression)
+        print()
+        print(format_comparison(rows))
+        if regressions:
+            print(f"\nRegressed beyond {args.max_regression:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,18 +9,58 @@ class Config:
     # Database config
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///clients.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    # Read replicas for @replica_read views (comma-separated URLs; see app/replicas.py)
+    SQLALCHEMY_REPLICA_URIS = [url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url]
+    DB_REPLICA_POOL_SIZE = int(os.environ.get('DB_REPLICA_POOL_SIZE', 10))
+    DB_REPLICA_MAX_OVERFLOW = int(os.environ.get('DB_REPLICA_MAX_OVERFLOW', 20))
+    DB_REPLICA_EJECT_SECONDS = 30  # a failing replica is skipped this long
+    READ_YOUR_WRITES_SECONDS = 5  # a user's reads stay on the primary this long after they write
+    # Schema and seed data come from `flask db upgrade` and `flask bootstrap`;
+    # set AUTO_CREATE_SCHEMA=true to create them on startup instead.
+    AUTO_CREATE_SCHEMA = os.environ.get('AUTO_CREATE_SCHEMA', 'false').lower() == 'true'
+    ADMIN_USERNAME = os.environ.get('ADMIN_USERNAME', 'admin')
+    ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD', 'admin')
     
     # JWT config
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'jwt-secret-key-here')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+
+    # Login hardening: hashes are verified in a small process pool
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))  # 0 verifies inline
+    PASSWORD_HASH_MAX_PENDING = 16  # queued verifications per worker before logins get 429
+    PASSWORD_HASH_TIMEOUT = 5  # seconds
+    LOGIN_MAX_CONCURRENT_PER_USER = 2
+    LOGIN_MAX_FAILURES = 10  # failed attempts per username and address before attempts slow down
+    LOGIN_FAILURE_WINDOW = 900  # seconds
+    LOGIN_BACKOFF_SECONDS = 1  # wait after the last allowed failure, doubling with each further one
+    LOGIN_BACKOFF_MAX = 300  # seconds
     
     # Redis config
     REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+    REDIS_MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS', 50))
+    REDIS_SOCKET_TIMEOUT = float(os.environ.get('REDIS_SOCKET_TIMEOUT', 0.25))
+    REDIS_CONNECT_TIMEOUT = float(os.environ.get('REDIS_CONNECT_TIMEOUT', 0.25))
+    REDIS_BREAKER_THRESHOLD = 5  # consecutive failures before Redis is skipped
+    REDIS_BREAKER_COOLDOWN = 30  # seconds to skip Redis once the breaker opens
+    CLIENTS_CACHE_TTL = int(os.environ.get('CLIENTS_CACHE_TTL', 300))
+    CLIENT_L1_MAXSIZE = int(os.environ.get('CLIENT_L1_MAXSIZE', 10000))  # 0 disables the in-process cache
+    CLIENT_L1_TTL = float(os.environ.get('CLIENT_L1_TTL', 60))
+    CLIENT_BATCH_GET_MAX = 5000  # ids per POST /clients/batch-get
     
     # Rate limiting
     RATELIMIT_DEFAULT = "200 per day"
-    RATELIMIT_STORAGE_URL = REDIS_URL
+    RATELIMIT_ENABLED = True  # explicit: the shared limiter otherwise keeps a previous app's setting
+    # Counters live in Redis so limits hold across workers; each check is one
+    # atomic Lua call. Workers fall back to in-memory counting while Redis is down.
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI', REDIS_URL)
+    RATELIMIT_STORAGE_OPTIONS = {'socket_timeout': REDIS_SOCKET_TIMEOUT,
+                                 'socket_connect_timeout': REDIS_CONNECT_TIMEOUT}
+    RATELIMIT_STRATEGY = 'moving-window'
+    RATELIMIT_IN_MEMORY_FALLBACK_ENABLED = True
+    RATELIMIT_KEY_PREFIX = 'ratelimit'
     
     # CORS config
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
@@ -28,14 +68,43 @@ class Config:
     # File upload config
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     UPLOAD_FOLDER = 'uploads'
+    PHOTO_THUMBNAIL_SIZE = 256  # px, longest side
+    PHOTO_THUMBNAIL_WORKERS = 2
+    PHOTO_THUMBNAIL_WAIT = 5  # seconds a GET waits for a thumbnail still being made
+    PHOTO_CACHE_MAX_AGE = 3600  # browsers revalidate with the ETag after this
+    BULK_IMPORT_BATCH_SIZE = 1000  # rows per INSERT/COPY transaction
+    EXPORT_BATCH_SIZE = 2000  # rows fetched per server-side cursor round trip
+    EXPORT_GZIP_LEVEL = 3  # favour throughput over ratio for streamed exports
+    CHANGES_RETENTION_DAYS = int(os.environ.get('CHANGES_RETENTION_DAYS', 30))  # change feed history kept
+    SEARCH_CANDIDATE_LIMIT = 400  # index hits ranked per search; bounds worst-case latency
+    COHORT_CACHE_TTL = 300  # seconds; entries are also keyed by the change feed head
+    # Duplicate detection (see app/dedup.py)
+    DEDUP_THRESHOLD = float(os.environ.get('DEDUP_THRESHOLD', 0.85))  # minimum match score
+    DEDUP_MAX_CANDIDATES = 100  # clients scored by the inline check on create
+    DEDUP_MAX_RESULTS = 5  # possible duplicates returned on create
     
     # Security headers
     SESSION_COOKIE_SECURE = True
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
     
-    # Logging config
+    # Logging config (see app/logs.py)
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_FILE = os.environ.get('LOG_FILE', 'logs/health_info.log')  # empty: JSON lines on stderr
+    LOG_FILE_MAX_BYTES = int(os.environ.get('LOG_FILE_MAX_BYTES', 10 * 1024 * 1024))
+    LOG_FILE_BACKUP_COUNT = int(os.environ.get('LOG_FILE_BACKUP_COUNT', 10))
+    # Size-based rotation is only safe with one writing process; off, the
+    # file is reopened after an external rotation instead (see app/logs.py)
+    LOG_FILE_ROTATE = os.environ.get('LOG_FILE_ROTATE', '1') == '1'
+    LOG_QUEUE_SIZE = 10000  # records waiting for the writer thread before new ones are dropped
+    ACCESS_LOG_SAMPLE_RATE = float(os.environ.get('ACCESS_LOG_SAMPLE_RATE', 1.0))  # fraction of requests logged
+    ACCESS_LOG_SLOW_MS = float(os.environ.get('ACCESS_LOG_SLOW_MS', 1000))  # always logged, like 5xx
+
+    # SQL profiling: slow-query and N+1 logging per request (see app/profiling.py)
+    SQL_PROFILING = os.environ.get('SQL_PROFILING', 'false').lower() == 'true'
+    SQL_SLOW_QUERY_MS = float(os.environ.get('SQL_SLOW_QUERY_MS', 200))
+    SQL_REPEAT_THRESHOLD = int(os.environ.get('SQL_REPEAT_THRESHOLD', 5))  # same statement shape per request
+    SQL_SERVER_TIMING = os.environ.get('SQL_SERVER_TIMING', 'false').lower() == 'true'
     
 class ProductionConfig(Config):
     DEBUG = False
@@ -45,9 +114,19 @@ class DevelopmentConfig(Config):
     DEBUG = True
     TESTING = True
     SESSION_COOKIE_SECURE = False  # Allow non-HTTPS in development
+    SQL_PROFILING = True
+    SQL_SERVER_TIMING = True
     
 class TestingConfig(Config):
     DEBUG = False
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
-    SESSION_COOKIE_SECURE = False 
\ No newline at end of file
+    RATELIMIT_STORAGE_URI = 'memory://'
+    PASSWORD_HASH_WORKERS = 0
+    SESSION_COOKIE_SECURE = False 
+config = {
+    'development': DevelopmentConfig,
+    'testing': TestingConfig,
+    'production': ProductionConfig,
+    'default': DevelopmentConfig
+}
@@ -0,0 +1,99 @@
+"""Gunicorn settings for production: ``gunicorn -c gunicorn.conf.py wsgi:app``.
+
+Worker and thread counts follow the container's CPU quota and memory limit
+rather than the host's. The app is preloaded once in the master and forked,
+and each worker then rebuilds its own DB/Redis pools in ``post_fork``.
+HUP only re-forks workers from the code already imported in the master, so
+it does not pick up a deploy. Restart gunicorn, or for zero downtime send
+USR2 to start a new master and, once its workers are up, QUIT to the old one.
+"""
+import math
+import os
+import shutil
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Every worker writes the app log. Default to stderr, which the container
+# runtime collects; a LOG_FILE set explicitly is shared and rotated
+# externally, since workers rotating it themselves would lose lines.
+os.environ.setdefault('LOG_FILE', '')
+os.environ['LOG_FILE_ROTATE'] = '0'
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cpu_limit():
+    """CPUs available to this container (cgroup v2, then v1, then the host)."""
+    quota = _read('/sys/fs/cgroup/cpu.max')
+    if quota and not quota.startswith('max'):
+        limit, period = quota.split()
+        return max(1, math.ceil(int(limit) / int(period)))
+    limit = _read('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+    period = _read('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+    if limit and period and int(limit) > 0:
+        return max(1, math.ceil(int(limit) / int(period)))
+    return os.cpu_count() or 1
+
+
+def memory_limit_mb():
+    """Container memory limit in MB, or None when unlimited."""
+    value = _read('/sys/fs/cgroup/memory.max') or _read('/sys/fs/cgroup/memory/memory.limit_in_bytes')
+    if not value or value == 'max' or int(value) >= 1 << 60:
+        return None
+    return int(value) // (1024 * 1024)
+
+
+def default_workers():
+    workers = 2 * cpu_limit() + 1
+    memory = memory_limit_mb()
+    if memory:
+        # Leave headroom for the master and forked hashing helpers.
+        per_worker = int(os.environ.get('GUNICORN_WORKER_MEMORY_MB', 96))
+        workers = min(workers, max(1, int(memory * 0.75) // per_worker))
+    return workers
+
+
+workers = int(os.environ.get('WEB_CONCURRENCY') or default_workers())
+# Threads let I/O-bound requests (DB, Redis, offloaded hashing) overlap
+# inside one worker without paying for another process.
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+preload_app = True
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers periodically to cap slow memory growth; the jitter keeps
+# them from all restarting at once.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+# The app writes sampled JSON access logs itself (ACCESS_LOG_SAMPLE_RATE)
+accesslog = os.environ.get('GUNICORN_ACCESSLOG') or None
+errorlog = '-'
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
+
+
+def on_starting(server):
+    # Metric files from a previous run would be merged into this one.
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+
+def post_fork(server, worker):
+    from app import reset_after_fork
+    reset_after_fork(server.app.wsgi())
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,146 @@
+"""program statistics summary tables
+
+Adds the tables behind /api/v1/stats, the triggers that maintain them and an
+initial fill from existing clients and enrollments. The trigger DDL is copied
+from app/stats.py as it stood at this revision, so later changes there cannot
+change what this migration does.
+
+Revision ID: c4f2d81e9b37
+Revises: a59b57076a50
+Create Date: 2026-10-18 12:10:41.208315
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f2d81e9b37'
+down_revision = 'a59b57076a50'
+branch_labels = None
+depends_on = None
+
+SQLITE_DDL = (
+    "CREATE TRIGGER IF NOT EXISTS stats_client_program_ai AFTER INSERT ON client_program BEGIN "
+    "INSERT INTO program_status_count (program_id, status, count) SELECT new.program_id, "
+    "COALESCE(new.status, 'active'), 1 WHERE true ON CONFLICT (program_id, status) DO UPDATE SET "
+    "count = program_status_count.count + 1; INSERT INTO enrollment_day_count (day, program_id, "
+    "count) SELECT date(new.enrollment_date), new.program_id, 1 WHERE new.enrollment_date IS NOT "
+    "NULL ON CONFLICT (day, program_id) DO UPDATE SET count = enrollment_day_count.count + 1; END",
+    "CREATE TRIGGER IF NOT EXISTS stats_client_program_ad AFTER DELETE ON client_program BEGIN "
+    "UPDATE program_status_count SET count = count - 1 WHERE program_id = old.program_id AND "
+    "status = COALESCE(old.status, 'active'); UPDATE enrollment_day_count SET count = count - 1 "
+    "WHERE day = date(old.enrollment_date) AND program_id = old.program_id; END",
+    "CREATE TRIGGER IF NOT EXISTS stats_client_program_au AFTER UPDATE OF program_id, status, "
+    "enrollment_date ON client_program BEGIN UPDATE program_status_count SET count = count - 1 "
+    "WHERE program_id = old.program_id AND status = COALESCE(old.status, 'active'); UPDATE "
+    "enrollment_day_count SET count = count - 1 WHERE day = date(old.enrollment_date) AND "
+    "program_id = old.program_id; INSERT INTO program_status_count (program_id, status, count) "
+    "SELECT new.program_id, COALESCE(new.status, 'active'), 1 WHERE true ON CONFLICT (program_id,"
+    " status) DO UPDATE SET count = program_status_count.count + 1; INSERT INTO "
+    "enrollment_day_count (day, program_id, count) SELECT date(new.enrollment_date), "
+    "new.program_id, 1 WHERE new.enrollment_date IS NOT NULL ON CONFLICT (day, program_id) DO "
+    "UPDATE SET count = enrollment_day_count.count + 1; END",
+    "CREATE TRIGGER IF NOT EXISTS stats_client_ai AFTER INSERT ON client BEGIN INSERT INTO "
+    "client_birth_year_count (birth_year, count) SELECT COALESCE(CAST(substr(new.date_of_birth, "
+    "1, 4) AS INTEGER), 0), 1 WHERE true ON CONFLICT (birth_year) DO UPDATE SET count = "
+    "client_birth_year_count.count + 1; END",
+    "CREATE TRIGGER IF NOT EXISTS stats_client_ad AFTER DELETE ON client BEGIN UPDATE "
+    "client_birth_year_count SET count = count - 1 WHERE birth_year = "
+    "COALESCE(CAST(substr(old.date_of_birth, 1, 4) AS INTEGER), 0); END",
+    "CREATE TRIGGER IF NOT EXISTS stats_client_au AFTER UPDATE OF date_of_birth ON client BEGIN "
+    "UPDATE client_birth_year_count SET count = count - 1 WHERE birth_year = "
+    "COALESCE(CAST(substr(old.date_of_birth, 1, 4) AS INTEGER), 0); INSERT INTO "
+    "client_birth_year_count (birth_year, count) SELECT COALESCE(CAST(substr(new.date_of_birth, "
+    "1, 4) AS INTEGER), 0), 1 WHERE true ON CONFLICT (birth_year) DO UPDATE SET count = "
+    "client_birth_year_count.count + 1; END",
+)
+POSTGRESQL_DDL = (
+    "CREATE OR REPLACE FUNCTION stats_client_program() RETURNS trigger AS $$ BEGIN IF TG_OP IN "
+    "('UPDATE', 'DELETE') THEN UPDATE program_status_count SET count = count - 1 WHERE program_id"
+    " = OLD.program_id AND status = COALESCE(OLD.status, 'active'); UPDATE enrollment_day_count "
+    "SET count = count - 1 WHERE day = OLD.enrollment_date::date AND program_id = OLD.program_id;"
+    " END IF; IF TG_OP IN ('INSERT', 'UPDATE') THEN INSERT INTO program_status_count (program_id,"
+    " status, count) SELECT NEW.program_id, COALESCE(NEW.status, 'active'), 1 WHERE true ON "
+    "CONFLICT (program_id, status) DO UPDATE SET count = program_status_count.count + 1; INSERT "
+    "INTO enrollment_day_count (day, program_id, count) SELECT NEW.enrollment_date::date, "
+    "NEW.program_id, 1 WHERE NEW.enrollment_date IS NOT NULL ON CONFLICT (day, program_id) DO "
+    "UPDATE SET count = enrollment_day_count.count + 1; END IF; RETURN NULL; END $$ LANGUAGE "
+    "plpgsql",
+    "CREATE OR REPLACE FUNCTION stats_client() RETURNS trigger AS $$ BEGIN IF TG_OP IN ('UPDATE',"
+    " 'DELETE') THEN UPDATE client_birth_year_count SET count = count - 1 WHERE birth_year = "
+    "COALESCE(EXTRACT(YEAR FROM OLD.date_of_birth)::int, 0); END IF; IF TG_OP IN ('INSERT', "
+    "'UPDATE') THEN INSERT INTO client_birth_year_count (birth_year, count) SELECT "
+    "COALESCE(EXTRACT(YEAR FROM NEW.date_of_birth)::int, 0), 1 WHERE true ON CONFLICT "
+    "(birth_year) DO UPDATE SET count = client_birth_year_count.count + 1; END IF; RETURN NULL; "
+    "END $$ LANGUAGE plpgsql",
+    "DROP TRIGGER IF EXISTS stats_client_program ON client_program",
+    "CREATE TRIGGER stats_client_program AFTER INSERT OR DELETE OR UPDATE OF program_id, status, "
+    "enrollment_date ON client_program FOR EACH ROW EXECUTE FUNCTION stats_client_program()",
+    "DROP TRIGGER IF EXISTS stats_client ON client",
+    "CREATE TRIGGER stats_client AFTER INSERT OR DELETE OR UPDATE OF date_of_birth ON client FOR "
+    "EACH ROW EXECUTE FUNCTION stats_client()",
+)
+# Initial fill; {day} and {year} are the dialect's date expressions below
+FILL = (
+    "INSERT INTO program_status_count (program_id, status, count) "
+    "SELECT program_id, COALESCE(status, 'active'), count(*) FROM client_program "
+    "GROUP BY program_id, COALESCE(status, 'active')",
+    "INSERT INTO enrollment_day_count (day, program_id, count) "
+    "SELECT {day}, program_id, count(*) FROM client_program WHERE enrollment_date IS NOT NULL "
+    "GROUP BY {day}, program_id",
+    "INSERT INTO client_birth_year_count (birth_year, count) "
+    "SELECT {year}, count(*) FROM client GROUP BY {year}",
+)
+DATE_EXPRESSIONS = {
+    'sqlite': dict(day='date(enrollment_date)',
+                   year='COALESCE(CAST(substr(date_of_birth, 1, 4) AS INTEGER), 0)'),
+    'postgresql': dict(day='enrollment_date::date',
+                       year='COALESCE(EXTRACT(YEAR FROM date_of_birth)::int, 0)'),
+}
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('client_birth_year_count',
+    sa.Column('birth_year', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('birth_year')
+    )
+    op.create_table('enrollment_day_count',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('program_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'program_id')
+    )
+    op.create_table('program_status_count',
+    sa.Column('program_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('program_id', 'status')
+    )
+    # ### end Alembic commands ###
+    dialect = op.get_bind().dialect.name
+    for statement in {'sqlite': SQLITE_DDL, 'postgresql': POSTGRESQL_DDL}.get(dialect, ()):
+        op.execute(statement)
+    if dialect in DATE_EXPRESSIONS:
+        for statement in FILL:
+            op.execute(statement.format(**DATE_EXPRESSIONS[dialect]))
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('DROP TRIGGER IF EXISTS stats_client_program ON client_program')
+        op.execute('DROP TRIGGER IF EXISTS stats_client ON client')
+        op.execute('DROP FUNCTION IF EXISTS stats_client_program()')
+        op.execute('DROP FUNCTION IF EXISTS stats_client()')
+    elif bind.dialect.name == 'sqlite':
+        for name in ('stats_client_program_ai', 'stats_client_program_ad', 'stats_client_program_au',
+                     'stats_client_ai', 'stats_client_ad', 'stats_client_au'):
+            op.execute(f'DROP TRIGGER IF EXISTS {name}')
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table('program_status_count')
+    op.drop_table('enrollment_day_count')
+    op.drop_table('client_birth_year_count')
+    # ### end Alembic commands ###
@@ -0,0 +1,99 @@
+"""change log for the delta-sync feed
+
+Adds change_log, its pruning horizon and the triggers that fill the log on
+every client and enrollment write. The log starts empty; callers begin with
+a full download and the cursor from GET /api/v1/changes. The trigger DDL is
+copied from app/changes.py as it stood at this revision.
+
+Revision ID: e7a0c5b19f42
+Revises: c4f2d81e9b37
+Create Date: 2026-10-18 12:41:07.532190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a0c5b19f42'
+down_revision = 'c4f2d81e9b37'
+branch_labels = None
+depends_on = None
+
+TABLES = ('client', 'client_program')
+SQLITE_DDL = (
+    "CREATE TRIGGER IF NOT EXISTS changes_client_ai AFTER INSERT ON client BEGIN INSERT INTO "
+    "change_log (txid, entity, entity_id, op, changed_at) VALUES (0, 'client', new.id, 'upsert', "
+    "strftime('%Y-%m-%d %H:%M:%S', 'now')); END",
+    "CREATE TRIGGER IF NOT EXISTS changes_client_au AFTER UPDATE ON client BEGIN INSERT INTO "
+    "change_log (txid, entity, entity_id, op, changed_at) VALUES (0, 'client', new.id, 'upsert', "
+    "strftime('%Y-%m-%d %H:%M:%S', 'now')); END",
+    "CREATE TRIGGER IF NOT EXISTS changes_client_ad AFTER DELETE ON client BEGIN INSERT INTO "
+    "change_log (txid, entity, entity_id, op, changed_at) VALUES (0, 'client', old.id, 'delete', "
+    "strftime('%Y-%m-%d %H:%M:%S', 'now')); END",
+    "CREATE TRIGGER IF NOT EXISTS changes_client_program_ai AFTER INSERT ON client_program BEGIN "
+    "INSERT INTO change_log (txid, entity, entity_id, op, changed_at) VALUES (0, 'enrollment', "
+    "new.id, 'upsert', strftime('%Y-%m-%d %H:%M:%S', 'now')); END",
+    "CREATE TRIGGER IF NOT EXISTS changes_client_program_au AFTER UPDATE ON client_program BEGIN "
+    "INSERT INTO change_log (txid, entity, entity_id, op, changed_at) VALUES (0, 'enrollment', "
+    "new.id, 'upsert', strftime('%Y-%m-%d %H:%M:%S', 'now')); END",
+    "CREATE TRIGGER IF NOT EXISTS changes_client_program_ad AFTER DELETE ON client_program BEGIN "
+    "INSERT INTO change_log (txid, entity, entity_id, op, changed_at) VALUES (0, 'enrollment', "
+    "old.id, 'delete', strftime('%Y-%m-%d %H:%M:%S', 'now')); END",
+)
+POSTGRESQL_DDL = (
+    "CREATE OR REPLACE FUNCTION log_change() RETURNS trigger AS $$ BEGIN IF TG_OP = 'DELETE' THEN"
+    " INSERT INTO change_log (txid, entity, entity_id, op, changed_at) VALUES (txid_current(), "
+    "TG_ARGV[0], OLD.id, 'delete', now() AT TIME ZONE 'utc'); ELSE INSERT INTO change_log (txid, "
+    "entity, entity_id, op, changed_at) VALUES (txid_current(), TG_ARGV[0], NEW.id, 'upsert', "
+    "now() AT TIME ZONE 'utc'); END IF; RETURN NULL; END $$ LANGUAGE plpgsql",
+    "DROP TRIGGER IF EXISTS changes_client ON client",
+    "CREATE TRIGGER changes_client AFTER INSERT OR UPDATE OR DELETE ON client FOR EACH ROW "
+    "EXECUTE FUNCTION log_change('client')",
+    "DROP TRIGGER IF EXISTS changes_client_program ON client_program",
+    "CREATE TRIGGER changes_client_program AFTER INSERT OR UPDATE OR DELETE ON client_program FOR"
+    " EACH ROW EXECUTE FUNCTION log_change('enrollment')",
+)
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('change_log',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('txid', sa.BigInteger(), nullable=False),
+    sa.Column('entity', sa.String(length=20), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('op', sa.String(length=10), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_change_log_changed_at'), 'change_log', ['changed_at'], unique=False)
+    op.create_index('ix_change_log_txid_id', 'change_log', ['txid', 'id'], unique=False)
+    op.create_table('change_log_horizon',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('txid', sa.BigInteger(), nullable=False),
+    sa.Column('change_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # ### end Alembic commands ###
+    statements = {'sqlite': SQLITE_DDL, 'postgresql': POSTGRESQL_DDL}.get(op.get_bind().dialect.name, ())
+    for statement in statements:
+        op.execute(statement)
+
+
+def downgrade():
+    bind = op.get_bind()
+    for table in TABLES:
+        if bind.dialect.name == 'postgresql':
+            op.execute(f'DROP TRIGGER IF EXISTS changes_{table} ON {table}')
+        elif bind.dialect.name == 'sqlite':
+            for suffix in ('ai', 'au', 'ad'):
+                op.execute(f'DROP TRIGGER IF EXISTS changes_{table}_{suffix}')
+    if bind.dialect.name == 'postgresql':
+        op.execute('DROP FUNCTION IF EXISTS log_change()')
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table('change_log_horizon')
+    op.drop_index('ix_change_log_txid_id', table_name='change_log')
+    op.drop_index(op.f('ix_change_log_changed_at'), table_name='change_log')
+    op.drop_table('change_log')
+    # ### end Alembic commands ###
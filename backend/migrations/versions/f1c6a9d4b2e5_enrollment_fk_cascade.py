@@ -0,0 +1,54 @@
+"""cascade enrollment deletes in the database
+
+Recreates client_program's foreign keys with ON DELETE CASCADE, so deleting
+a client or program removes its enrollments in one statement.
+
+Revision ID: f1c6a9d4b2e5
+Revises: d5a8c3e7f614
+Create Date: 2026-10-18 18:05:26.417903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c6a9d4b2e5'
+down_revision = 'd5a8c3e7f614'
+branch_labels = None
+depends_on = None
+
+# The initial schema left these unnamed: PostgreSQL's default names, and a
+# convention that lets SQLite's batch mode find them.
+FOREIGN_KEYS = (
+    ('client_program_client_id_fkey', 'client', 'client_id'),
+    ('client_program_program_id_fkey', 'health_program', 'program_id'),
+)
+SQLITE_NAMING = {'fk': '%(table_name)s_%(column_0_name)s_fkey'}
+
+
+def _recreate_foreign_keys(ondelete):
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        for name, referred, column in FOREIGN_KEYS:
+            op.drop_constraint(name, 'client_program', type_='foreignkey')
+            op.create_foreign_key(name, 'client_program', referred, [column], ['id'], ondelete=ondelete)
+        return
+
+    # SQLite rebuilds the table, which drops its stats and change log triggers
+    triggers = [row[0] for row in bind.execute(sa.text(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'client_program'"))]
+    with op.batch_alter_table('client_program', naming_convention=SQLITE_NAMING) as batch_op:
+        for name, referred, column in FOREIGN_KEYS:
+            batch_op.drop_constraint(name, type_='foreignkey')
+            batch_op.create_foreign_key(name, referred, [column], ['id'], ondelete=ondelete)
+    for statement in triggers:
+        op.execute(statement)
+
+
+def upgrade():
+    _recreate_foreign_keys('CASCADE')
+
+
+def downgrade():
+    _recreate_foreign_keys(None)
@@ -1,5 +1,6 @@
 import pytest
-from app import create_app
+from contextlib import contextmanager
+from app import create_app, profiling
 from app.extensions import db
 from app.models.models import User, Client
 from datetime import datetime
@@ -47,6 +48,19 @@ def auth_headers(client):
     token = response.json['access_token']
     return {'Authorization': f'Bearer {token}'}
 
+@pytest.fixture
+def query_budget():
+    """``with query_budget(n): ...`` fails if the requests inside issue more than n SQL statements."""
+    @contextmanager
+    def budget(max_queries):
+        with profiling.capture() as profiles:
+            yield profiles
+        issued = sum(profile.count for profile in profiles)
+        assert issued <= max_queries, (
+            f"{issued} queries issued, budget is {max_queries}: "
+            + '; '.join(f'{profile.endpoint} {dict(profile.shapes)}' for profile in profiles))
+    return budget
+
 @pytest.fixture
 def test_user():
     return {
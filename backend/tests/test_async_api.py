@@ -0,0 +1,168 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token, create_refresh_token
+
+from app import create_app
+from app.aio import create_asgi_app
+from app.extensions import db
+from app.models.models import Client, ClientProgram, HealthProgram
+from config import TestingConfig
+
+httpx = pytest.importorskip('httpx')
+from starlette.testclient import TestClient  # noqa: E402  (needs httpx)
+
+
+@pytest.fixture
+def shared_config(tmp_path):
+    # Both servers need to see the same database, so use a file, not :memory:
+    return type('SharedConfig', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'shared.db'}",
+        'JWT_SECRET_KEY': 'test-secret-key',
+        'REDIS_URL': 'redis://localhost:6379/1'
+    })
+
+
+@pytest.fixture
+def flask_app(shared_config):
+    app = create_app(shared_config)
+    with app.app_context():
+        db.create_all()
+        program = HealthProgram(name='TB', description='Tuberculosis care')
+        db.session.add(program)
+        for i in range(5):
+            db.session.add(Client(name=f'Client {i}', contact_info=f'c{i}@example.com',
+                                  date_of_birth=datetime(1990, 1, i + 1).date()))
+        db.session.flush()
+        db.session.add(ClientProgram(client_id=1, program_id=program.id, status='active'))
+        db.session.add(ClientProgram(client_id=2, program_id=program.id, status='completed'))
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def token(flask_app):
+    with flask_app.app_context():
+        return create_access_token(identity='testuser')
+
+
+@pytest.fixture
+def headers(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture
+def async_client(shared_config):
+    with TestClient(create_asgi_app(shared_config)) as client:
+        yield client
+
+
+@pytest.mark.parametrize('path', [
+    '/api/v1/clients?limit=2',
+    '/api/v1/clients?limit=2&after=2',
+    '/api/v1/clients?stream=true',
+    '/api/v1/clients/1',
+    '/api/v1/clients/999',
+    '/api/v1/clients/1/programs',
+    '/api/v1/programs',
+    '/api/v1/programs/1',
+    '/api/v1/programs/1/enrollments?status=active',
+    '/api/v1/clients?limit=0',
+])
+def test_async_matches_flask(flask_app, async_client, headers, path):
+    expected = flask_app.test_client().get(path, headers=headers)
+    response = async_client.get(path, headers=headers)
+    assert response.status_code == expected.status_code
+    assert response.json() == expected.get_json()
+    for header in ('X-Next-Cursor', 'Link', 'ETag', 'Last-Modified', 'Cache-Control'):
+        assert response.headers.get(header) == expected.headers.get(header)
+
+
+@pytest.mark.parametrize('path', ['/api/v1/clients?limit=2', '/api/v1/clients/1', '/api/v1/programs/1'])
+def test_async_revalidates_flask_etags(flask_app, async_client, headers, path):
+    etag = flask_app.test_client().get(path, headers=headers).headers['ETag']
+    response = async_client.get(path, headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+
+
+def test_async_auth_errors(flask_app, async_client):
+    assert async_client.get('/api/v1/clients').status_code == 401
+    assert async_client.get('/api/v1/clients').json()['error'] == 'Missing Authorization Header'
+
+    response = async_client.get('/api/v1/clients', headers={'Authorization': 'Bearer nope'})
+    assert response.status_code == 401
+    assert response.json()['error'] == 'Invalid Token'
+
+    with flask_app.app_context():
+        expired = create_access_token(identity='testuser', expires_delta=timedelta(seconds=-1))
+        refresh = create_refresh_token(identity='testuser')
+    response = async_client.get('/api/v1/clients', headers={'Authorization': f'Bearer {expired}'})
+    assert response.json()['error'] == 'Token Expired'
+    response = async_client.get('/api/v1/clients', headers={'Authorization': f'Bearer {refresh}'})
+    assert response.status_code == 422
+
+
+def test_async_health_hides_details(async_client, headers):
+    response = async_client.get('/api/v1/health')
+    assert response.status_code == 200
+    assert set(response.json()['redis']) == {'breaker'}
+    assert async_client.get('/api/v1/health/details').status_code == 401
+    response = async_client.get('/api/v1/health/details', headers=headers)
+    assert 'last_error' in response.json()['redis']['breaker']
+
+
+def test_async_rate_limits_match_flask(flask_app, async_client, headers):
+    from app.extensions import limiter
+    flask_app.test_client().get('/api/v1/clients/1', headers=headers)
+    async_client.get('/api/v1/clients/1', headers=headers)
+    # Same storage keys as flask-limiter, so both servers draw on one budget
+    flask_keys = set(limiter._storage.events)
+    async_keys = set(async_client.app.state.rate_limiter._storage.events)
+    assert async_keys and async_keys <= flask_keys
+
+    for _ in range(99):
+        async_client.get('/api/v1/clients/1', headers=headers)
+    response = async_client.get('/api/v1/clients/1', headers=headers)
+    assert response.status_code == 429
+    assert response.json()['error'] == 'Too Many Requests'
+
+
+def test_async_concurrent_requests(shared_config, flask_app, headers):
+    app = create_asgi_app(shared_config, RATELIMIT_ENABLED=False)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            responses = await asyncio.gather(*(client.get(f'/api/v1/clients/{i % 5 + 1}', headers=headers)
+                                               for i in range(200)))
+        await app.state.engine.dispose()
+        return responses
+
+    responses = asyncio.run(run())
+    assert all(response.status_code == 200 for response in responses)
+
+
+def test_async_shares_cache_with_flask(shared_config, flask_app, headers):
+    fakeredis = pytest.importorskip('fakeredis')
+    from fakeredis import aioredis
+    from app.extensions import redis_client
+
+    server = fakeredis.FakeServer()
+    redis_client.init_app(flask_app, client=fakeredis.FakeStrictRedis(server=server, decode_responses=True))
+    fake = aioredis.FakeRedis(server=server, decode_responses=True)
+    with TestClient(create_asgi_app(shared_config, redis_client=fake)) as client:
+        assert client.get('/api/v1/clients/1', headers=headers).json()['name'] == 'Client 0'
+        assert redis_client.client.exists('cache:client_detail:1')
+
+        # A write through the Flask app invalidates the entry for both servers
+        response = flask_app.test_client().put('/api/v1/clients/1', json={'name': 'Renamed'},
+                                               headers=headers)
+        assert response.status_code == 200
+        assert client.get('/api/v1/clients/1', headers=headers).json()['name'] == 'Renamed'
+
+        # List pages are shared too
+        client.get('/api/v1/clients?limit=2', headers=headers)
+        assert redis_client.client.keys('cache:clients:v*:list:0:2')
@@ -34,4 +34,85 @@ def test_protected_route_with_invalid_token(client):
     response = client.get('/api/v1/clients', 
         headers={'Authorization': 'Bearer invalid_token'})
     assert response.status_code == 422
-    assert 'Not enough segments' in response.json['message'] 
\ No newline at end of file
+    assert 'Not enough segments' in response.json['message'] 
+
+
+def test_login_returns_refresh_token_and_refresh_works(client):
+    response = client.post('/api/v1/auth/login',
+        json={'username': 'testuser', 'password': 'testpass'})
+    refresh_token = response.json['refresh_token']
+
+    response = client.post('/api/v1/auth/refresh',
+        headers={'Authorization': f'Bearer {refresh_token}'})
+    assert response.status_code == 200
+    access_token = response.json['access_token']
+    response = client.get('/api/v1/clients',
+        headers={'Authorization': f'Bearer {access_token}'})
+    assert response.status_code == 200
+
+def test_refresh_rejects_access_token(client, auth_headers):
+    response = client.post('/api/v1/auth/refresh', headers=auth_headers)
+    assert response.status_code in (401, 422)
+
+def test_login_verifies_hash_in_process_pool(app, client):
+    from app import security
+    app.config['PASSWORD_HASH_WORKERS'] = 1
+    try:
+        response = client.post('/api/v1/auth/login',
+            json={'username': 'testuser', 'password': 'testpass'})
+        assert response.status_code == 200
+        assert security._pool is not None
+    finally:
+        security.shutdown()
+
+def test_login_throttled_after_repeated_failures(app, client):
+    fakeredis = pytest.importorskip('fakeredis')
+    from app.extensions import redis_client
+    redis_client.init_app(app, client=fakeredis.FakeStrictRedis(decode_responses=True))
+    app.config['LOGIN_MAX_FAILURES'] = 2
+    for _ in range(2):
+        response = client.post('/api/v1/auth/login',
+            json={'username': 'testuser', 'password': 'wrong'})
+        assert response.status_code == 401
+    response = client.post('/api/v1/auth/login',
+        json={'username': 'testuser', 'password': 'testpass'})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+
+def test_failed_logins_only_slow_down_their_own_address(app, client):
+    fakeredis = pytest.importorskip('fakeredis')
+    from app.extensions import redis_client
+    fake = fakeredis.FakeStrictRedis(decode_responses=True)
+    redis_client.init_app(app, client=fake)
+    app.config['LOGIN_MAX_FAILURES'] = 2
+    attacker = {'REMOTE_ADDR': '203.0.113.9'}
+    for _ in range(2):
+        client.post('/api/v1/auth/login', json={'username': 'testuser', 'password': 'wrong'},
+            environ_base=attacker)
+    response = client.post('/api/v1/auth/login', json={'username': 'testuser', 'password': 'wrong'},
+        environ_base=attacker)
+    assert response.status_code == 429
+
+    # The owner, from elsewhere, is not held back
+    response = client.post('/api/v1/auth/login', json={'username': 'testuser', 'password': 'testpass'},
+        environ_base={'REMOTE_ADDR': '198.51.100.4'})
+    assert response.status_code == 200
+
+    # The attacker's wait ends on its own, and grows with each further failure
+    fake.delete('login:backoff:testuser:203.0.113.9')
+    response = client.post('/api/v1/auth/login', json={'username': 'testuser', 'password': 'wrong'},
+        environ_base=attacker)
+    assert response.status_code == 401
+    assert fake.pttl('login:backoff:testuser:203.0.113.9') > 1000
+
+def test_login_rejects_concurrent_attempts_for_same_user(app):
+    from app import security
+    from app.extensions import redis_client
+    app.config['LOGIN_MAX_CONCURRENT_PER_USER'] = 1
+    with app.test_request_context():
+        with security.login_guard('testuser', redis_client):
+            with pytest.raises(security.LoginThrottled):
+                with security.login_guard('testuser', redis_client):
+                    pass
+        with security.login_guard('testuser', redis_client):
+            pass
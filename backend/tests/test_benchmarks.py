@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+pytest.importorskip('fakeredis')
+
+from benchmarks import run  # noqa: E402
+
+
+def test_benchmark_smoke(tmp_path):
+    output = tmp_path / 'bench.json'
+    status = run.main(['--clients', '30', '--requests', '10', '--login-requests', '2',
+                       '--concurrency', '2', '--hash-workers', '0', '--output', str(output)])
+    assert status == 0
+    results = json.loads(output.read_text())
+    assert set(results['scenarios']) == set(run.SCENARIOS)
+    for name, result in results['scenarios'].items():
+        assert result['errors'] == 0, name
+        assert result['requests'] > 0
+        assert result['latency_ms']['p50'] <= result['latency_ms']['p99']
+        assert result['queries_per_request'] is not None
+    assert results['scenarios']['delete']['requests'] == results['scenarios']['create']['requests']
+
+
+def test_benchmark_compare_flags_regressions():
+    def result(p95, rps):
+        return {'scenarios': {'list': {'rps': rps, 'latency_ms': {'p95': p95}}}}
+
+    rows, regressions = run.compare(result(15.0, 100.0), result(10.0, 100.0), max_regression=0.2)
+    assert regressions == ['list']
+    assert rows[0][3] == pytest.approx(0.5)
+    assert run.compare(result(10.5, 95.0), result(10.0, 100.0))[1] == []
+    assert run.percentile([1, 2, 3, 4], 0.5) == 2
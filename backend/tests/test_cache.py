@@ -59,4 +59,236 @@ def test_cache_expiration(client, auth_headers):
     # Verify responses are identical but cache was invalidated
     assert response1.status_code == 200
     assert response2.status_code == 200
-    assert response1.json == response2.json 
\ No newline at end of file
+    assert response1.json == response2.json 
+
+
+@pytest.fixture
+def fake_redis():
+    fakeredis = pytest.importorskip('fakeredis')
+    return fakeredis.FakeStrictRedis(decode_responses=True)
+
+def test_versioned_cache_rebuilds_once_per_generation(app, fake_redis):
+    from app import cache
+    builds = []
+
+    def builder():
+        builds.append(1)
+        return {'items': len(builds)}
+
+    with app.app_context():
+        cache.stats.reset()
+        assert cache.get_or_build(fake_redis, 'test', ('p', 1), builder) == {'items': 1}
+        assert cache.get_or_build(fake_redis, 'test', ('p', 1), builder) == {'items': 1}
+        assert len(builds) == 1
+
+        cache.bump_generation(fake_redis, 'test')
+        assert cache.get_or_build(fake_redis, 'test', ('p', 1), builder) == {'items': 2}
+
+        counters = cache.stats.snapshot()['namespaces']['test']
+        assert counters['hits'] == 1
+        assert counters['misses'] == 2
+        assert counters['rebuilds'] == 2
+
+def test_versioned_cache_waits_for_rebuild_lock(app, fake_redis, monkeypatch):
+    from app import cache
+    monkeypatch.setattr(cache, 'LOCK_WAIT_SECONDS', 0.1)
+    with app.app_context():
+        cache.stats.reset()
+        # Simulate another worker holding the rebuild lock for this page
+        fake_redis.set('cache:test:v0:p:1:lock', 'other-worker')
+        assert cache.get_or_build(fake_redis, 'test', ('p', 1), lambda: 'fresh') == 'fresh'
+        counters = cache.stats.snapshot()['namespaces']['test']
+        assert counters['lock_waits'] == 1
+        assert counters['lock_timeouts'] == 1
+
+def test_cache_stats_endpoint(client, auth_headers):
+    response = client.get('/api/v1/cache/stats', headers=auth_headers)
+    assert response.status_code == 200
+    assert 'namespaces' in response.json
+
+def test_circuit_breaker_skips_redis_after_failures():
+    from app.redis_store import CircuitBreaker, CircuitOpenError
+    import redis
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=60)
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise redis.ConnectionError('down')
+
+    for _ in range(2):
+        with pytest.raises(redis.ConnectionError):
+            breaker.call(failing)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # Open circuit fails fast without touching the server
+    with pytest.raises(CircuitOpenError):
+        breaker.call(failing)
+    assert len(calls) == 2
+    assert breaker.snapshot()['short_circuits'] == 1
+
+def test_circuit_breaker_half_open_trial_closes():
+    from app.redis_store import CircuitBreaker
+    import redis
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0)
+
+    def failing():
+        raise redis.TimeoutError('slow')
+
+    with pytest.raises(redis.TimeoutError):
+        breaker.call(failing)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.call(lambda: 'PONG') == 'PONG'
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_circuit_breaker_trial_error_does_not_wedge_half_open():
+    from app.redis_store import CircuitBreaker
+    import redis
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0)
+
+    def down():
+        raise redis.ConnectionError('down')
+
+    def wrong_type():
+        raise redis.ResponseError('WRONGTYPE Operation against a key holding the wrong kind of value')
+
+    def bug():
+        raise KeyError('not redis')
+
+    with pytest.raises(redis.ConnectionError):
+        breaker.call(down)
+    # A reply error still proves the server is reachable
+    with pytest.raises(redis.ResponseError):
+        breaker.call(wrong_type)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    with pytest.raises(redis.ConnectionError):
+        breaker.call(down)
+    # An unrelated failure frees the trial slot without deciding anything
+    with pytest.raises(KeyError):
+        breaker.call(bug)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.call(lambda: 'PONG') == 'PONG'
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_clients_served_from_database_when_redis_down(app, client, auth_headers):
+    from app.redis_store import CircuitBreaker
+    redis_client.breaker.failure_threshold = 1
+    response = client.get('/api/v1/clients', headers=auth_headers)
+    assert response.status_code == 200
+    assert len(response.json) == 1
+    if not redis_client.available:
+        assert redis_client.breaker.state == CircuitBreaker.OPEN
+
+def test_health_reports_redis_state(client):
+    response = client.get('/api/v1/health')
+    assert response.status_code == 200
+    # Public: breaker state only, no errors or pool internals
+    assert response.json['redis'] == {'breaker': redis_client.breaker.state}
+
+def test_health_details_require_auth(client, auth_headers):
+    assert client.get('/api/v1/health/details').status_code == 401
+    response = client.get('/api/v1/health/details', headers=auth_headers)
+    assert response.status_code == 200
+    assert 'breaker' in response.json['redis']
+
+def test_local_cache_lru_eviction_and_ttl():
+    from app.cache import LocalCache
+    local = LocalCache(maxsize=2, ttl=60)
+    local.set('1', 'a')
+    local.set('2', 'b')
+    assert local.get('1') == 'a'  # '1' becomes most recently used
+    local.set('3', 'c')
+    assert local.get('2') is None
+    assert local.get('1') == 'a'
+    assert local.snapshot()['evictions'] == 1
+
+    local.configure(maxsize=2, ttl=-1)
+    local.set('1', 'a')
+    assert local.get('1') is None
+    assert local.snapshot()['expirations'] == 1
+
+def test_client_detail_served_from_local_cache(app, client, auth_headers):
+    from app import cache
+    response1 = client.get('/api/v1/clients/1', headers=auth_headers)
+    assert response1.status_code == 200
+    assert cache.local_clients.get('1') == response1.json
+
+    response2 = client.get('/api/v1/clients/1', headers=auth_headers)
+    assert response2.json == response1.json
+    assert cache.local_clients.snapshot()['hits'] >= 2
+
+def test_client_update_invalidates_local_cache(app, client, auth_headers):
+    from app import cache
+    client.get('/api/v1/clients/1', headers=auth_headers)
+    response = client.put('/api/v1/clients/1', json={'name': 'Renamed'}, headers=auth_headers)
+    assert response.status_code == 200
+    assert cache.local_clients.get('1') is None
+    assert client.get('/api/v1/clients/1', headers=auth_headers).json['name'] == 'Renamed'
+
+def test_invalidation_message_evicts_entry():
+    from app.cache import InvalidationListener, LocalCache
+    local = LocalCache(maxsize=10, ttl=60)
+    local.set('5', {'id': 5})
+    local.set('6', {'id': 6})
+    listener = InvalidationListener(None, {'client_detail': local})
+    listener.apply('client_detail:5')
+    assert local.get('5') is None and local.get('6') == {'id': 6}
+    listener.apply('client_detail:*')
+    assert local.get('6') is None
+
+def test_cached_records_batch_lookup(app, fake_redis):
+    from app import cache
+    loads = []
+
+    def loader(keys):
+        loads.append(keys)
+        return {key: {'id': int(key)} for key in keys if key != '4'}
+
+    with app.app_context():
+        cache.local_clients.clear()
+        cache.local_clients.set('1', {'id': 1, 'from': 'l1'})
+        fake_redis.set('cache:client_detail:2', '{"id": 2, "from": "redis"}')
+        records = cache.get_cached_records(fake_redis, 'client_detail', [3, 1, 2, 4, 3], loader)
+        assert list(records) == ['3', '1', '2', '4']
+        assert records['1']['from'] == 'l1' and records['2']['from'] == 'redis'
+        assert records['3'] == {'id': 3} and records['4'] is None
+        assert loads == [['3', '4']]
+        # Loaded records were backfilled; missing ones are not cached
+        assert fake_redis.get('cache:client_detail:3') == '{"id": 3}'
+        assert fake_redis.get('cache:client_detail:4') is None
+        assert cache.local_clients.get('3') == {'id': 3}
+
+def test_cache_fill_does_not_outlive_concurrent_invalidation(app, fake_redis):
+    from app import cache
+
+    def loader():
+        # A PUT commits and invalidates while the old row is being read
+        cache.publish_invalidation(fake_redis, 'client_detail', 7)
+        return {'id': 7, 'name': 'Old'}
+
+    with app.app_context():
+        cache.local_clients.clear()
+        assert cache.get_cached_record(fake_redis, 'client_detail', 7, loader) == {'id': 7, 'name': 'Old'}
+        assert fake_redis.get('cache:client_detail:7') is None
+        assert cache.local_clients.get('7') is None
+
+        # Without an invalidation the next fill is cached as usual
+        assert cache.get_cached_record(fake_redis, 'client_detail', 7, lambda: {'id': 7, 'name': 'New'})
+        assert fake_redis.get('cache:client_detail:7') == '{"id": 7, "name": "New"}'
+        assert cache.local_clients.get('7') == {'id': 7, 'name': 'New'}
+
+def test_batch_cache_fill_skips_records_invalidated_while_loading(app, fake_redis):
+    from app import cache
+
+    def loader(keys):
+        cache.publish_invalidation(fake_redis, 'client_detail', 8)
+        return {key: {'id': int(key)} for key in keys}
+
+    with app.app_context():
+        cache.local_clients.clear()
+        records = cache.get_cached_records(fake_redis, 'client_detail', [8, 9], loader)
+        assert records == {'8': {'id': 8}, '9': {'id': 9}}
+        assert fake_redis.get('cache:client_detail:8') is None
+        assert fake_redis.get('cache:client_detail:9') == '{"id": 9}'
+        assert cache.local_clients.get('8') is None
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+from app import changes
+from app.extensions import db
+
+
+def _feed(client, auth_headers, **args):
+    response = client.get('/api/v1/changes', headers=auth_headers, query_string=args)
+    assert response.status_code == 200
+    return response.json
+
+
+def test_feed_returns_changes_since_cursor(client, auth_headers):
+    cursor = _feed(client, auth_headers)['cursor']
+    assert _feed(client, auth_headers, since=cursor)['changes'] == []
+
+    client.put('/api/v1/clients/1', json={'name': 'Renamed'}, headers=auth_headers)
+    body = _feed(client, auth_headers, since=cursor)
+    assert body['changes'] == [{'type': 'client', 'id': 1, 'op': 'upsert',
+                                'data': client.get('/api/v1/clients/1', headers=auth_headers).json}]
+    assert not body['has_more']
+
+    # Deletes leave a tombstone, including the cascaded enrollments
+    program = client.post('/api/v1/programs', json={'name': 'TB'}, headers=auth_headers).json
+    client.post(f"/api/v1/programs/{program['id']}/enrollments", json={'client_id': 1}, headers=auth_headers)
+    cursor = body['cursor']
+    client.delete('/api/v1/clients/1', headers=auth_headers)
+    ops = {(change['type'], change['op']) for change in _feed(client, auth_headers, since=cursor)['changes']}
+    assert ops == {('client', 'delete'), ('enrollment', 'delete')}
+
+
+def test_feed_pages_are_bounded_and_resumable(client, auth_headers):
+    cursor = _feed(client, auth_headers)['cursor']
+    for i in range(5):
+        client.post('/api/v1/clients', json={'name': f'New {i}'}, headers=auth_headers)
+    seen = []
+    while True:
+        body = _feed(client, auth_headers, since=cursor, limit=2)
+        assert len(body['changes']) <= 2
+        seen.extend(change['data']['name'] for change in body['changes'])
+        cursor = body['cursor']
+        if not body['has_more']:
+            break
+    assert seen == [f'New {i}' for i in range(5)]
+
+
+def test_feed_cost_tracks_changes_not_table_size(app, client, auth_headers, query_budget):
+    from app.models.models import Client
+    db.session.add_all([Client(name=f'Bulk {i}') for i in range(300)])
+    db.session.commit()
+    cursor = _feed(client, auth_headers)['cursor']
+    client.put('/api/v1/clients/1', json={'name': 'Renamed'}, headers=auth_headers)
+    with query_budget(4):
+        assert len(_feed(client, auth_headers, since=cursor)['changes']) == 1
+
+
+def test_pruned_cursor_is_gone(app, client, auth_headers):
+    client.put('/api/v1/clients/1', json={'name': 'Renamed'}, headers=auth_headers)
+    with db.engine.begin() as connection:
+        assert changes.prune(connection, datetime.utcnow() + timedelta(minutes=1)) >= 1
+    response = client.get('/api/v1/changes?since=0.0', headers=auth_headers)
+    assert response.status_code == 410
+    cursor = _feed(client, auth_headers)['cursor']
+    assert _feed(client, auth_headers, since=cursor)['changes'] == []
+
+
+def test_periodic_prune_survives_a_failed_round(app, monkeypatch):
+    outcomes = [RuntimeError('server closed the connection unexpectedly'), 3]
+
+    def prune(connection, before):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def sleep(seconds):
+        if not outcomes:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(changes, 'prune', prune)
+    monkeypatch.setattr(changes.time, 'sleep', sleep)
+    result = app.test_cli_runner().invoke(args=['changes-prune', '--every', '60'])
+    assert outcomes == []
+    assert 'Pruned 3 change log entries' in result.output
+
+
+def test_feed_rejects_bad_arguments(client, auth_headers):
+    assert client.get('/api/v1/changes?since=abc', headers=auth_headers).status_code == 400
+    assert client.get('/api/v1/changes?since=0.0&limit=0', headers=auth_headers).status_code == 400
+    assert client.get('/api/v1/changes').status_code == 401
@@ -104,4 +104,90 @@ def test_delete_client_success(client, auth_headers):
 
     # Verify it's deleted
     get_response = client.get(f'/api/v1/clients/{client_id}', headers=auth_headers)
-    assert get_response.status_code == 404 
\ No newline at end of file
+    assert get_response.status_code == 404 
+
+
+def _seed_clients(app, count):
+    from app.extensions import db
+    with app.app_context():
+        db.session.add_all([Client(name=f'Paged Client {i}') for i in range(count)])
+        db.session.commit()
+
+def test_get_clients_keyset_pagination(app, client, auth_headers):
+    _seed_clients(app, 4)
+    response = client.get('/api/v1/clients?limit=2', headers=auth_headers)
+    assert response.status_code == 200
+    assert [c['id'] for c in response.json] == [1, 2]
+    assert response.headers['X-Next-Cursor'] == '2'
+    assert 'rel="next"' in response.headers['Link']
+
+    response = client.get('/api/v1/clients?limit=2&after=4', headers=auth_headers)
+    assert [c['id'] for c in response.json] == [5]
+    assert 'X-Next-Cursor' not in response.headers
+
+def test_get_clients_invalid_page_args(client, auth_headers):
+    response = client.get('/api/v1/clients?limit=0', headers=auth_headers)
+    assert response.status_code == 400
+    response = client.get('/api/v1/clients?after=abc', headers=auth_headers)
+    assert response.status_code == 400
+
+def test_get_clients_streamed(app, client, auth_headers):
+    _seed_clients(app, 3)
+    response = client.get('/api/v1/clients?stream=true&after=1', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert [c['id'] for c in response.json] == [2, 3, 4]
+
+def test_search_clients_substring_and_fuzzy(app, client, auth_headers):
+    from app.extensions import db
+    with app.app_context():
+        db.session.add_all([Client(name='Selline Achieng', contact_info='selline@example.com'),
+                            Client(name='Belinda Otieno', contact_info='0712 000 111')])
+        db.session.commit()
+
+    response = client.get('/api/v1/clients/search?q=achieng', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json[0]['name'] == 'Selline Achieng'
+
+    # Misspelt query still shares most trigrams with the stored name
+    response = client.get('/api/v1/clients/search?q=Belynda', headers=auth_headers)
+    assert response.json[0]['name'] == 'Belinda Otieno'
+
+    response = client.get('/api/v1/clients/search?q=0712', headers=auth_headers)
+    assert [c['name'] for c in response.json] == ['Belinda Otieno']
+
+    response = client.get('/api/v1/clients/search?q=be', headers=auth_headers)
+    assert [c['name'] for c in response.json] == ['Belinda Otieno']
+
+def test_search_index_follows_updates_and_deletes(client, auth_headers):
+    client.put('/api/v1/clients/1', json={'name': 'Renamed Person'}, headers=auth_headers)
+    response = client.get('/api/v1/clients/search?q=Renamed', headers=auth_headers)
+    assert [c['id'] for c in response.json] == [1]
+
+    client.delete('/api/v1/clients/1', headers=auth_headers)
+    response = client.get('/api/v1/clients/search?q=Renamed', headers=auth_headers)
+    assert response.json == []
+
+def test_search_requires_query(client, auth_headers):
+    assert client.get('/api/v1/clients/search', headers=auth_headers).status_code == 400
+
+def test_batch_get_clients_in_request_order(app, client, auth_headers, query_budget):
+    _seed_clients(app, 1200)
+    ids = [1150, 1, 99999, 3] + list(range(10, 1010))
+    with query_budget(2):  # SQLite caps bound parameters, so 1000+ misses take two IN queries
+        response = client.post('/api/v1/clients/batch-get', json={'ids': ids}, headers=auth_headers)
+    assert response.status_code == 200
+    results = response.json['results']
+    assert [result['id'] for result in results] == ids
+    assert results[0]['found'] and results[0]['client']['id'] == 1150
+    assert results[2] == {'id': 99999, 'found': False, 'client': None}
+
+    # Found clients are served from the cache the second time round
+    with query_budget(0):
+        again = client.post('/api/v1/clients/batch-get', json={'ids': [1150, 1, 3]}, headers=auth_headers)
+    assert again.json['results'] == [results[0], results[1], results[3]]
+
+def test_batch_get_clients_validates_ids(client, auth_headers):
+    for body in ({}, {'ids': []}, {'ids': ['1']}, {'ids': [True]}, {'ids': list(range(5001))}):
+        response = client.post('/api/v1/clients/batch-get', json=body, headers=auth_headers)
+        assert response.status_code == 400
@@ -0,0 +1,142 @@
+from datetime import date, datetime
+
+import pytest
+
+from app import cohorts
+from app.extensions import db
+from app.models.models import Client, ClientProgram, HealthProgram
+
+TODAY = date(2026, 10, 18)
+
+
+@pytest.fixture
+def cohort(app):
+    """Clients 15-24 and older, some enrolled in TB since March, some before or elsewhere."""
+    tb, hiv = HealthProgram(name='TB'), HealthProgram(name='HIV')
+    clients = {
+        'teen_march': Client(name='Teen March', date_of_birth=date(2010, 1, 1)),      # 16
+        'young_april': Client(name='Young April', date_of_birth=date(2002, 10, 19)),  # 23
+        'teen_january': Client(name='Teen January', date_of_birth=date(2009, 5, 5)),  # 17
+        'adult_march': Client(name='Adult March', date_of_birth=date(1980, 1, 1)),    # 46
+        'teen_hiv': Client(name='Teen HIV', date_of_birth=date(2008, 3, 3)),          # 18
+    }
+    db.session.add_all([tb, hiv, *clients.values()])
+    db.session.flush()
+    enrollments = [
+        ('teen_march', tb, datetime(2026, 3, 1, 9), 'active'),
+        ('young_april', tb, datetime(2026, 4, 12), 'active'),
+        ('teen_january', tb, datetime(2026, 1, 20), 'active'),
+        ('adult_march', tb, datetime(2026, 3, 15), 'active'),
+        ('teen_hiv', hiv, datetime(2026, 5, 1), 'active'),
+        ('teen_hiv', tb, datetime(2026, 6, 1), 'completed'),
+    ]
+    db.session.add_all(ClientProgram(client_id=clients[key].id, program_id=program.id,
+                                     enrollment_date=enrolled, status=status)
+                       for key, program, enrolled, status in enrollments)
+    db.session.commit()
+    return {key: client.id for key, client in clients.items()}, tb.id
+
+
+def _query(spec, **kwargs):
+    return cohorts.query_cohort(None, spec, today=TODAY, **kwargs)
+
+
+def test_filter_combines_age_program_status_and_date(cohort):
+    ids, tb = cohort
+    spec = {'age': {'min': 15, 'max': 24},
+            'enrollment': {'program_ids': [tb], 'status': ['active'], 'enrolled_from': '2026-03-01'}}
+    assert _query(spec)['ids'] == sorted([ids['teen_march'], ids['young_april']])
+    assert _query(spec, select='count')['count'] == 2
+
+
+def test_enrollment_conditions_apply_to_one_enrollment(cohort):
+    ids, _ = cohort
+    # Enrolled in HIV, and separately completed TB: not an active TB enrollee
+    spec = {'enrollment': {'program_names': ['TB'], 'status': ['active']}}
+    assert ids['teen_hiv'] not in _query(spec)['ids']
+    spec = {'enrollment': {'program_names': ['TB'], 'enrolled_to': '2026-03-01'}}
+    assert _query(spec)['ids'] == sorted([ids['teen_march'], ids['teen_january']])
+
+
+def test_age_bounds_are_whole_years(cohort):
+    ids, _ = cohort
+    # Born 2002-10-19: still 23 on 2026-10-18
+    assert ids['young_april'] in _query({'age': {'max': 23}})['ids']
+    assert ids['young_april'] not in _query({'age': {'min': 24}})['ids']
+
+
+def test_ids_are_paginated(cohort):
+    first = _query({'age': {'max': 24}}, limit=2)
+    assert len(first['ids']) == 2 and first['next'] == first['ids'][-1]
+    rest = _query({'age': {'max': 24}}, after=first['next'], limit=10)
+    assert rest['next'] is None
+    assert len(first['ids'] + rest['ids']) == 4
+
+
+def test_equivalent_filters_share_a_hash():
+    a = cohorts.normalize_filter({'enrollment': {'status': ['active', 'completed'], 'program_ids': [2, 1]}})
+    b = cohorts.normalize_filter({'enrollment': {'program_ids': [1, 2, 2], 'status': ['completed', 'active']}})
+    assert cohorts.filter_hash(a) == cohorts.filter_hash(b)
+
+
+@pytest.mark.parametrize('spec', [
+    {'enrollment': {'program_ids': [1], 'status': ['active'], 'enrolled_from': '2026-03-01'}},
+    {'enrollment': {'program_ids': [1]}, 'age': {'min': 15, 'max': 24}},
+    {'age': {'min': 15, 'max': 24}},
+])
+def test_common_shapes_are_answered_from_indexes(app, spec):
+    client = Client.__table__
+    conditions = cohorts.compile_filter(cohorts.normalize_filter(spec), TODAY)
+    for statement in (db.select(client.c.id).where(client.c.id > 0, *conditions).limit(101),
+                      db.select(db.func.count()).select_from(client).where(*conditions)):
+        sql = str(statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+        plan = [row[-1] for row in db.session.execute(db.text('EXPLAIN QUERY PLAN ' + sql))]
+        assert not any(step.startswith('SCAN client') for step in plan), plan
+
+
+def test_results_are_cached_per_filter_and_version(app, cohort, query_budget):
+    fakeredis = pytest.importorskip('fakeredis')
+    redis_client = fakeredis.FakeStrictRedis(decode_responses=True)
+    spec = {'age': {'min': 15, 'max': 24}}
+    with app.test_request_context():
+        first = cohorts.query_cohort(redis_client, spec, today=TODAY)
+        with query_budget(1):  # only the version lookup
+            assert cohorts.query_cohort(redis_client, spec, today=TODAY) == first
+
+
+def test_cohort_endpoint(client, auth_headers, cohort):
+    ids, tb = cohort
+    body = {'filter': {'enrollment': {'program_ids': [tb], 'status': ['active']}}, 'limit': 2}
+    response = client.post('/api/v1/cohorts/query', json=body, headers=auth_headers)
+    assert response.status_code == 200
+    assert len(response.json['ids']) == 2 and response.json['next']
+    assert response.json['filter_hash']
+
+    response = client.post('/api/v1/cohorts/query', json={**body, 'select': 'count'}, headers=auth_headers)
+    assert response.json['count'] == 4
+
+
+def test_results_follow_the_data_version(client, auth_headers, cohort):
+    ids, tb = cohort
+    body = {'filter': {'enrollment': {'program_ids': [tb]}}, 'select': 'count'}
+    before = client.post('/api/v1/cohorts/query', json=body, headers=auth_headers).json
+    client.delete(f"/api/v1/clients/{ids['adult_march']}", headers=auth_headers)
+    after = client.post('/api/v1/cohorts/query', json=body, headers=auth_headers).json
+    assert after['version'] != before['version']
+    assert after['count'] == before['count'] - 1
+
+
+@pytest.mark.parametrize('body, message', [
+    ({}, 'filter is required'),
+    ({'filter': {}}, 'at least one'),
+    ({'filter': {'age': {'min': 30, 'max': 20}}}, 'min must not exceed max'),
+    ({'filter': {'enrollment': {'status': ['sleeping']}}}, 'status must be one of'),
+    ({'filter': {'enrollment': {'enrolled_from': '03/01/2026'}}}, 'YYYY-MM-DD'),
+    ({'filter': {'gender': 'f'}}, 'Unknown filter fields: gender'),
+    ({'filter': {'age': {'max': 24}}, 'select': 'rows'}, 'select must be ids or count'),
+    ({'filter': {'age': {'max': 24}}, 'limit': None}, 'after and limit must be integers'),
+])
+def test_invalid_queries_are_rejected(client, auth_headers, body, message):
+    response = client.post('/api/v1/cohorts/query', json=body, headers=auth_headers)
+    assert response.status_code == 400
+    assert message in response.json['error']
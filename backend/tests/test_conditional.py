@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+import pytest
+from werkzeug.http import http_date
+
+from app.extensions import redis_client
+
+
+@pytest.fixture
+def redis_backed(app):
+    fakeredis = pytest.importorskip('fakeredis')
+    redis_client.init_app(app, client=fakeredis.FakeStrictRedis(decode_responses=True))
+    return app
+
+
+def _with(headers, **extra):
+    return dict(headers, **{key.replace('_', '-'): value for key, value in extra.items()})
+
+
+def test_client_detail_validators(client, auth_headers):
+    response = client.get('/api/v1/clients/1', headers=auth_headers)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert not etag.startswith('W/')
+    assert response.headers['Last-Modified']
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+    response = client.get('/api/v1/clients/1', headers=_with(auth_headers, If_None_Match=etag))
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+    client.put('/api/v1/clients/1', json={'name': 'Renamed'}, headers=auth_headers)
+    response = client.get('/api/v1/clients/1', headers=_with(auth_headers, If_None_Match=etag))
+    assert response.status_code == 200
+    assert response.json['name'] == 'Renamed'
+    assert response.headers['ETag'] != etag
+
+
+def test_client_detail_if_modified_since(client, auth_headers):
+    future = http_date(datetime.utcnow() + timedelta(days=1))
+    past = http_date(datetime(2000, 1, 1))
+    assert client.get('/api/v1/clients/1', headers=_with(auth_headers, If_Modified_Since=future)).status_code == 304
+    assert client.get('/api/v1/clients/1', headers=_with(auth_headers, If_Modified_Since=past)).status_code == 200
+
+
+def test_client_list_etag_follows_change_log(redis_backed, client, auth_headers):
+    response = client.get('/api/v1/clients?limit=10', headers=auth_headers)
+    etag = response.headers['ETag']
+    response = client.get('/api/v1/clients?limit=10', headers=_with(auth_headers, If_None_Match=etag))
+    assert response.status_code == 304
+
+    # Another page has its own validator
+    other = client.get('/api/v1/clients?limit=5', headers=_with(auth_headers, If_None_Match=etag))
+    assert other.status_code == 200
+
+    client.post('/api/v1/clients', json={'name': 'New Client'}, headers=auth_headers)
+    response = client.get('/api/v1/clients?limit=10', headers=_with(auth_headers, If_None_Match=etag))
+    assert response.status_code == 200
+    assert len(response.json) == 2
+    assert response.headers['Last-Modified']
+
+
+def test_client_list_etag_moves_on_writes_made_while_redis_is_down(client, auth_headers):
+    # Redis is unreachable in the test environment
+    response = client.get('/api/v1/clients', headers=auth_headers)
+    etag = response.headers['ETag']
+    assert client.get('/api/v1/clients', headers=_with(auth_headers, If_None_Match=etag)).status_code == 304
+
+    client.put('/api/v1/clients/1', json={'name': 'Renamed'}, headers=auth_headers)
+    response = client.get('/api/v1/clients', headers=_with(auth_headers, If_None_Match=etag))
+    assert response.status_code == 200
+    assert response.json[0]['name'] == 'Renamed'
+
+
+def test_program_etag_tracks_enrollments(client, auth_headers):
+    program_id = client.post('/api/v1/programs', json={'name': 'HIV'}, headers=auth_headers).json['id']
+    etag = client.get(f'/api/v1/programs/{program_id}', headers=auth_headers).headers['ETag']
+    headers = _with(auth_headers, If_None_Match=etag)
+    assert client.get(f'/api/v1/programs/{program_id}', headers=headers).status_code == 304
+
+    client.post(f'/api/v1/programs/{program_id}/enrollments', json={'client_id': 1}, headers=auth_headers)
+    response = client.get(f'/api/v1/programs/{program_id}', headers=headers)
+    assert response.status_code == 200
+    assert response.json['enrollments'] == {'active': 1}
+
+
+def test_program_revalidation_does_not_count_enrollments(client, auth_headers, query_budget):
+    from app import profiling
+    program_id = client.post('/api/v1/programs', json={'name': 'TB'}, headers=auth_headers).json['id']
+    etag = client.get(f'/api/v1/programs/{program_id}', headers=auth_headers).headers['ETag']
+    with query_budget(2) as profiles:
+        response = client.get(f'/api/v1/programs/{program_id}', headers=_with(auth_headers, If_None_Match=etag))
+    assert response.status_code == 304
+    # The version comes from program_status_count rows, never from client_program
+    assert not any('client_program' in shape for profile in profiles for shape in profile.shapes)
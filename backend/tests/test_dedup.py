@@ -0,0 +1,137 @@
+import json
+from datetime import date
+
+from app import dedup
+from app.extensions import db
+from app.models.models import Client, ClientDedupKey
+
+
+def _create(client, auth_headers, **fields):
+    response = client.post('/api/v1/clients', json=fields, headers=auth_headers)
+    assert response.status_code == 201
+    return response.json
+
+
+def _keys(client_id):
+    return {row.key for row in ClientDedupKey.query.filter_by(client_id=client_id)}
+
+
+def test_blocking_keys_survive_spelling_and_word_order():
+    keys = dedup.blocking_keys('Jon Smith', date(1990, 1, 2), '+254 712 345 678')
+    assert keys == {'n:J500 S530', 'b:J500:1990', 'b:S530:1990', 'c:712345678'}
+    assert dedup.blocking_keys('Smyth, John', date(1991, 5, 5), '0712345678') == keys
+    assert dedup.blocking_keys('José Müller', None, ' Jose@Example.com ') == {'n:J200 M460', 'c:jose@example.com'}
+
+
+def test_score_weighs_name_birth_date_and_contact():
+    a = dedup.prepare(1, 'John Smith', date(1990, 1, 2), '0712345678')
+    assert dedup.score(a, dedup.prepare(2, 'Jon Smith', date(1990, 1, 2), None)) > 0.9
+    assert dedup.score(a, dedup.prepare(3, 'Smith John', date(1990, 2, 1), '0712345678')) > 0.9
+    assert dedup.score(a, dedup.prepare(4, 'John Smith', date(1975, 6, 30), None)) < dedup.DEFAULT_THRESHOLD
+
+
+def test_create_client_reports_possible_duplicates(client, auth_headers):
+    first = _create(client, auth_headers, name='John Smith', date_of_birth='1990-01-02', contact_info='0712345678')
+    assert first['possible_duplicates'] == []
+
+    second = _create(client, auth_headers, name='Jon Smyth', date_of_birth='1990-01-02')
+    [duplicate] = second['possible_duplicates']
+    assert duplicate['id'] == first['id']
+    assert duplicate['score'] >= dedup.DEFAULT_THRESHOLD
+
+    other = _create(client, auth_headers, name='John Smith', date_of_birth='1962-08-14')
+    assert other['possible_duplicates'] == []
+
+
+def test_inline_check_stays_within_query_budget(client, auth_headers, query_budget):
+    for i in range(20):
+        db.session.add(Client(name='Mary Wanjiku', date_of_birth=date(1950 + i, 3, 4)))
+    db.session.commit()
+    with query_budget(5):
+        body = _create(client, auth_headers, name='Mary Wanjiku', date_of_birth='1960-03-04')
+    # The exact birth date first; a year either side may be a typo
+    assert ([match['date_of_birth'] for match in body['possible_duplicates']]
+            == ['1960-03-04', '1959-03-04', '1961-03-04'])
+
+
+def test_inline_check_prefers_name_and_contact_keys_over_a_crowded_band(app, client, auth_headers):
+    for surname in ('Kamau', 'Otieno', 'Wanjiru', 'Mwangi', 'Ochieng', 'Njoroge', 'Kiptoo', 'Mutua'):
+        db.session.add(Client(name=f'John {surname}', date_of_birth=date(1990, 5, 6)))
+    db.session.add(Client(name='John Smith', contact_info='0712345678'))
+    db.session.commit()
+    app.config['DEDUP_MAX_CANDIDATES'] = 3
+
+    body = _create(client, auth_headers, name='John Smith', date_of_birth='1990-01-02', contact_info='0712345678')
+    assert [match['name'] for match in body['possible_duplicates']] == ['John Smith']
+
+
+def test_keys_follow_updates_and_deletes(client, auth_headers):
+    created = _create(client, auth_headers, name='Peter Kamau')
+    assert _keys(created['id']) == {'n:K500 P360'}
+
+    client.put(f"/api/v1/clients/{created['id']}", json={'contact_info': 'pk@example.com'}, headers=auth_headers)
+    assert _keys(created['id']) == {'n:K500 P360', 'c:pk@example.com'}
+
+    client.delete(f"/api/v1/clients/{created['id']}", headers=auth_headers)
+    assert _keys(created['id']) == set()
+
+
+def test_bulk_import_indexes_clients(client, auth_headers):
+    body = '\n'.join(json.dumps({'name': name}) for name in ('Ann Lee', 'Anne Li'))
+    response = client.post('/api/v1/clients/bulk', data=body,
+                           headers={**auth_headers, 'Content-Type': 'application/x-ndjson'})
+    assert response.json['inserted'] == 2
+    ids = [row.id for row in Client.query.filter(Client.name.in_(['Ann Lee', 'Anne Li']))]
+    assert all(_keys(client_id) == {'n:A500 L000'} for client_id in ids)
+
+
+def _seed_duplicates():
+    db.session.add_all([
+        Client(name='John Smith', date_of_birth=date(1990, 1, 2)),
+        Client(name='Jon Smith', date_of_birth=date(1990, 1, 2)),
+        Client(name='Smith, John', date_of_birth=date(1990, 2, 1)),
+        Client(name='Grace Achieng', contact_info='grace@example.com'),
+        Client(name='Grace Akinyi Achieng', contact_info='Grace@example.com'),
+        Client(name='Unrelated Person'),
+    ])
+    db.session.commit()
+
+
+def test_find_clusters_groups_matches(app):
+    _seed_duplicates()
+    with db.engine.connect() as connection:
+        clusters, summary = dedup.find_clusters(connection, threshold=0.8)
+    names = [sorted(Client.query.get(client_id).name for client_id in cluster['client_ids'])
+             for cluster in clusters]
+    assert names == [['John Smith', 'Jon Smith', 'Smith, John'], ['Grace Achieng', 'Grace Akinyi Achieng']]
+    assert summary['clusters'] == 2
+
+
+def test_find_clusters_in_worker_processes_matches_serial(app):
+    _seed_duplicates()
+    with db.engine.connect() as connection:
+        serial, _ = dedup.find_clusters(connection, threshold=0.8)
+        parallel, _ = dedup.find_clusters(connection, threshold=0.8, workers=2, pairs_per_chunk=1)
+    assert parallel == serial
+
+
+def test_index_and_cluster_commands(app):
+    _seed_duplicates()
+    db.session.remove()
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['dedup-index'])
+    assert 'Indexed 7 clients' in result.output
+    result = runner.invoke(args=['dedup-clusters', '--workers', '1', '--threshold', '0.8'])
+    clusters = [json.loads(line) for line in result.stdout.splitlines() if line.startswith('{')]
+    assert len(clusters) == 2
+
+
+def test_bootstrap_backfills_keys_once(app):
+    # As right after the migration: clients, but no keys
+    db.session.execute(Client.__table__.insert(), [{'name': 'Ann Lee'}, {'name': 'Anne Li'}])
+    ClientDedupKey.query.delete()
+    db.session.commit()
+    db.session.remove()
+    runner = app.test_cli_runner()
+    assert 'Indexed 3 clients' in runner.invoke(args=['bootstrap']).output
+    assert 'Indexed' not in runner.invoke(args=['bootstrap']).output
@@ -0,0 +1,71 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+from app.extensions import db
+from app.models.models import Client, HealthProgram, ClientProgram
+
+def _ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+def test_export_clients_ndjson(client, auth_headers):
+    response = client.get('/api/v1/export/clients', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == 'application/x-ndjson'
+    rows = _ndjson(response)
+    assert len(rows) == 1
+    assert rows[0]['name'] == 'Test Client'
+    assert rows[0]['date_of_birth'] == '1990-01-01'
+
+def test_export_clients_csv_gzip(client, auth_headers):
+    response = client.get('/api/v1/export/clients?format=csv',
+        headers={**auth_headers, 'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(response.data).decode())))
+    assert [row['name'] for row in rows] == ['Test Client']
+
+def test_export_clients_updated_since(app, client, auth_headers):
+    with app.app_context():
+        old = Client.query.first()
+        old.updated_at = datetime(2000, 1, 1)
+        db.session.add(Client(name='Recent Client'))
+        db.session.commit()
+    response = client.get('/api/v1/export/clients?updated_since=2020-01-01T00:00:00', headers=auth_headers)
+    assert [row['name'] for row in _ndjson(response)] == ['Recent Client']
+
+    response = client.get('/api/v1/export/clients?updated_since=yesterday', headers=auth_headers)
+    assert response.status_code == 400
+
+def test_export_updated_since_accepts_utc_suffix_and_offsets(app, client, auth_headers):
+    with app.app_context():
+        Client.query.first().updated_at = datetime(2020, 1, 1, 10, 0)
+        db.session.commit()
+
+    def names(since):
+        response = client.get('/api/v1/export/clients', query_string={'updated_since': since},
+                              headers=auth_headers)
+        assert response.status_code == 200
+        return [row['name'] for row in _ndjson(response)]
+
+    assert names('2020-01-01T09:00:00Z') == ['Test Client']
+    assert names('2020-01-01T11:00:00Z') == []
+    # 12:00 at +03:00 is 09:00 UTC
+    assert names('2020-01-01T12:00:00+03:00') == ['Test Client']
+    assert names('2020-01-01T12:00:00+01:00') == []
+
+def test_export_enrollments_joins_client_and_program(app, client, auth_headers):
+    with app.app_context():
+        program = HealthProgram(name='TB')
+        db.session.add(program)
+        db.session.flush()
+        db.session.add(ClientProgram(client_id=1, program_id=program.id))
+        db.session.commit()
+    response = client.get('/api/v1/export/enrollments', headers=auth_headers)
+    rows = _ndjson(response)
+    assert len(rows) == 1
+    assert rows[0]['client_name'] == 'Test Client'
+    assert rows[0]['program_name'] == 'TB'
+    assert rows[0]['status'] == 'active'
@@ -0,0 +1,93 @@
+import json
+import logging
+import logging.handlers
+import queue
+
+import pytest
+
+from app import logs, metrics
+
+
+def test_request_id_is_generated_or_propagated(client):
+    generated = client.get('/api/v1/health').headers['X-Request-ID']
+    assert len(generated) == 32
+
+    response = client.get('/api/v1/health', headers={'X-Request-ID': 'edge-42'})
+    assert response.headers['X-Request-ID'] == 'edge-42'
+
+    response = client.get('/api/v1/health', headers={'X-Request-ID': '<script> ' * 30})
+    assert len(response.headers['X-Request-ID']) == 32
+
+
+def _access_records(caplog):
+    return [record for record in caplog.records if record.name == 'app.access']
+
+
+def test_access_log_carries_request_fields(client, auth_headers, caplog):
+    with caplog.at_level(logging.INFO, logger='app.access'):
+        response = client.get('/api/v1/programs', headers=auth_headers)
+    [record] = _access_records(caplog)
+    assert record.status == 200
+    assert record.endpoint == '/api/v1/programs'
+    assert record.method == 'GET'
+    assert record.db_queries >= 1
+    assert record.request_id == response.headers['X-Request-ID']
+
+
+def test_access_log_sampling_keeps_errors_and_slow_requests(app, client, caplog):
+    app.config.update(ACCESS_LOG_SAMPLE_RATE=0, ACCESS_LOG_SLOW_MS=60000)
+    with caplog.at_level(logging.INFO, logger='app.access'):
+        for _ in range(5):
+            client.get('/api/v1/health')
+        assert _access_records(caplog) == []
+
+        app.config['ACCESS_LOG_SLOW_MS'] = 0
+        client.get('/api/v1/health')
+    assert len(_access_records(caplog)) == 1
+
+
+@pytest.fixture
+def pipeline(app, tmp_path):
+    app.config.update(LOG_FILE=str(tmp_path / 'logs' / 'app.log'))
+    yield app
+    logs._stop_listener()
+    for handler in logs._listener.handlers:
+        handler.close()
+    app.logger.removeHandler(logs._handler)
+    logs._handler = logs._listener = None
+
+
+def test_pipeline_writes_json_lines_with_request_id(pipeline, client, tmp_path):
+    logs.configure(pipeline)
+    logs.configure(pipeline)  # reconfiguring must not duplicate handlers
+    assert pipeline.logger.handlers == [logs._handler]
+
+    @pipeline.route('/log-something')
+    def log_something():
+        pipeline.logger.warning('Enrollment %s rejected', 7)
+        return {}
+
+    request_id = client.get('/log-something').headers['X-Request-ID']
+    logs._stop_listener()  # flushes the queue
+    lines = [json.loads(line) for line in (tmp_path / 'logs' / 'app.log').read_text().splitlines()]
+    [entry] = [line for line in lines if line['logger'] == 'app']
+    assert entry['message'] == 'Enrollment 7 rejected'
+    assert entry['level'] == 'WARNING'
+    assert entry['request_id'] == request_id
+
+
+def test_shared_log_file_is_reopened_not_rotated(pipeline):
+    pipeline.config['LOG_FILE_ROTATE'] = False
+    logs.configure(pipeline)
+    [handler] = logs._listener.handlers
+    assert isinstance(handler, logging.handlers.WatchedFileHandler)
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = logs.RequestQueueHandler(queue.Queue(maxsize=1))
+    record = logging.LogRecord('app', logging.INFO, __file__, 1, 'message', None, None)
+    before = metrics.LOG_RECORDS_DROPPED._value.get()
+    handler.handle(record)
+    handler.handle(record)
+    assert handler.queue.qsize() == 1
+    assert metrics.LOG_RECORDS_DROPPED._value.get() == before + 1
@@ -0,0 +1,20 @@
+def test_metrics_endpoint_exposes_prometheus_text(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert b'http_requests_in_flight' in response.data
+
+def test_metrics_record_request_latency_and_queries(client, auth_headers):
+    client.get('/api/v1/clients/1', headers=auth_headers)
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{endpoint="/api/v1/clients/<int:client_id>",method="GET",status="200"}' in body
+    assert 'db_queries_per_request_count{endpoint="/api/v1/clients/<int:client_id>"}' in body
+    assert 'cache_operations_total{namespace="client_detail"' in body
+
+def test_rate_limit_rejections_are_counted(app, client, auth_headers):
+    from app import metrics
+    before = metrics.RATE_LIMIT_REJECTIONS.labels('/api/v1/clients/bulk')._value.get()
+    for _ in range(6):
+        response = client.post('/api/v1/clients/bulk', data='', headers=auth_headers)
+    assert response.status_code == 429
+    assert metrics.RATE_LIMIT_REJECTIONS.labels('/api/v1/clients/bulk')._value.get() == before + 1
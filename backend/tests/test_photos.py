@@ -0,0 +1,90 @@
+import io
+
+import pytest
+
+from app import photos
+
+PIL = pytest.importorskip('PIL')
+from PIL import Image  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def upload_folder(app, tmp_path):
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    return tmp_path
+
+
+def _jpeg(width=1200, height=800):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 120, 40)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def test_upload_and_serve_photo(client, auth_headers, upload_folder):
+    body = _jpeg()
+    response = client.put('/api/v1/clients/1/photo', data=body, headers=auth_headers,
+                          content_type='image/jpeg')
+    assert response.status_code == 200
+    assert response.json['size'] == len(body)
+    assert response.json['content_type'] == 'image/jpeg'
+    assert (upload_folder / 'clients' / '1.jpg').read_bytes() == body
+
+    response = client.get('/api/v1/clients/1/photo', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.data == body
+    assert response.headers['Cache-Control'].startswith('private')
+    etag = response.headers['ETag']
+
+    response = client.get('/api/v1/clients/1/photo', headers=dict(auth_headers, **{'If-None-Match': etag}))
+    assert response.status_code == 304
+
+    response = client.get('/api/v1/clients/1/photo', headers=dict(auth_headers, Range='bytes=0-99'))
+    assert response.status_code == 206
+    assert response.data == body[:100]
+
+
+def test_thumbnail_is_small(client, auth_headers):
+    client.put('/api/v1/clients/1/photo', data=_jpeg(), headers=auth_headers)
+    response = client.get('/api/v1/clients/1/photo?size=thumb', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+    thumb = Image.open(io.BytesIO(response.data))
+    assert max(thumb.size) == 256
+
+
+def test_reupload_replaces_thumbnail(app, client, auth_headers):
+    client.put('/api/v1/clients/1/photo', data=_jpeg(1200, 800), headers=auth_headers)
+    client.get('/api/v1/clients/1/photo?size=thumb', headers=auth_headers)
+    client.put('/api/v1/clients/1/photo', data=_jpeg(400, 1200), headers=auth_headers)
+    response = client.get('/api/v1/clients/1/photo?size=thumb', headers=auth_headers)
+    assert Image.open(io.BytesIO(response.data)).size[1] == 256
+
+
+def test_upload_rejects_non_images(client, auth_headers, upload_folder):
+    response = client.put('/api/v1/clients/1/photo', data=b'not an image', headers=auth_headers)
+    assert response.status_code == 415
+    assert list((upload_folder / 'clients').iterdir()) == []
+
+
+def test_upload_too_large(app, client, auth_headers, upload_folder):
+    app.config['MAX_CONTENT_LENGTH'] = 1024
+    response = client.put('/api/v1/clients/1/photo', data=_jpeg(), headers=auth_headers)
+    assert response.status_code == 413
+
+    # Without a Content-Length the limit is enforced while streaming
+    with app.test_request_context():
+        with pytest.raises(photos.PhotoTooLarge):
+            photos.save_photo(1, io.BytesIO(_jpeg()), 1024)
+    assert list((upload_folder / 'clients').iterdir()) == []
+
+
+def test_photo_not_found(client, auth_headers):
+    assert client.get('/api/v1/clients/1/photo', headers=auth_headers).status_code == 404
+    assert client.put('/api/v1/clients/999/photo', data=_jpeg(), headers=auth_headers).status_code == 404
+
+
+def test_delete_client_removes_photo(client, auth_headers, upload_folder):
+    client.put('/api/v1/clients/1/photo', data=_jpeg(), headers=auth_headers)
+    client.get('/api/v1/clients/1/photo?size=thumb', headers=auth_headers)
+    assert client.delete('/api/v1/clients/1', headers=auth_headers).status_code == 200
+    assert list((upload_folder / 'clients').iterdir()) == []
@@ -0,0 +1,77 @@
+import logging
+from datetime import date
+
+import pytest
+
+from app.extensions import db
+from app.models.models import Client, ClientProgram, HealthProgram
+from app.profiling import statement_shape
+
+
+@pytest.fixture
+def profiled(app):
+    app.config.update(SQL_PROFILING=True, SQL_SERVER_TIMING=True)
+    return app
+
+
+@pytest.fixture
+def enrolled(app):
+    programs = [HealthProgram(name=f'Program {i}') for i in range(3)]
+    clients = [Client(name=f'Client {i}', date_of_birth=date(1990, 1, 1), contact_info='x') for i in range(5)]
+    db.session.add_all(programs + clients)
+    db.session.flush()
+    db.session.add_all(ClientProgram(client_id=c.id, program_id=p.id) for c in clients for p in programs)
+    db.session.commit()
+    return programs, clients
+
+
+def test_statement_shape_folds_parameters_and_in_lists():
+    assert (statement_shape('SELECT * FROM client\n WHERE id IN (?, ?, ?) AND name = ?')
+            == 'SELECT * FROM client WHERE id IN (?) AND name = ?')
+    assert (statement_shape('SELECT * FROM client WHERE id IN (%(id_1_1)s, %(id_1_2)s)')
+            == statement_shape('SELECT * FROM client WHERE id IN ($1)'))
+
+
+def test_server_timing_header(profiled, client, auth_headers):
+    response = client.get('/api/v1/programs', headers=auth_headers)
+    assert response.headers['Server-Timing'].startswith('db;dur=')
+    assert 'queries"' in response.headers['Server-Timing']
+
+
+def test_profiling_is_off_by_default(client, auth_headers):
+    response = client.get('/api/v1/programs', headers=auth_headers)
+    assert 'Server-Timing' not in response.headers
+
+
+def test_repeated_statements_are_reported(profiled, client, auth_headers, enrolled, caplog):
+    ids = [c.id for c in enrolled[1]]
+
+    @profiled.route('/n-plus-one')
+    def n_plus_one():
+        return {'names': [Client.query.get(client_id).name for client_id in ids]}
+
+    profiled.config['SQL_REPEAT_THRESHOLD'] = 5
+    db.session.expunge_all()
+    with caplog.at_level(logging.WARNING):
+        client.get('/n-plus-one')
+    messages = [record.getMessage() for record in caplog.records]
+    assert any(message.startswith('Possible N+1 on /n-plus-one: 5 x SELECT client.id') for message in messages)
+
+
+def test_slow_queries_are_logged_with_route(profiled, client, auth_headers, caplog):
+    profiled.config['SQL_SLOW_QUERY_MS'] = 0
+    with caplog.at_level(logging.WARNING):
+        client.get('/api/v1/programs', headers=auth_headers)
+    assert any(record.getMessage().startswith('Slow query on /api/v1/programs (')
+               for record in caplog.records)
+
+
+@pytest.mark.parametrize('path, budget', [
+    ('/api/v1/programs', 2),
+    ('/api/v1/programs/1', 2),
+    ('/api/v1/programs/1/enrollments', 2),
+    ('/api/v1/clients/2/programs', 2),
+])
+def test_read_endpoints_stay_within_query_budget(client, auth_headers, enrolled, query_budget, path, budget):
+    with query_budget(budget):
+        assert client.get(path, headers=auth_headers).status_code == 200
@@ -0,0 +1,118 @@
+import pytest
+from sqlalchemy import event
+from app.extensions import db
+from app.models.models import Client, HealthProgram, ClientProgram
+
+@pytest.fixture
+def program(app):
+    with app.app_context():
+        program = HealthProgram(name='HIV Care', description='ART follow-up')
+        db.session.add(program)
+        db.session.commit()
+        return program.id
+
+@pytest.fixture
+def count_queries(app):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+def _enroll_many(app, program_id, count):
+    with app.app_context():
+        clients = [Client(name=f'Enrollee {i}') for i in range(count)]
+        db.session.add_all(clients)
+        db.session.flush()
+        db.session.add_all([ClientProgram(client_id=c.id, program_id=program_id) for c in clients])
+        db.session.commit()
+
+def test_create_and_get_program(client, auth_headers):
+    response = client.post('/api/v1/programs', json={'name': 'Malaria'}, headers=auth_headers)
+    assert response.status_code == 201
+    program_id = response.json['id']
+
+    response = client.get(f'/api/v1/programs/{program_id}', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json['name'] == 'Malaria'
+    assert response.json['enrollments'] == {}
+
+def test_enroll_client_and_reject_duplicate(client, auth_headers, program):
+    response = client.post(f'/api/v1/programs/{program}/enrollments',
+        json={'client_id': 1}, headers=auth_headers)
+    assert response.status_code == 201
+    assert response.json['status'] == 'active'
+
+    response = client.post(f'/api/v1/programs/{program}/enrollments',
+        json={'client_id': 1}, headers=auth_headers)
+    assert response.status_code == 409
+
+def test_enroll_client_validates_input(client, auth_headers, program):
+    for client_id in ('1', {'id': 1}, True):
+        response = client.post(f'/api/v1/programs/{program}/enrollments',
+            json={'client_id': client_id}, headers=auth_headers)
+        assert response.status_code == 400
+    response = client.post(f'/api/v1/programs/{program}/enrollments',
+        json={'client_id': 1, 'enrollment_date': 'soon'}, headers=auth_headers)
+    assert response.status_code == 400
+
+def test_enrollment_date_is_stored_as_naive_utc(client, auth_headers, program):
+    response = client.post(f'/api/v1/programs/{program}/enrollments',
+        json={'client_id': 1, 'enrollment_date': '2024-03-01T02:30:00+03:00'}, headers=auth_headers)
+    assert response.status_code == 201
+    assert response.json['enrollment_date'] == '2024-02-29T23:30:00'
+
+def test_update_enrollment_status(client, auth_headers, program):
+    enrollment_id = client.post(f'/api/v1/programs/{program}/enrollments',
+        json={'client_id': 1}, headers=auth_headers).json['id']
+    response = client.patch(f'/api/v1/programs/{program}/enrollments/{enrollment_id}',
+        json={'status': 'completed'}, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json['status'] == 'completed'
+
+    response = client.patch(f'/api/v1/programs/{program}/enrollments/{enrollment_id}',
+        json={'status': 'lost'}, headers=auth_headers)
+    assert response.status_code == 400
+
+def test_program_enrollments_use_fixed_number_of_queries(app, client, auth_headers, program, count_queries):
+    _enroll_many(app, program, 25)
+    count_queries.clear()
+    response = client.get(f'/api/v1/programs/{program}/enrollments?limit=50', headers=auth_headers)
+    assert response.status_code == 200
+    assert len(response.json) == 25
+    assert response.json[0]['client']['name'] == 'Enrollee 0'
+    # program lookup + one joined page query, independent of page size
+    assert len(count_queries) == 2
+
+def test_program_list_counts_enrollees_per_status(app, client, auth_headers, program, count_queries):
+    _enroll_many(app, program, 3)
+    count_queries.clear()
+    response = client.get('/api/v1/programs', headers=auth_headers)
+    assert response.json[0]['enrollments'] == {'active': 3}
+    assert len(count_queries) == 2
+
+def test_client_programs_listing(app, client, auth_headers, program):
+    client.post(f'/api/v1/programs/{program}/enrollments', json={'client_id': 1}, headers=auth_headers)
+    response = client.get('/api/v1/clients/1/programs', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json[0]['program']['name'] == 'HIV Care'
+
+def test_delete_client_removes_enrollments(app, client, auth_headers, program):
+    client.post(f'/api/v1/programs/{program}/enrollments', json={'client_id': 1}, headers=auth_headers)
+    assert client.delete('/api/v1/clients/1', headers=auth_headers).status_code == 200
+    with app.app_context():
+        assert ClientProgram.query.count() == 0
+
+def test_delete_program_cascades_in_the_database(app, client, auth_headers, program, count_queries):
+    _enroll_many(app, program, 30)
+    count_queries.clear()
+    assert client.delete(f'/api/v1/programs/{program}', headers=auth_headers).status_code == 200
+    # One DELETE for the program; the enrollments go with it, not row by row
+    assert sum(statement.startswith('DELETE FROM client_program') for statement in count_queries) == 0
+    with app.app_context():
+        assert ClientProgram.query.count() == 0
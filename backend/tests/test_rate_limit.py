@@ -0,0 +1,56 @@
+from flask_jwt_extended import create_access_token
+
+from app import create_app, metrics
+from app.extensions import db, limiter
+from app.models.models import User
+from app.rate_limit import rate_limit_key
+from config import TestingConfig
+
+
+def _bulk(client, headers):
+    return client.post('/api/v1/clients/bulk', data='', headers=headers)
+
+
+def test_key_is_identity_when_authenticated_else_ip(app, auth_headers):
+    with app.test_request_context('/', headers=auth_headers):
+        assert rate_limit_key() == 'user:testuser'
+    with app.test_request_context('/', environ_base={'REMOTE_ADDR': '10.0.0.7'}):
+        assert rate_limit_key() == 'ip:10.0.0.7'
+    with app.test_request_context('/', headers={'Authorization': 'Bearer not-a-token'},
+                                  environ_base={'REMOTE_ADDR': '10.0.0.7'}):
+        assert rate_limit_key() == 'ip:10.0.0.7'
+
+
+def test_each_user_has_their_own_budget(app, client, auth_headers):
+    with app.app_context():
+        other = create_access_token(identity='otheruser')
+    for _ in range(5):
+        _bulk(client, auth_headers)
+    before = metrics.RATE_LIMIT_REJECTIONS_BY_KEY.labels('user')._value.get()
+    assert _bulk(client, auth_headers).status_code == 429
+    assert metrics.RATE_LIMIT_REJECTIONS_BY_KEY.labels('user')._value.get() == before + 1
+    # Same IP, different user: not affected by testuser's exhausted limit
+    assert _bulk(client, {'Authorization': f'Bearer {other}'}).status_code != 429
+
+
+def test_limits_still_apply_in_memory_when_storage_is_down():
+    class UnreachableStorageConfig(TestingConfig):
+        RATELIMIT_STORAGE_URI = 'redis://127.0.0.1:1/0'
+        JWT_SECRET_KEY = 'test-secret-key'
+
+    app = create_app(UnreachableStorageConfig)
+    with app.app_context():
+        db.create_all()
+        user = User(username='testuser')
+        user.set_password('testpass')
+        db.session.add(user)
+        db.session.commit()
+        headers = {'Authorization': f"Bearer {create_access_token(identity='testuser')}"}
+        client = app.test_client()
+        statuses = [_bulk(client, headers).status_code for _ in range(6)]
+        assert 429 not in statuses[:5]
+        assert statuses[5] == 429
+        assert limiter._storage_dead
+        assert metrics.RATE_LIMIT_STORAGE_FALLBACK._value.get() == 1
+        db.session.remove()
+        db.drop_all()
@@ -0,0 +1,95 @@
+import pytest
+import redis
+import sqlalchemy
+from flask_jwt_extended import decode_token
+
+from app import replicas
+from app.extensions import db, redis_client
+from app.models.models import HealthProgram
+
+
+def _replica(path, program_name):
+    """A SQLite replica file holding one program the primary does not have."""
+    url = f'sqlite:///{path}'
+    engine = sqlalchemy.create_engine(url)
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(HealthProgram.__table__.insert().values(name=program_name))
+    engine.dispose()
+    return url
+
+
+@pytest.fixture
+def use_replicas(app):
+    def configure(*urls):
+        app.config['SQLALCHEMY_REPLICA_URIS'] = list(urls)
+        replicas.replicas.configure(app)
+    yield configure
+    configure()
+    replicas._recent_writers.clear()
+
+
+def _program_names(client, auth_headers):
+    response = client.get('/api/v1/programs', headers=auth_headers)
+    assert response.status_code == 200
+    return [program['name'] for program in response.json]
+
+
+def test_reads_go_to_replica_and_writes_to_primary(app, client, auth_headers, use_replicas, tmp_path):
+    use_replicas(_replica(tmp_path / 'replica.db', 'Replica Program'))
+    assert _program_names(client, auth_headers) == ['Replica Program']
+
+    response = client.post('/api/v1/programs', json={'name': 'TB'}, headers=auth_headers)
+    assert response.status_code == 201
+    assert [program.name for program in HealthProgram.query] == ['TB']
+
+
+def test_writer_reads_own_writes_from_primary(app, client, auth_headers, use_replicas, tmp_path):
+    use_replicas(_replica(tmp_path / 'replica.db', 'Replica Program'))
+    client.post('/api/v1/programs', json={'name': 'TB'}, headers=auth_headers)
+    assert _program_names(client, auth_headers) == ['TB']
+
+    # Once the window has passed, reads go back to the replica
+    identity = decode_token(auth_headers['Authorization'].split()[1])['sub']
+    replicas._recent_writers.clear()
+    try:
+        redis_client.delete(replicas._writer_key(identity))
+    except redis.RedisError:
+        pass
+    assert _program_names(client, auth_headers) == ['Replica Program']
+
+
+def test_replicas_are_used_round_robin(client, auth_headers, use_replicas, tmp_path):
+    use_replicas(_replica(tmp_path / 'a.db', 'A'), _replica(tmp_path / 'b.db', 'B'))
+    names = {tuple(_program_names(client, auth_headers)) for _ in range(4)}
+    assert names == {('A',), ('B',)}
+
+
+def test_unreachable_replica_is_ejected_and_request_retried_on_primary(client, auth_headers, use_replicas,
+                                                                       tmp_path):
+    db.session.add(HealthProgram(name='Primary Program'))
+    db.session.commit()
+    use_replicas(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+
+    assert _program_names(client, auth_headers) == ['Primary Program']
+    assert replicas.replicas.healthy() == []
+    assert _program_names(client, auth_headers) == ['Primary Program']
+
+
+def test_sqlite_pools_take_no_size_options():
+    assert replicas._pool_options('sqlite:///replica.db', 5, 10) == {}
+    assert replicas._pool_options('postgresql://db/app', 5, 10) == {'pool_size': 5, 'max_overflow': 10}
+
+
+def test_replica_failure_in_view_without_error_handling_is_retried(client, auth_headers, use_replicas, tmp_path):
+    program = HealthProgram(name='Primary Program')
+    db.session.add(program)
+    db.session.commit()
+    use_replicas(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+
+    # These views let database errors propagate instead of catching them
+    for path in (f'/api/v1/programs/{program.id}', f'/api/v1/programs/{program.id}/enrollments',
+                 '/api/v1/clients/1/programs'):
+        replicas.replicas.configure(client.application)
+        response = client.get(path, headers=auth_headers)
+        assert response.status_code == 200, path
@@ -0,0 +1,51 @@
+import os
+import runpy
+
+import pytest
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gunicorn.conf.py')
+
+
+@pytest.fixture
+def gunicorn_conf(monkeypatch):
+    # The config sets logging defaults in os.environ; have them undone afterwards
+    monkeypatch.delenv('LOG_FILE', raising=False)
+    monkeypatch.delenv('LOG_FILE_ROTATE', raising=False)
+    return runpy.run_path(CONFIG_PATH)
+
+
+def test_gunicorn_worker_settings(gunicorn_conf):
+    assert gunicorn_conf['preload_app'] is True
+    assert gunicorn_conf['workers'] >= 1
+    assert gunicorn_conf['threads'] >= 1
+    assert gunicorn_conf['max_requests_jitter'] > 0
+    assert gunicorn_conf['workers'] <= 2 * (os.cpu_count() or 1) + 1
+
+
+def test_gunicorn_workers_never_rotate_the_shared_log(gunicorn_conf):
+    assert os.environ['LOG_FILE'] == ''
+    assert os.environ['LOG_FILE_ROTATE'] == '0'
+
+
+def test_post_fork_rebuilds_pools(gunicorn_conf, app, monkeypatch):
+    from app import security
+    from app.extensions import db, redis_client
+
+    disposed = []
+    with app.app_context():
+        monkeypatch.setattr(db.engine, 'dispose', lambda: disposed.append(True))
+    monkeypatch.setattr(security, '_pool', object())
+    monkeypatch.setattr(security, '_pool_pid', os.getpid())
+    redis_client.breaker._failures = 3
+
+    class FakeServer:
+        class app:
+            @staticmethod
+            def wsgi():
+                return app
+
+    gunicorn_conf['post_fork'](FakeServer, None)
+
+    assert disposed == [True]
+    assert security._pool is None
+    assert redis_client.breaker.snapshot()['consecutive_failures'] == 0
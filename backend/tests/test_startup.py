@@ -0,0 +1,70 @@
+import time
+
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+
+from app import cache, create_app
+from app.cli import bootstrap_database
+from app.extensions import db
+from app.models.models import User
+from config import TestingConfig
+
+
+# Generous enough for a slow CI box; create_app normally takes a few ms.
+STARTUP_BUDGET_SECONDS = 0.5
+
+
+def _config_for(tmp_path, **overrides):
+    attrs = {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'startup.db'}", **overrides}
+    return type('StartupConfig', (TestingConfig,), attrs)
+
+
+def test_create_app_does_no_database_io(tmp_path):
+    connections = []
+    listener = lambda *args: connections.append(args)
+    event.listen(Pool, 'connect', listener)
+    try:
+        create_app(_config_for(tmp_path))
+    finally:
+        event.remove(Pool, 'connect', listener)
+    assert connections == []
+    assert not (tmp_path / 'startup.db').exists()
+
+
+def test_create_app_starts_no_cache_listener(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, '_listener', None)
+    create_app(_config_for(tmp_path))
+    assert cache._listener is not None
+    assert cache._listener._pid is None  # started on first L1 lookup instead
+
+
+def test_create_app_startup_time(tmp_path):
+    config_class = _config_for(tmp_path)
+    create_app(config_class)  # warm imports
+    timings = []
+    for _ in range(5):
+        started = time.perf_counter()
+        create_app(config_class)
+        timings.append(time.perf_counter() - started)
+    assert min(timings) < STARTUP_BUDGET_SECONDS
+
+
+def test_auto_create_schema_bootstraps(tmp_path):
+    app = create_app(_config_for(tmp_path, AUTO_CREATE_SCHEMA=True))
+    with app.app_context():
+        assert User.query.filter_by(username='admin').count() == 1
+        # Re-running is a no-op
+        assert bootstrap_database() is False
+
+
+def test_bootstrap_command(tmp_path):
+    app = create_app(_config_for(tmp_path, ADMIN_USERNAME='root', ADMIN_PASSWORD='s3cret'))
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['bootstrap', '--create-schema'])
+    assert result.exit_code == 0
+    assert "Created admin user 'root'" in result.output
+    with app.app_context():
+        assert User.query.filter_by(username='root').first().check_password('s3cret')
+        db.session.remove()
+    result = runner.invoke(args=['bootstrap'])
+    assert 'already exists' in result.output
@@ -0,0 +1,147 @@
+from datetime import date, datetime
+
+import pytest
+
+from app import stats
+from app.extensions import db
+from app.importer import import_clients
+from app.models.models import Client, ClientProgram, HealthProgram, ProgramStatusCount
+
+
+@pytest.fixture
+def program(app):
+    program = HealthProgram(name='Malaria')
+    db.session.add(program)
+    db.session.commit()
+    return program
+
+
+def _stats(client, auth_headers, **args):
+    response = client.get('/api/v1/stats', headers=auth_headers, query_string=args)
+    assert response.status_code == 200
+    return response.json
+
+
+def _counts(program_id):
+    return {row.status: row.count for row in ProgramStatusCount.query.filter_by(program_id=program_id)
+            if row.count}
+
+
+def test_counts_follow_enrollment_writes(client, auth_headers, program):
+    new = client.post('/api/v1/clients', json={'name': 'Jane', 'date_of_birth': '2015-03-01'},
+                      headers=auth_headers)
+    assert new.status_code == 201
+    for client_id in (1, new.json['id']):
+        response = client.post(f'/api/v1/programs/{program.id}/enrollments',
+                               json={'client_id': client_id}, headers=auth_headers)
+        assert response.status_code == 201
+    assert _counts(program.id) == {'active': 2}
+
+    enrollment_id = response.json['id']
+    client.patch(f'/api/v1/programs/{program.id}/enrollments/{enrollment_id}',
+                 json={'status': 'completed'}, headers=auth_headers)
+    assert _counts(program.id) == {'active': 1, 'completed': 1}
+
+    client.delete(f'/api/v1/programs/{program.id}/enrollments/{enrollment_id}', headers=auth_headers)
+    assert _counts(program.id) == {'active': 1}
+
+
+def test_stats_endpoint(client, auth_headers, program):
+    db.session.add(ClientProgram(client_id=1, program_id=program.id, enrollment_date=datetime.utcnow()))
+    db.session.commit()
+    body = _stats(client, auth_headers, days=7)
+    assert body['programs'] == [{'id': program.id, 'name': 'Malaria', 'enrollments': {'active': 1}, 'total': 1}]
+    assert len(body['enrollments_per_day']) == 7
+    assert body['enrollments_per_day'][-1] == {'date': datetime.utcnow().date().isoformat(), 'count': 1}
+    assert sum(body['age_bands'].values()) == 1
+
+
+def test_stats_rejects_bad_days(client, auth_headers):
+    assert client.get('/api/v1/stats?days=0', headers=auth_headers).status_code == 400
+    assert client.get('/api/v1/stats?days=x', headers=auth_headers).status_code == 400
+
+
+def test_stats_reads_do_not_scan_enrollments(client, auth_headers, program, query_budget):
+    with query_budget(3):
+        _stats(client, auth_headers)
+
+
+def test_age_bands_come_from_birth_years():
+    bands = stats._age_bands([(2015, 2), (1990, 1), (1950, 4), (0, 3)], today=date(2026, 6, 1))
+    assert bands == {'0-17': 2, '18-34': 0, '35-49': 1, '50-64': 0, '65+': 4, 'unknown': 3}
+
+
+def test_bulk_import_and_cascading_deletes_are_counted(app, client, auth_headers, program):
+    import io
+    body = io.BytesIO(b'{"name": "A", "date_of_birth": "2000-01-01"}\n{"name": "B"}\n')
+    import_clients(body, 'ndjson', batch_size=10)
+    body = _stats(client, auth_headers)
+    assert sum(body['age_bands'].values()) == 3
+    assert body['age_bands']['unknown'] == 1
+
+    db.session.add(ClientProgram(client_id=1, program_id=program.id))
+    db.session.commit()
+    client.delete(f'/api/v1/programs/{program.id}', headers=auth_headers)
+    assert _stats(client, auth_headers)['programs'] == []
+    with db.engine.begin() as connection:
+        assert stats.rebuild(connection) == 0
+
+
+def test_rebuild_corrects_drift(app, program):
+    program_id = program.id
+    db.session.add(ClientProgram(client_id=1, program_id=program_id))
+    db.session.commit()
+    db.session.query(ProgramStatusCount).update({'count': 42})
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['stats-rebuild'])
+    assert result.exit_code == 0
+    assert 'rows corrected: 1.' in result.output
+    db.session.remove()
+    assert _counts(program_id) == {'active': 1}
+
+
+def test_periodic_rebuild_survives_a_failed_round(app, monkeypatch):
+    outcomes = [RuntimeError('server closed the connection unexpectedly'), {}]
+    sleeps = []
+
+    def reconcile(engine):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if not outcomes:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(stats, 'reconcile', reconcile)
+    monkeypatch.setattr(stats.time, 'sleep', sleep)
+    result = app.test_cli_runner().invoke(args=['stats-rebuild', '--every', '60'])
+    assert sleeps == [60, 60]
+    assert 'rows corrected: {}.' in result.output
+
+
+def test_corrections_keep_writes_made_while_measuring(app, program):
+    program_id = program.id
+    db.session.add(ClientProgram(client_id=1, program_id=program_id))
+    db.session.commit()
+    db.session.query(ProgramStatusCount).update({'count': 0})  # drift: one enrollee missing
+    db.session.commit()
+
+    with db.engine.connect() as connection:
+        drift = stats.measure_drift(connection)
+    assert drift == {('program_status_count', program_id, 'active'): 1}
+
+    # An enrollment lands between the recount and the correction
+    other = Client(name='Late Enrollee')
+    db.session.add(other)
+    db.session.flush()
+    db.session.add(ClientProgram(client_id=other.id, program_id=program_id))
+    db.session.commit()
+
+    with db.engine.begin() as connection:
+        stats.apply_drift(connection, drift)
+    db.session.remove()
+    assert _counts(program_id) == {'active': 2}